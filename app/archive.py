@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+import json
+from modules.db import DB
+from modules.engine import make_engine
+from settings import settings_partitions
+
+
+async def archive(keep_months: int, directory: str) -> dict:
+    engine = make_engine()
+    result = await DB(engine=engine).archive_partitions(keep_months=keep_months, directory=directory)
+    await engine.dispose()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Архивация старых месячных секций таблицы walk')
+    parser.add_argument('--keep-months', type=int, default=settings_partitions['keep_months'],
+                        help='сколько прошедших месяцев оставить в walk')
+    parser.add_argument('--directory', default=settings_partitions['archive_directory'],
+                        help='каталог для выгрузки секций в csv.gz, без него секции только отсоединяются')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(archive(args.keep_months, args.directory)), ensure_ascii=False))
@@ -0,0 +1,58 @@
+"""
+Нагрузочный тест бронирования: параллельные заказы на одно и то же время
+
+Запуск (нужна база из settings.py с созданными ценами):
+    python -m benchmarks.bench_booking --bookings 500 --concurrency 50 --start-date "2030-01-30 14:00"
+
+Каждый заказ делается от нового хозяина, поэтому все они конкурируют за одно время.
+Выводит JSON с количеством бронирований в секунду и числом успешно созданных заказов,
+которое не должно превышать лимит на одно время
+"""
+import argparse
+import asyncio
+import json
+import time
+from sqlalchemy.ext.asyncio import create_async_engine
+from modules.db import DB
+from settings import settings_db
+
+
+async def run(bookings: int, concurrency: int, start_date: str) -> dict:
+    engine = create_async_engine(f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{settings_db['database']}",
+                                 pool_size=concurrency)
+    db = DB(engine=engine)
+    results = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = int(time.time())
+
+    async def book(i: int):
+        async with semaphore:
+            result = await db.insert(table_name='walk', values={'name': f'Нагрузка {i}',
+                                                                'phone': f'8{run_id % 10**6:06d}{i:04d}',
+                                                                'dog_name': f'Собака {i}',
+                                                                'dog_description': None,
+                                                                'flat_number': i,
+                                                                'start_date': start_date})
+            key = result.get('message') or result.get('error') if result else 'exception'
+            results[key] = results.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(book(i) for i in range(bookings)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return {
+        'bookings': bookings,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'bookings_per_second': round(bookings / elapsed, 1),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--start-date', default='2030-01-30 14:00')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.bookings, args.concurrency, args.start_date)), ensure_ascii=False))
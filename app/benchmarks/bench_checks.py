@@ -0,0 +1,89 @@
+"""
+Микробенчмарк проверок Checks
+
+Сравнивает старые check_time_walk и check_phone (некомпилированные шаблоны, strptime на каждую
+границу времени) с текущими одиночными проверками и пакетными check_times_walk и check_phones.
+Запуск:
+    python -m benchmarks.bench_checks --items 100000 --repeat 5
+"""
+import argparse
+import json
+import re
+import time
+from datetime import datetime, timedelta
+from loguru import logger
+from modules.checks import checks
+
+
+@logger.catch
+def legacy_time_walk(check_time: str) -> dict:
+    # Копия check_time_walk до перехода на скомпилированные шаблоны
+    if re.fullmatch(r"\d{2}.\d{2}.\d{4} \d{2}:\d{2}",check_time):
+        check_time_format = f"{check_time[6:10]}-{check_time[3:5]}-{check_time[0:2]}{check_time[10:]}"
+    try:
+        check_time_format = datetime.strptime(check_time,"%Y-%m-%d %H:%M")
+    except:
+        return {'error': 'Неправильный формат времени'}
+    error = ''
+    if check_time_format < datetime.now():
+        error += 'Дата должна быть в будущем. '
+    if datetime.strptime(check_time[11:], '%H:%M') < datetime.strptime("07:00", '%H:%M') or datetime.strptime(check_time[11:], '%H:%M') > datetime.strptime("23:00", '%H:%M'):
+        error += 'Время выгула должно быть не раньше 7 утра и не позже 11 вечера. '
+    if check_time[14:] != '00' and check_time[14:] != '30':
+        error += 'Время выгула должно начинаться либо в начале часа, либо в половину. '
+    if error != '':
+        return {'error': error}
+    else:
+        return {'check_time': check_time}
+
+
+@logger.catch
+def legacy_phone(check_phone: str) -> dict:
+    if len(check_phone) > 12 or len(check_phone) < 11:
+        return {'error': 'Неправильная длина номера телефона'}
+    if check_phone[:2] != "+7" and check_phone[0] != '8':
+        return {'error':'Неправильный формат номера телефона'}
+    if len(check_phone) == 12:
+        check_phone = '8'+check_phone[2:]
+    return {'check_phone': check_phone}
+
+
+def make_times(count: int) -> list:
+    start = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return [(start + timedelta(days=i // 33, minutes=30 * (i % 33))).strftime('%Y-%m-%d %H:%M') for i in range(count)]
+
+
+def make_phones(count: int) -> list:
+    return [f'+79{i:09d}' if i % 2 else f'89{i:09d}' for i in range(count)]
+
+
+def measure(function, items: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(items)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    times = make_times(args.items)
+    phones = make_phones(args.items)
+    print(json.dumps({
+        'items': args.items,
+        'time_walk_ms': {
+            'legacy': measure(lambda items: [legacy_time_walk(item) for item in items], times, args.repeat),
+            'single': measure(lambda items: [checks.check_time_walk(check_time=item) for item in items], times, args.repeat),
+            'batch': measure(lambda items: checks.check_times_walk(check_times=items), times, args.repeat),
+        },
+        'phone_ms': {
+            'legacy': measure(lambda items: [legacy_phone(item) for item in items], phones, args.repeat),
+            'single': measure(lambda items: [checks.check_phone(check_phone=item) for item in items], phones, args.repeat),
+            'batch': measure(lambda items: checks.check_phones(check_phones=items), phones, args.repeat),
+        },
+    }, ensure_ascii=False))
@@ -0,0 +1,85 @@
+"""
+Бенчмарк конкурентных запросов к запущенному серверу
+
+Запуск (сервер уже должен быть поднят, например через run.py):
+    python -m benchmarks.bench_concurrency --url http://localhost:8000 --concurrency 64 --requests 2000
+
+Выводит JSON с пропускной способностью (запросов в секунду) и задержками p50/p99 в миллисекундах
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+
+def percentile(values: list, percent: float) -> float:
+    """
+    Функция, возвращающая перцентиль из отсортированного списка
+    Parameters
+    ----------
+    values: list
+        Отсортированный список значений
+    percent: float
+        Перцентиль
+        Пример: 99
+    Returns
+    -------
+    float
+        Значение перцентиля
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(url: str, concurrency: int, requests: int, current_date: str) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post('/get/walks', params={'current_date': current_date})
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--current-date', default='2024-01-30')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.url, args.concurrency, args.requests, args.current_date)), ensure_ascii=False))
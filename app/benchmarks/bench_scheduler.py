@@ -0,0 +1,122 @@
+"""
+Бенчмарк автоматического назначения гуляющих
+
+Генерирует синтетических гуляющих со сменами и принятые заказы за неделю и замеряет:
+    - scheduler.assign_day в памяти;
+    - с --db ещё и DB.schedule_walks целиком (чтение с блокировкой, расчёт, запись одним UPDATE)
+      в отдельной базе, которая создаётся и заполняется заново.
+Запуск:
+    python -m benchmarks.bench_scheduler --walks 50000 --walkers 2000
+    python -m benchmarks.bench_scheduler --walks 50000 --walkers 2000 --db
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+import asyncpg
+from modules.scheduler import assign_day
+from settings import settings_db
+
+DAYS = 7
+
+
+def make_walkers(count: int) -> list:
+    # [(walker_id, capacity, [(day_of_week, start, end), ...]), ...], смены по 4-8 часов на 5 дней из 7
+    walkers = []
+    for walker_id in range(1, count + 1):
+        shifts = []
+        for day_of_week in random.sample(range(1, 8), 5):
+            start = random.randrange(7 * 60, 19 * 60, 30)
+            shifts.append((day_of_week, start, min(start + random.choice([240, 360, 480]), 23 * 60 + 30)))
+        walkers.append((walker_id, random.randint(6, 12), shifts))
+    return walkers
+
+
+def make_walks(count: int, first_day: date) -> list:
+    # [(walk_id, start_date), ...], больше заказов утром и вечером
+    times = [7 * 60 + 30 * i for i in range(33)]
+    weights = [3 if 7 * 60 <= t < 10 * 60 or 17 * 60 <= t < 21 * 60 else 1 for t in times]
+    starts = random.choices(times, weights=weights, k=count)
+    return [(walk_id, datetime.combine(first_day + timedelta(days=walk_id % DAYS), datetime.min.time()) + timedelta(minutes=start))
+            for walk_id, start in enumerate(starts, start=1)]
+
+
+def run_memory(walkers: list, walks: list) -> dict:
+    capacity = {walker_id: walker_capacity for walker_id, walker_capacity, _ in walkers}
+    shifts = {}
+    for walker_id, _, walker_shifts in walkers:
+        for day_of_week, start, end in walker_shifts:
+            shifts.setdefault(day_of_week, []).append((start, end, walker_id))
+    by_day = {}
+    for walk_id, start_date in sorted(walks, key=lambda walk: walk[1]):
+        start = start_date.hour * 60 + start_date.minute
+        by_day.setdefault(start_date.date(), []).append((start, start + 30, walk_id))
+
+    started = time.perf_counter()
+    assigned = unassigned = 0
+    for day, day_walks in by_day.items():
+        day_assigned, day_unassigned = assign_day(walks=day_walks, shifts=shifts.get(day.isoweekday(), []),
+                                                  capacity=capacity, busy=set(), load={})
+        assigned += len(day_assigned)
+        unassigned += len(day_unassigned)
+    return {'seconds': round(time.perf_counter() - started, 3), 'assigned': assigned, 'unassigned': unassigned}
+
+
+async def run_db(walkers: list, walks: list, first_day: date, database: str) -> dict:
+    from modules.db import DB
+    from modules.engine import make_engine
+    from modules.migrations import upgrade_schema
+
+    admin = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                  host=settings_db['host'], port=settings_db['port'], database='postgres')
+    await admin.execute(f'DROP DATABASE IF EXISTS {database}')
+    await admin.execute(f'CREATE DATABASE {database}')
+
+    engine = make_engine(database=database)
+    async with engine.begin() as connection:
+        await connection.run_sync(upgrade_schema)
+
+    connection = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                       host=settings_db['host'], port=settings_db['port'], database=database)
+    await connection.copy_records_to_table('walker', columns=['walker_id', 'name', 'capacity'],
+                                           records=[(walker_id, f'Г{walker_id}', walker_capacity) for walker_id, walker_capacity, _ in walkers])
+    await connection.copy_records_to_table('walker_shift', columns=['walker_id', 'day_of_week', 'shift_start', 'shift_end'],
+                                           records=[(walker_id, day_of_week, f'{start // 60:02d}:{start % 60:02d}', f'{end // 60:02d}:{end % 60:02d}')
+                                                    for walker_id, _, shifts in walkers for day_of_week, start, end in shifts])
+    await connection.execute('''INSERT INTO users (name, phone, flat_number, created_at)
+                                SELECT 'Хозяин ' || g, '89' || lpad(g::text, 9, '0'), g, now() FROM generate_series(1, $1) g''', len(walks))
+    await connection.execute('''INSERT INTO dog (dog_name, user_id, created_at) SELECT 'Собака', user_id, now() FROM users''')
+    await connection.copy_records_to_table('walk', columns=['walk_id', 'start_date', 'hour_minute', 'end_date', 'dog_id', 'status', 'price', 'who_walking'],
+                                           records=[(walk_id, start_date, f'{start_date:%H:%M}', start_date + timedelta(minutes=30), walk_id, 'ACSS', 500.0, 'вручную')
+                                                    for walk_id, start_date in walks])
+    await connection.execute('ANALYZE')
+    await connection.close()
+
+    db = DB(engine=engine)
+    started = time.perf_counter()
+    result = await db.schedule_walks(date_from=str(first_day), days=DAYS)
+    seconds = time.perf_counter() - started
+    await engine.dispose()
+    await admin.execute(f'DROP DATABASE {database}')
+    await admin.close()
+    return {'seconds': round(seconds, 3), 'assigned': result['assigned'], 'unassigned': len(result['unassigned'])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--walks', type=int, default=50000)
+    parser.add_argument('--walkers', type=int, default=2000)
+    parser.add_argument('--db', action='store_true', help='замерить ещё и DB.schedule_walks на отдельной базе')
+    parser.add_argument('--database', default='walks_dogs_scheduler')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    first_day = date.today() + timedelta(days=1)
+    walkers = make_walkers(args.walkers)
+    walks = make_walks(args.walks, first_day)
+    report = {'walks': args.walks, 'walkers': args.walkers, 'days': DAYS, 'memory': run_memory(walkers, walks)}
+    if args.db:
+        report['db'] = asyncio.run(run_db(walkers, walks, first_day, args.database))
+    print(json.dumps(report, ensure_ascii=False))
@@ -0,0 +1,64 @@
+"""
+Микробенчмарк сериализации ответа /get/walks
+
+Сравнивает старый путь (json.dumps в строку, которую FastAPI ещё раз кодирует как JSON)
+с ORJSONResponse на 10 000 заказах в формате get_all_walks.
+Запуск:
+    python -m benchmarks.bench_serialization --walks 10000 --repeat 20
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from modules.responses import ORJSONResponse
+
+
+def make_walks(count: int) -> list:
+    start = datetime(2024, 1, 30, 7, 0)
+    walks = []
+    for i in range(count):
+        start_date = start + timedelta(minutes=30 * (i % 33))
+        walks.append({
+            'walk_id': i + 1,
+            'start_date': start_date.isoformat(' ', 'minutes'),
+            'end_date': (start_date + timedelta(minutes=30)).isoformat(' ', 'minutes'),
+            'created_at': '2024-01-29 13:47',
+            'status': 'ACSS',
+            'price': 500.0,
+            'dog_name': f'Барбос {i}',
+            'dog_description': 'Особо активный, во время прогулки нужно с ним бегать',
+            'phone': '89664454560',
+            'user_name': 'Иван',
+            'who_walking': 'Петр'})
+    return walks
+
+
+def legacy(content: dict) -> bytes:
+    # Как было: маршрут возвращает строку, FastAPI оборачивает её в JSONResponse
+    return JSONResponse(json.dumps(content, ensure_ascii=False)).body
+
+
+def native(content: dict) -> bytes:
+    return ORJSONResponse(content).body
+
+
+def measure(function, content: dict, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(content)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {'median_ms': round(timings[len(timings) // 2] * 1000, 2), 'bytes': len(body)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--walks', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    content = {'walks': make_walks(args.walks)}
+    print(json.dumps({'walks': args.walks,
+                      'legacy': measure(legacy, content, args.repeat),
+                      'orjson': measure(native, content, args.repeat)}, ensure_ascii=False))
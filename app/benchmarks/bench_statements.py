@@ -0,0 +1,121 @@
+"""
+Бенчмарк запросов выдачи заказов и проверки существования заказа
+
+Создаёт отдельную базу, заполняет её как explain_check и сравнивает запросов в секунду:
+    legacy   - текст запроса со вставленными значениями (f-строка) и ORM-запрос, собираемый
+               на каждый вызов в AsyncSession, как было до заранее собранных запросов
+    prebuilt - текущие DB.get_all_walks и DB.check_exist_object с параметрами
+Оба варианта запускаются с кэшем подготовленных запросов asyncpg и без него (--prepared-cache 0
+повторяет режим пулера транзакций).
+Запуск:
+    python -m benchmarks.bench_statements --walks 100000 --queries 5000 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+import asyncpg
+from loguru import logger
+from sqlalchemy import and_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from benchmarks.explain_check import seed
+from models import Walk
+from modules.db import DB, WALKS_QUERY, walk_item
+from modules.migrations import upgrade_schema
+from settings import settings_db
+
+FIRST_DAY = datetime(2023, 1, 1)
+
+
+@logger.catch
+async def legacy_get_all_walks(engine, current_date: str, status: str) -> list:
+    # Как было: значения вставлены в текст, у каждой даты свой текст запроса
+    query = WALKS_QUERY + f" AND walk.start_date >= '{current_date} 00:00' AND walk.start_date <= '{current_date} 23:59' "
+    if status is not None:
+        query += f" AND walk.status = '{status}' "
+    async with AsyncSession(engine) as session:
+        return [walk_item(walk) for walk in await session.execute(text(query))]
+
+
+@logger.catch
+async def legacy_check_exist_walk(engine, values: dict) -> int:
+    # Как было: ORM-запрос собирается на каждый вызов
+    async with AsyncSession(engine) as session:
+        query = select(Walk.walk_id).where(and_(Walk.dog_id==values['dog_id'],Walk.start_date==values['start_date']))
+        object_id = (await session.execute(query)).all()
+        if len(object_id) == 0:
+            return None
+        else:
+            return object_id[0][0]
+
+
+async def measure(call, queries: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await call(i)
+
+    # Прогрев: соединения пула и подготовленные запросы
+    await asyncio.gather(*(one(i) for i in range(concurrency * 2)))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    return round(queries / (time.perf_counter() - started), 1)
+
+
+async def run(walks: int, queries: int, concurrency: int, database: str, prepared_cache: int) -> dict:
+    admin = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                  host=settings_db['host'], port=settings_db['port'], database='postgres')
+    await admin.execute(f'DROP DATABASE IF EXISTS {database}')
+    await admin.execute(f'CREATE DATABASE {database}')
+    url = f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{database}"
+
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(upgrade_schema)
+    connection = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                       host=settings_db['host'], port=settings_db['port'], database=database)
+    await seed(connection, walks)
+    await DB(engine=engine).ensure_partitions()
+    await connection.execute('ANALYZE')
+    keys = await connection.fetch('SELECT dog_id, start_date FROM walk ORDER BY random() LIMIT 1000')
+    await connection.close()
+    await engine.dispose()
+
+    random.seed(1)
+    days = [(FIRST_DAY + timedelta(days=random.randrange(730))).strftime('%Y-%m-%d') for _ in range(queries)]
+    statuses = [random.choice([None, 'ACSS']) for _ in range(queries)]
+    exists = [{'dog_id': keys[i % len(keys)]['dog_id'], 'start_date': keys[i % len(keys)]['start_date']} for i in range(queries)]
+
+    report = {'walks': walks, 'queries': queries, 'concurrency': concurrency}
+    for cache in sorted({prepared_cache, 0}, reverse=True):
+        engine = create_async_engine(url, pool_size=concurrency, connect_args={'prepared_statement_cache_size': cache})
+        db = DB(engine=engine)
+        report[f'prepared_cache_{cache}'] = {
+            'listing_qps': {
+                'legacy': await measure(lambda i: legacy_get_all_walks(engine, days[i % queries], statuses[i % queries]), queries, concurrency),
+                'prebuilt': await measure(lambda i: db.get_all_walks(current_date=days[i % queries], status=statuses[i % queries]), queries, concurrency),
+            },
+            'exists_qps': {
+                'legacy': await measure(lambda i: legacy_check_exist_walk(engine, exists[i % queries]), queries, concurrency),
+                'prebuilt': await measure(lambda i: db.check_exist_object(table_name='walk', values=exists[i % queries]), queries, concurrency),
+            },
+        }
+        await engine.dispose()
+
+    await admin.execute(f'DROP DATABASE {database}')
+    await admin.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--walks', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--database', default='walks_dogs_statements')
+    parser.add_argument('--prepared-cache', type=int, default=256, help='размер кэша подготовленных запросов asyncpg')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.walks, args.queries, args.concurrency, args.database, args.prepared_cache)), ensure_ascii=False, indent=2))
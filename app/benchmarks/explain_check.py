@@ -0,0 +1,142 @@
+"""
+Проверка планов запросов на индексы
+
+Создаёт отдельную базу, накатывает миграции, заполняет её (по умолчанию 1 000 000 прогулок),
+после чего через EXPLAIN проверяет, что горячие запросы DB читают таблицы по индексам.
+Запуск:
+    python -m benchmarks.explain_check --walks 1000000
+
+Печатает JSON с планом по каждому запросу, код возврата 1, если где-то остался Seq Scan
+"""
+import argparse
+import asyncio
+import json
+import sys
+import asyncpg
+from sqlalchemy.ext.asyncio import create_async_engine
+from modules.db import DB
+from modules.migrations import upgrade_schema
+from settings import settings_db
+
+# (название, запрос, таблица, маленькая ли таблица)
+# Для маленьких таблиц планировщик честно выбирает Seq Scan, поэтому для них
+# проверяется только то, что индекс пригоден, с выключенным enable_seqscan
+QUERIES = [
+    ('get_all_walks по дате', '''SELECT walk.walk_id, walk.start_date, dog.dog_name, users.phone
+                                 FROM dog
+                                    INNER JOIN walk ON dog.dog_id = walk.dog_id
+                                    INNER JOIN users ON dog.user_id = users.user_id
+                                 WHERE walk.start_date >= '2024-06-15 00:00' AND walk.start_date <= '2024-06-15 23:59' ''', 'walk', False),
+    ('get_all_walks по дате и статусу', '''SELECT walk.walk_id, walk.start_date, dog.dog_name, users.phone
+                                 FROM dog
+                                    INNER JOIN walk ON dog.dog_id = walk.dog_id
+                                    INNER JOIN users ON dog.user_id = users.user_id
+                                 WHERE walk.start_date >= '2024-06-15 00:00' AND walk.start_date <= '2024-06-15 23:59'
+                                    AND walk.status = 'ACSS' ''', 'walk', False),
+    ('страница заказов после курсора', '''SELECT walk.walk_id, walk.start_date, dog.dog_name, users.phone
+                                 FROM dog
+                                    INNER JOIN walk ON dog.dog_id = walk.dog_id
+                                    INNER JOIN users ON dog.user_id = users.user_id
+                                 WHERE (walk.start_date, walk.walk_id) > ('2024-06-15 14:00', 4242)
+                                 ORDER BY walk.start_date, walk.walk_id
+                                 LIMIT 101''', 'walk', False),
+    ('занятость времени', '''SELECT count(*) FROM walk
+                             WHERE walk.start_date = '2024-06-15 14:00' AND walk.status != 'RJCT' ''', 'walk', False),
+    ('существование заказа', '''SELECT walk.walk_id FROM walk
+                                WHERE walk.dog_id = 42 AND walk.start_date = '2024-06-15 14:00' ''', 'walk', False),
+    ('поиск хозяина', '''SELECT users.user_id FROM users
+                         WHERE users.phone = '89000000042' AND users.flat_number = 42''', 'users', False),
+    ('поиск собаки хозяина', '''SELECT dog.dog_id FROM dog
+                                WHERE dog.dog_name = 'Собака 42' AND dog.user_id = 42''', 'dog', False),
+    ('поиск собаки по кличке', '''SELECT dog.dog_id FROM dog WHERE dog.dog_name = 'Собака 42' ''', 'dog', False),
+    ('цена на время', '''SELECT time_price.price FROM time_price WHERE time_price.hour_minute = '14:00' ''', 'time_price', True),
+]
+
+
+def scans(plan: dict) -> list:
+    """
+    Функция, собирающая все узлы чтения таблиц из плана EXPLAIN (FORMAT JSON)
+    Parameters
+    ----------
+    plan: dict
+        Узел плана
+    Returns
+    -------
+    list
+        [(тип узла, таблица), ...]
+    """
+    found = []
+    if 'Relation Name' in plan:
+        found.append((plan['Node Type'], plan['Relation Name']))
+    for child in plan.get('Plans', []):
+        found.extend(scans(child))
+    return found
+
+
+async def seed(connection: asyncpg.Connection, walks: int) -> None:
+    users = max(walks // 20, 1000)
+    await connection.execute('''INSERT INTO users (name, phone, flat_number, created_at)
+                                SELECT 'Хозяин ' || g, '89' || lpad(g::text, 9, '0'), g, now()
+                                FROM generate_series(1, $1) g''', users)
+    await connection.execute('''INSERT INTO dog (dog_name, dog_description, user_id, created_at)
+                                SELECT 'Собака ' || user_id, NULL, user_id, now() FROM users''')
+    await connection.execute('''INSERT INTO time_price (hour_minute, price)
+                                SELECT to_char(time '07:00' + g * interval '30 minutes', 'HH24:MI'), 500
+                                FROM generate_series(0, 32) g''')
+    await connection.execute('''INSERT INTO walk (start_date, hour_minute, end_date, dog_id, status, created_at, price)
+                                SELECT s, to_char(s, 'HH24:MI'), s + interval '30 minutes', 1 + (g::bigint * 7919) % $2,
+                                       (ARRAY['CRTD', 'ACSS', 'RJCT'])[1 + g % 3], now(), 500
+                                FROM generate_series(1, $1) g,
+                                     LATERAL (SELECT timestamp '2023-01-01 07:00' + (g % 730) * interval '1 day'
+                                                                               + ((g / 730) % 33) * interval '30 minutes' AS s) slot
+                                ON CONFLICT DO NOTHING''', walks, users)
+    await connection.execute('ANALYZE')
+
+
+async def run(walks: int, database: str, keep: bool) -> bool:
+    admin = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                  host=settings_db['host'], port=settings_db['port'], database='postgres')
+    await admin.execute(f'DROP DATABASE IF EXISTS {database}')
+    await admin.execute(f'CREATE DATABASE {database}')
+
+    engine = create_async_engine(f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{database}")
+    async with engine.begin() as connection:
+        await connection.run_sync(upgrade_schema)
+
+    connection = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                       host=settings_db['host'], port=settings_db['port'], database=database)
+    await seed(connection, walks)
+    # Прошлые месяцы попали в walk_default, раскладываем их по месячным секциям
+    await DB(engine=engine).ensure_partitions()
+    await engine.dispose()
+    await connection.execute('ANALYZE')
+
+    ok = True
+    report = []
+    for name, query, table, small in QUERIES:
+        if small:
+            await connection.execute('SET enable_seqscan = off')
+        plan = json.loads(await connection.fetchval(f'EXPLAIN (FORMAT JSON) {query}'))[0]['Plan']
+        await connection.execute('RESET enable_seqscan')
+        # Секции walk называются walk_ГГГГ_ММ, их чтение считается чтением walk
+        found = [(node, relation) for node, relation in scans(plan) if relation == table or relation.startswith(f'{table}_')]
+        nodes = [node for node, _ in found]
+        passed = bool(nodes) and 'Seq Scan' not in nodes
+        ok = ok and passed
+        report.append({'query': name, 'table': table, 'scans': nodes, 'relations': sorted({relation for _, relation in found}), 'passed': passed})
+    await connection.close()
+
+    if not keep:
+        await admin.execute(f'DROP DATABASE {database}')
+    await admin.close()
+    print(json.dumps({'walks': walks, 'passed': ok, 'queries': report}, ensure_ascii=False, indent=2))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--walks', type=int, default=1000000)
+    parser.add_argument('--database', default='walks_dogs_explain')
+    parser.add_argument('--keep', action='store_true', help='не удалять базу после проверки')
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.walks, args.database, args.keep)) else 1)
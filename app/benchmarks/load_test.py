@@ -0,0 +1,281 @@
+"""
+Воспроизводимый нагрузочный тест API
+
+Создаёт отдельную базу, накатывает миграции и заполняет её реалистичными данными
+(тысячи хозяев и собак, несколько месяцев прогулок), после чего прогоняет сценарии
+и печатает JSON с пропускной способностью и задержками p50/p95/p99 по каждому маршруту.
+
+По умолчанию приложение из routings.py запускается в этом же процессе через ASGI-транспорт
+httpx, с движком, переключённым на базу теста. С --url запросы идут на уже запущенный
+сервер, тогда --database должна указывать на его базу.
+Запуск:
+    python -m benchmarks.load_test --scenario all --users 5000 --days 90 --requests 2000 --concurrency 50
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --database walks_dogs --no-seed
+
+Сценарии:
+    booking_storm       утренний наплыв заказов на ближайшие дни от новых хозяев
+    dispatcher_listing  диспетчер смотрит заказы и свободные места по датам
+    mass_repricing      массовая смена цен на фоне заказов
+    status_churn        смена статусов заказов по одному и пачками
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+import asyncpg
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+import routings
+from modules.migrations import upgrade_schema
+from settings import settings_db
+
+HALF_HOURS = [f'{7 + i // 2:02d}:{30 * (i % 2):02d}' for i in range(33)]
+STATUSES = ['CRTD', 'ACSS', 'RJCT']
+
+
+def percentile(timings: list, share: float) -> float:
+    """
+    Функция, возвращающая перцентиль по отсортированному списку задержек
+    Parameters
+    ----------
+    timings: list
+        Отсортированные задержки в секундах
+    share: float
+        Доля, пример: 0.95
+    Returns
+    -------
+    float
+        Задержка в миллисекундах
+    """
+    if not timings:
+        return 0.0
+    return round(timings[min(int(len(timings) * share), len(timings) - 1)] * 1000, 2)
+
+
+class Recorder:
+    """
+    Сборщик задержек по маршрутам одного сценария
+    Ошибки бизнес-логики (ответ с ключом 'error', например 'Время уже занято')
+    считаются отдельно от сбоев (HTTP-код не 200 или исключение клиента)
+    """
+
+    def __init__(self) -> None:
+        self.timings = {}
+        self.errors = {}
+        self.failures = {}
+
+    async def call(self, client: httpx.AsyncClient, method: str, route: str, **kwargs) -> dict|None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, route, **kwargs)
+        except httpx.HTTPError:
+            self.failures[route] = self.failures.get(route, 0) + 1
+            return None
+        self.timings.setdefault(route, []).append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.failures[route] = self.failures.get(route, 0) + 1
+            return None
+        body = response.json()
+        if isinstance(body, dict) and 'error' in body:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return body
+
+    def report(self, seconds: float) -> dict:
+        routes = {}
+        for route, timings in self.timings.items():
+            timings.sort()
+            routes[route] = {'requests': len(timings),
+                             'rps': round(len(timings) / seconds, 1),
+                             'errors': self.errors.get(route, 0),
+                             'failures': self.failures.get(route, 0),
+                             'p50_ms': percentile(timings, 0.50),
+                             'p95_ms': percentile(timings, 0.95),
+                             'p99_ms': percentile(timings, 0.99)}
+        total = sum(len(timings) for timings in self.timings.values())
+        return {'seconds': round(seconds, 3), 'requests': total, 'rps': round(total / seconds, 1), 'routes': routes}
+
+
+async def seed(connection: asyncpg.Connection, users: int, days: int, first_day: date) -> dict:
+    """
+    Функция, заполняющая базу хозяевами, собаками, ценами и прогулками
+    Прогулки занимают не больше settings_slot['capacity'] мест на время, таблица slot
+    пересчитывается по ним так же, как в миграции 0003
+    """
+    await connection.execute('TRUNCATE walk, slot, dog, users, time_price, cache_version RESTART IDENTITY CASCADE')
+    await connection.execute('''INSERT INTO users (name, phone, flat_number, created_at)
+                                SELECT 'Хозяин ' || g, '89' || lpad(g::text, 9, '0'), g, now()
+                                FROM generate_series(1, $1) g''', users)
+    await connection.execute('''INSERT INTO dog (dog_name, dog_description, user_id, created_at)
+                                SELECT 'Собака ' || g, NULL, 1 + (g - 1) % $1, now()
+                                FROM generate_series(1, $1 + $1 / 5) g''', users)
+    await connection.execute('''INSERT INTO time_price (hour_minute, price)
+                                SELECT to_char(time '07:00' + g * interval '30 minutes', 'HH24:MI'), 500
+                                FROM generate_series(0, 32) g''')
+    # Каждый день заполнен примерно наполовину: на каждое время по одной прогулке у случайной собаки
+    await connection.execute('''INSERT INTO walk (start_date, hour_minute, end_date, dog_id, status, created_at, price)
+                                SELECT s, to_char(s, 'HH24:MI'), s + interval '30 minutes',
+                                       1 + (g::bigint * 7919) % (SELECT count(*) FROM dog),
+                                       (ARRAY['CRTD', 'ACSS', 'RJCT'])[1 + g % 3], now(), 500
+                                FROM generate_series(0, $1 * 33 - 1) g,
+                                     LATERAL (SELECT $2::timestamp + (g / 33) * interval '1 day'
+                                                                   + (g % 33) * interval '30 minutes' AS s) slot
+                                ON CONFLICT DO NOTHING''', days, first_day)
+    await connection.execute('''INSERT INTO slot (start_date, hour_minute, busy)
+                                SELECT start_date, hour_minute, count(*) FROM walk
+                                WHERE status != 'RJCT'
+                                GROUP BY start_date, hour_minute''')
+    await connection.execute('ANALYZE')
+    return {'users': users,
+            'dogs': await connection.fetchval('SELECT count(*) FROM dog'),
+            'walks': await connection.fetchval('SELECT count(*) FROM walk')}
+
+
+async def booking_storm(client: httpx.AsyncClient, recorder: Recorder, requests: int, concurrency: int, first_day: date, days: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    morning = HALF_HOURS[:6]
+    run_id = int(time.time()) % 10**5
+
+    async def book(i: int):
+        day = first_day + timedelta(days=days + i % 7)
+        async with semaphore:
+            await recorder.call(client, 'POST', '/create/walk', params={'name': f'Нагрузка {i}',
+                                                                       'phone': f'87{run_id:05d}{i:04d}',
+                                                                       'dog_name': f'Собака {i}',
+                                                                       'flat_number': i,
+                                                                       'start_date': f'{day} {random.choice(morning)}'})
+    await asyncio.gather(*(book(i) for i in range(requests)))
+
+
+async def dispatcher_listing(client: httpx.AsyncClient, recorder: Recorder, requests: int, concurrency: int, first_day: date, days: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def look(i: int):
+        day = first_day + timedelta(days=random.randrange(days))
+        async with semaphore:
+            if i % 3 == 0:
+                await recorder.call(client, 'POST', '/get/walks', params={'current_date': str(day)})
+            elif i % 3 == 1:
+                await recorder.call(client, 'POST', '/get/walks', params={'current_date': str(day), 'status': random.choice(STATUSES), 'limit': 20})
+            else:
+                await recorder.call(client, 'GET', '/slots', params={'date_from': str(day), 'date_to': str(day + timedelta(days=6))})
+    await asyncio.gather(*(look(i) for i in range(requests)))
+
+
+async def mass_repricing(client: httpx.AsyncClient, recorder: Recorder, requests: int, concurrency: int, first_day: date, days: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = int(time.time()) % 10**5
+
+    async def reprice(i: int):
+        async with semaphore:
+            if i % 10 == 0:
+                price = random.choice([400, 500, 600])
+                await recorder.call(client, 'POST', '/create/price', json=[{'start': '07:00', 'end': '11:30', 'price': price},
+                                                                           {'start': '12:00', 'end': '23:00', 'price': price + 100}])
+            elif i % 10 < 4:
+                await recorder.call(client, 'PUT', '/update/price', params={'hour_minute': random.choice(HALF_HOURS),
+                                                                            'price': random.choice([450, 550, 650])})
+            else:
+                day = first_day + timedelta(days=days + 7 + i % 14)
+                await recorder.call(client, 'POST', '/create/walk', params={'name': f'Цена {i}',
+                                                                           'phone': f'86{run_id:05d}{i:04d}',
+                                                                           'dog_name': f'Собака {i}',
+                                                                           'flat_number': i,
+                                                                           'start_date': f'{day} {random.choice(HALF_HOURS)}'})
+    await asyncio.gather(*(reprice(i) for i in range(requests)))
+
+
+async def status_churn(client: httpx.AsyncClient, recorder: Recorder, requests: int, concurrency: int, first_day: date, days: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    walks = days * 33
+
+    def change(walk_id: int) -> dict:
+        status = random.choice(STATUSES)
+        return {'walk_id': walk_id, 'status': status, 'who_walking': 'Петр' if status == 'ACSS' else None}
+
+    async def churn(i: int):
+        async with semaphore:
+            if i % 5 == 0:
+                await recorder.call(client, 'PUT', '/update/walks/status',
+                                    json={'walks': [change(random.randint(1, walks)) for _ in range(20)]})
+            else:
+                await recorder.call(client, 'PUT', '/update/walk/status', params=change(random.randint(1, walks)))
+    await asyncio.gather(*(churn(i) for i in range(requests)))
+
+
+SCENARIOS = {
+    'booking_storm': booking_storm,
+    'dispatcher_listing': dispatcher_listing,
+    'mass_repricing': mass_repricing,
+    'status_churn': status_churn,
+}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    random.seed(args.seed)
+    first_day = date.today() + timedelta(days=1)
+    admin = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                  host=settings_db['host'], port=settings_db['port'], database='postgres')
+    if not args.url and not args.no_seed:
+        await admin.execute(f'DROP DATABASE IF EXISTS {args.database}')
+        await admin.execute(f'CREATE DATABASE {args.database}')
+    await admin.close()
+
+    engine = create_async_engine(f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{args.database}",
+                                 pool_size=min(args.concurrency, 20), max_overflow=0)
+    async with engine.begin() as connection:
+        await connection.run_sync(upgrade_schema)
+
+    data = None
+    if not args.no_seed:
+        connection = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                           host=settings_db['host'], port=settings_db['port'], database=args.database)
+        data = await seed(connection, args.users, args.days, first_day)
+        await connection.close()
+
+    scenarios = list(SCENARIOS) if args.scenario == 'all' else args.scenario.split(',')
+    report = {'mode': args.url or 'in-process', 'database': args.database, 'seed': data,
+              'requests': args.requests, 'concurrency': args.concurrency, 'scenarios': {}}
+
+    if args.url:
+        await engine.dispose()
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        lifespan = None
+    else:
+        routings.configure(engine)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=routings.app), base_url='http://load', timeout=args.timeout)
+        lifespan = routings.app.router.lifespan_context(routings.app)
+        await lifespan.__aenter__()
+
+    async with client:
+        for name in scenarios:
+            recorder = Recorder()
+            started = time.perf_counter()
+            await SCENARIOS[name](client, recorder, args.requests, args.concurrency, first_day, args.days)
+            report['scenarios'][name] = recorder.report(time.perf_counter() - started)
+
+    if lifespan:
+        await lifespan.__aexit__(None, None, None)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenario', default='all', help=f"all или через запятую: {','.join(SCENARIOS)}")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--requests', type=int, default=2000, help='запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--database', default='walks_dogs_load')
+    parser.add_argument('--url', default=None, help='адрес запущенного сервера вместо запуска в процессе')
+    parser.add_argument('--no-seed', action='store_true', help='не пересоздавать и не заполнять базу')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42, help='seed генератора случайных чисел')
+    parser.add_argument('--output', default=None, help='файл для JSON-отчёта')
+    args = parser.parse_args()
+    result = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(result)
+    print(result)
@@ -0,0 +1,204 @@
+"""
+Проверка совпадения хранилищ DB и MemoryDB и задержки их вызовов
+
+Создаёт отдельную базу, прогоняет один и тот же сценарий (цены, заказы, бронирования,
+статусы, выдача, гуляющие, отчёты, загрузка и выгрузка) через DB и через MemoryDB
+и сравнивает ответы. created_at не сравнивается, а выдача заказов за дату без курсора
+сравнивается без учёта порядка: в DB у неё нет ORDER BY.
+После сценария измеряет среднюю задержку горячих вызовов на каждом хранилище.
+Запуск:
+    python -m benchmarks.parity_check --calls 2000
+
+Печатает JSON с расхождениями и задержками, код возврата 1, если есть расхождения
+или ответ не совпал с EXPECTED
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+import asyncpg
+import orjson
+from modules.db import DB
+from modules.engine import make_engine
+from modules.memory_db import MemoryDB
+from modules.migrations import upgrade_schema
+from settings import settings_db
+
+DAY = '2030-09-02'
+NEXT_DAY = '2030-09-03'
+
+IMPORTED = [
+    {'name': 'Олег', 'phone': '89000000101', 'flat_number': '101', 'dog_name': 'Шарик', 'start_date': f'{DAY} 12:00'},
+    {'name': 'Олег', 'phone': '89000000101', 'flat_number': '101', 'dog_name': 'Шарик', 'start_date': f'{DAY} 12:00'},
+    {'name': 'Ира', 'phone': '89000000102', 'flat_number': '102', 'dog_name': 'Жучка', 'start_date': f'{DAY} 12:00', 'status': 'ACSS', 'price': '900'},
+    {'name': 'Ян', 'phone': '89000000103', 'flat_number': '103', 'dog_name': 'Тузик', 'start_date': f'{DAY} 12:00'},
+    {'name': 'Ян', 'phone': '89000000103', 'flat_number': 'сто', 'dog_name': 'Тузик', 'start_date': f'{DAY} 12:30'},
+    {'error': 'Неправильная строка'},
+    {'name': 'Ян', 'phone': '89000000103', 'flat_number': '103', 'dog_name': 'Тузик', 'start_date': f'{NEXT_DAY} 06:00'},
+]
+
+
+# Ответы, которые должны быть у обоих хранилищ, а не только совпадать между ними.
+# Заказы 1 и 5 назначены планировщиком, затем переназначены вручную: 1 - на Петра,
+# 5 - на имя не из списка гуляющих. Назначение без reassign считает Петра занятым заказом 1
+# и назначает заказ 5 на Анну
+EXPECTED = {
+    'назначение после ручного': {'assigned': 1, 'unassigned': [], 'load': {'Петр': 1, 'Анна': 1}},
+    'гуляющие после назначения': {1: 'Петр', 5: 'Анна'},
+}
+
+
+def walk_values(number: int, start_date: str) -> dict:
+    return {'name': f'Хозяин {number}', 'phone': f'8900{number:07d}', 'dog_name': f'Собака {number}',
+            'dog_description': None, 'flat_number': number, 'start_date': start_date}
+
+
+def without_created_at(result):
+    if isinstance(result, dict):
+        return {key: without_created_at(value) for key, value in result.items() if key != 'created_at'}
+    if isinstance(result, list):
+        return [without_created_at(value) for value in result]
+    return result
+
+
+async def imported_walks():
+    for walk in IMPORTED:
+        yield dict(walk)
+
+
+async def exported(storage, file_format: str) -> list:
+    body = b''.join([chunk async for chunk in storage.export_walks(date_from=DAY, date_to=NEXT_DAY, file_format=file_format)])
+    if file_format == 'csv':
+        # created_at - последняя колонка выгрузки
+        return [row[:-1] for row in csv.reader(io.StringIO(body.decode()))]
+    return without_created_at([orjson.loads(line) for line in body.splitlines()])
+
+
+async def scenario(storage) -> list:
+    """
+    Функция, прогоняющая сценарий через хранилище
+    Returns
+    -------
+    list
+        [(шаг, ответ)]
+    """
+    steps = []
+
+    async def step(name: str, call):
+        steps.append((name, without_created_at(await call)))
+
+    await step('цены по умолчанию', storage.create_price())
+    await step('цена на время', storage.create_price(hour_minute='10:00', price=700))
+    await step('цены по интервалам', storage.create_price(schedule=[{'start': '07:00', 'end': '08:30', 'price': 300}]))
+    await step('интервалы без времён', storage.create_price(schedule=[{'start': '02:00', 'end': '03:00', 'price': 300}]))
+    for number in range(1, 4):
+        await step(f'заказ {number}', storage.insert(table_name='walk', values=walk_values(number, f'{DAY} 10:00')))
+    await step('повтор заказа', storage.insert(table_name='walk', values=walk_values(1, f'{DAY} 10:00')))
+    await step('заказ без цены', storage.insert(table_name='walk', values=walk_values(4, f'{DAY} 05:00')))
+    await step('бронирование', storage.book_walks(values=walk_values(5, None),
+                                                   start_dates=[f'{DAY} 10:00', f'{DAY} 10:30', f'{NEXT_DAY} 07:00', f'{DAY} 10:30']))
+    await step('принятие', storage.update(table_name='walk', values={'walk_id': 1, 'status': 'ACSS', 'who_walking': None}))
+    await step('отказ', storage.update(table_name='walk', values={'walk_id': 2, 'status': 'RJCT', 'who_walking': None}))
+    await step('заказ на освободившееся время', storage.insert(table_name='walk', values=walk_values(3, f'{DAY} 10:00')))
+    await step('статусы пачкой', storage.update_walks(walks=[{'walk_id': 2, 'status': 'ACSS', 'who_walking': None},
+                                                            {'walk_id': 5, 'status': 'ACSS', 'who_walking': None},
+                                                            {'walk_id': 999, 'status': 'ACSS', 'who_walking': None}]))
+    await step('id за дату', storage.get_walk_ids(current_date=DAY))
+    await step('заказы за дату', storage.get_all_walks(current_date=DAY))
+    await step('заказы с версией', storage.get_versioned_walks(current_date=DAY))
+    await step('принятые заказы', storage.get_all_walks(status='ACSS'))
+    first = await storage.get_walks_page(current_date=DAY, limit=2)
+    steps.append(('первая страница', without_created_at(first)))
+    await step('вторая страница', storage.get_walks_page(current_date=DAY, limit=2, cursor=first['next_cursor']))
+    await step('свободные места', storage.get_slots(date_from=DAY, date_to=NEXT_DAY))
+    await step('гуляющий', storage.create_walker(name='Петр', capacity=2, shifts=[{'day_of_week': 1, 'start': '09:00', 'end': '12:00'}]))
+    await step('второй гуляющий', storage.create_walker(name='Анна', capacity=1, shifts=[{'day_of_week': 1, 'start': '10:00', 'end': '11:00'},
+                                                                                      {'day_of_week': 2, 'start': '07:00', 'end': '09:00'}]))
+    await step('назначение', storage.schedule_walks(date_from=DAY, days=2))
+    await step('переназначение', storage.schedule_walks(date_from=DAY, days=2, reassign=True))
+    await step('ручное переназначение', storage.update_walks(walks=[{'walk_id': 1, 'status': 'ACSS', 'who_walking': 'Петр'},
+                                                                    {'walk_id': 5, 'status': 'ACSS', 'who_walking': 'Соседка'}]))
+    await step('назначение после ручного', storage.schedule_walks(date_from=DAY, days=2))
+    walks = await storage.get_all_walks(current_date=DAY)
+    steps.append(('гуляющие после назначения', {walk['walk_id']: walk['who_walking'] for walk in walks if walk['walk_id'] in (1, 5)}))
+    await step('загрузка', storage.import_walks(imported_walks(), allow_past=False))
+    await step('повторная загрузка', storage.import_walks(imported_walks(), allow_past=False))
+    await step('выдача после загрузки', storage.get_all_walks(current_date=DAY))
+    await step('выгрузка csv', exported(storage, 'csv'))
+    await step('выгрузка ndjson', exported(storage, 'ndjson'))
+    await storage.refresh_reports()
+    await step('выручка по дням', storage.get_revenue_report(date_from=DAY, date_to=NEXT_DAY, period='day'))
+    await step('выручка по месяцам', storage.get_revenue_report(date_from=DAY, date_to=NEXT_DAY))
+    await step('отчёт по гуляющим', storage.get_walkers_report(date_from=DAY, date_to=NEXT_DAY))
+    await step('занятость', storage.get_utilization_report(date_from=DAY, date_to=NEXT_DAY))
+    return steps
+
+
+def unordered(result):
+    if isinstance(result, list):
+        return sorted(result, key=lambda walk: walk['walk_id'])
+    return result
+
+
+async def latency(storage, calls: int) -> dict:
+    """
+    Средняя задержка вызова в микросекундах, вызовы идут по одному
+    """
+    async def measure(call) -> float:
+        started = time.perf_counter()
+        for i in range(calls):
+            await call(i)
+        return round((time.perf_counter() - started) / calls * 1e6, 1)
+
+    return {
+        'insert_walk_us': await measure(lambda i: storage.insert(table_name='walk', values=walk_values(1000 + i, f'2030-10-{1 + i % 28:02d} {7 + i // 28 % 16:02d}:00'))),
+        'get_all_walks_us': await measure(lambda i: storage.get_all_walks(current_date=f'2030-10-{1 + i % 28:02d}')),
+        'get_walks_page_us': await measure(lambda i: storage.get_walks_page(current_date=f'2030-10-{1 + i % 28:02d}', limit=10)),
+        'get_slots_us': await measure(lambda i: storage.get_slots(date_from=f'2030-10-{1 + i % 28:02d}', date_to=f'2030-10-{1 + i % 28:02d}')),
+    }
+
+
+async def run(calls: int, database: str) -> dict:
+    admin = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                  host=settings_db['host'], port=settings_db['port'], database='postgres')
+    await admin.execute(f'DROP DATABASE IF EXISTS {database}')
+    await admin.execute(f'CREATE DATABASE {database}')
+    engine = make_engine(database=database)
+    async with engine.begin() as connection:
+        await connection.run_sync(upgrade_schema)
+    db = DB(engine=engine)
+    await db.ensure_partitions()
+    memory_db = MemoryDB()
+
+    expected, actual = await scenario(db), await scenario(memory_db)
+    mismatches = []
+    wrong = []
+    for (name, sql_result), (_, memory_result) in zip(expected, actual):
+        if name in ('заказы за дату', 'выдача после загрузки'):
+            sql_result, memory_result = unordered(sql_result), unordered(memory_result)
+        if name == 'заказы с версией':
+            sql_result, memory_result = [{**result, 'walks': unordered(result['walks'])} for result in (sql_result, memory_result)]
+        if sql_result != memory_result:
+            mismatches.append({'step': name, 'db': sql_result, 'memory_db': memory_result})
+        if name in EXPECTED and (sql_result != EXPECTED[name] or memory_result != EXPECTED[name]):
+            wrong.append({'step': name, 'expected': EXPECTED[name], 'db': sql_result, 'memory_db': memory_result})
+    report = {'steps': len(expected), 'mismatches': mismatches, 'wrong': wrong,
+              'latency': {'db': await latency(db, calls), 'memory_db': await latency(memory_db, calls)}}
+
+    await engine.dispose()
+    await admin.execute(f'DROP DATABASE {database}')
+    await admin.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--database', default='walks_dogs_parity')
+    args = parser.parse_args()
+    report = asyncio.run(run(args.calls, args.database))
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    sys.exit(1 if report['mismatches'] or report['wrong'] else 0)
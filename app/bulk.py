@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import json
+import sys
+from modules.bulk import BULK_FORMATS, read_file, read_walks
+from modules.checks import checks
+from modules.db import DB
+from modules.engine import make_engine
+
+
+async def import_walks(path: str, file_format: str, allow_past: bool) -> dict:
+    engine = make_engine()
+    result = await DB(engine=engine).import_walks(walks=read_walks(read_file(path), file_format=file_format), allow_past=allow_past)
+    await engine.dispose()
+    return result
+
+
+async def export_walks(path: str, file_format: str, date_from: str, date_to: str) -> dict:
+    check_range = checks.check_report_range(date_from=date_from, date_to=date_to)
+    if 'error' in check_range:
+        return check_range
+    engine = make_engine()
+    output = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    written = 0
+    try:
+        async for chunk in DB(engine=engine).export_walks(date_from=check_range['date_from'], date_to=check_range['date_to'],
+                                                          file_format=file_format):
+            await asyncio.to_thread(output.write, chunk)
+            written += len(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        await engine.dispose()
+    return {'path': path, 'bytes': written}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Загрузка и выгрузка заказов в CSV или NDJSON через COPY')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='загрузить заказы из файла')
+    import_parser.add_argument('path', help="файл с заказами, '-' для stdin")
+    import_parser.add_argument('--format', choices=list(BULK_FORMATS), default='csv')
+    import_parser.add_argument('--allow-past', action='store_true', help='разрешить прошедшие даты (загрузка истории)')
+    export_parser = commands.add_parser('export', help='выгрузить заказы за период в файл')
+    export_parser.add_argument('path', help="файл для выгрузки, '-' для stdout")
+    export_parser.add_argument('--format', choices=list(BULK_FORMATS), default='csv')
+    export_parser.add_argument('--date-from', required=True, help="начало периода: год, месяц или день, например '2024-01'")
+    export_parser.add_argument('--date-to', required=True, help="конец периода (включительно): год, месяц или день")
+    args = parser.parse_args()
+    if args.command == 'import':
+        result = asyncio.run(import_walks(args.path, args.format, args.allow_past))
+    else:
+        result = asyncio.run(export_walks(args.path, args.format, args.date_from, args.date_to))
+    print(json.dumps(result, ensure_ascii=False), file=sys.stderr if args.path == '-' and args.command == 'export' else sys.stdout)
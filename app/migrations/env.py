@@ -0,0 +1,33 @@
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+from models import Base
+from settings import settings_db
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get('connection') is None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{settings_db['database']}")
+    async with engine.connect() as connection:
+        await connection.run_sync(run_migrations)
+        await connection.commit()
+    await engine.dispose()
+
+
+connection = config.attributes.get('connection')
+if connection is not None:
+    run_migrations(connection)
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,60 @@
+"""initial
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-02-12 12:00:00
+
+Схема, которую создавал Base.metadata.create_all до появления миграций
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(1024), nullable=False),
+        sa.Column('phone', sa.String(12), nullable=False),
+        sa.Column('flat_number', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        'dog',
+        sa.Column('dog_id', sa.Integer(), primary_key=True),
+        sa.Column('dog_name', sa.String(1024), nullable=False),
+        sa.Column('dog_description', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        'time_price',
+        sa.Column('time_id', sa.Integer(), primary_key=True),
+        sa.Column('hour_minute', sa.String(5), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'walk',
+        sa.Column('walk_id', sa.Integer(), primary_key=True),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('hour_minute', sa.String(5), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('dog_id', sa.Integer(), sa.ForeignKey('dog.dog_id'), nullable=False),
+        sa.Column('status', sa.String(4), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('who_walking', sa.String(10), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('walk')
+    op.drop_table('time_price')
+    op.drop_table('dog')
+    op.drop_table('users')
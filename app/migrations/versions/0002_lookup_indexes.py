@@ -0,0 +1,61 @@
+"""lookup indexes and unique constraints
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-02-12 12:30:00
+
+Индексы под запросы DB: поиск заказов по дате и статусу, проверка занятости времени,
+поиск хозяина, собаки, заказа и цены. Уникальные ограничения нужны для upsert'ов
+при бронировании и при создании цен
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_version',
+        sa.Column('name', sa.String(64), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+    )
+    # До появления ограничений строки могли задублироваться, оставляем самую раннюю.
+    # Собаки дублей хозяина переходят к оставленному хозяину, заказы дублей собаки - к оставленной собаке,
+    # поэтому дубли снимаются по порядку: хозяева, собаки, заказы
+    op.execute('''DELETE FROM time_price a USING time_price b
+                  WHERE a.hour_minute = b.hour_minute AND a.time_id > b.time_id''')
+    op.execute('''UPDATE dog SET user_id = kept.user_id
+                  FROM users duplicate
+                     INNER JOIN LATERAL (SELECT min(user_id) AS user_id FROM users
+                                         WHERE phone = duplicate.phone AND flat_number = duplicate.flat_number) kept ON true
+                  WHERE dog.user_id = duplicate.user_id AND kept.user_id < duplicate.user_id''')
+    op.execute('''DELETE FROM users a USING users b
+                  WHERE a.phone = b.phone AND a.flat_number = b.flat_number AND a.user_id > b.user_id''')
+    op.execute('''UPDATE walk SET dog_id = kept.dog_id
+                  FROM dog duplicate
+                     INNER JOIN LATERAL (SELECT min(dog_id) AS dog_id FROM dog
+                                         WHERE dog_name = duplicate.dog_name AND user_id = duplicate.user_id) kept ON true
+                  WHERE walk.dog_id = duplicate.dog_id AND kept.dog_id < duplicate.dog_id''')
+    op.execute('''DELETE FROM dog a USING dog b
+                  WHERE a.dog_name = b.dog_name AND a.user_id = b.user_id AND a.dog_id > b.dog_id''')
+    op.execute('''DELETE FROM walk a USING walk b
+                  WHERE a.dog_id = b.dog_id AND a.start_date = b.start_date AND a.walk_id > b.walk_id''')
+    op.create_unique_constraint('time_price_hour_minute_key', 'time_price', ['hour_minute'])
+    op.create_unique_constraint('users_phone_flat_number_key', 'users', ['phone', 'flat_number'])
+    op.create_unique_constraint('dog_dog_name_user_id_key', 'dog', ['dog_name', 'user_id'])
+    op.create_unique_constraint('walk_dog_id_start_date_key', 'walk', ['dog_id', 'start_date'])
+    op.create_index('ix_walk_start_date_status', 'walk', ['start_date', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_walk_start_date_status', table_name='walk')
+    op.drop_constraint('walk_dog_id_start_date_key', 'walk')
+    op.drop_constraint('dog_dog_name_user_id_key', 'dog')
+    op.drop_constraint('users_phone_flat_number_key', 'users')
+    op.drop_constraint('time_price_hour_minute_key', 'time_price')
+    op.drop_table('cache_version')
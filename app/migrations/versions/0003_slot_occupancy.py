@@ -0,0 +1,35 @@
+"""slot occupancy
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-02-19 12:00:00
+
+Счётчик занятых мест на каждое время начала прогулки. Заполняется по уже
+существующим заказам, кроме отклонённых
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'slot',
+        sa.Column('start_date', sa.DateTime(), primary_key=True),
+        sa.Column('hour_minute', sa.String(5), nullable=False),
+        sa.Column('busy', sa.Integer(), nullable=False),
+    )
+    op.execute('''INSERT INTO slot (start_date, hour_minute, busy)
+                  SELECT start_date, min(hour_minute), count(*)
+                  FROM walk
+                  WHERE status != 'RJCT'
+                  GROUP BY start_date''')
+
+
+def downgrade() -> None:
+    op.drop_table('slot')
@@ -0,0 +1,24 @@
+"""walk keyset index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-02-26 12:00:00
+
+Индекс под постраничную выдачу заказов по (start_date, walk_id)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_walk_start_date_walk_id', 'walk', ['start_date', 'walk_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_walk_start_date_walk_id', table_name='walk')
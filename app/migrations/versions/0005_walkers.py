@@ -0,0 +1,47 @@
+"""walkers
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-03-04 12:00:00
+
+Гуляющие с вместимостью на день и сменами по дням недели,
+ссылка заказа на назначенного гуляющего
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'walker',
+        sa.Column('walker_id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(10), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.UniqueConstraint('name', name='walker_name_key'),
+    )
+    op.create_table(
+        'walker_shift',
+        sa.Column('shift_id', sa.Integer(), primary_key=True),
+        sa.Column('walker_id', sa.Integer(), sa.ForeignKey('walker.walker_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day_of_week', sa.Integer(), nullable=False),
+        sa.Column('shift_start', sa.String(5), nullable=False),
+        sa.Column('shift_end', sa.String(5), nullable=False),
+    )
+    op.create_index('ix_walker_shift_day_of_week', 'walker_shift', ['day_of_week'])
+    op.add_column('walk', sa.Column('walker_id', sa.Integer(), sa.ForeignKey('walker.walker_id'), nullable=True))
+    op.create_index('ix_walk_walker_id', 'walk', ['walker_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_walk_walker_id', table_name='walk')
+    op.drop_column('walk', 'walker_id')
+    op.drop_index('ix_walker_shift_day_of_week', table_name='walker_shift')
+    op.drop_table('walker_shift')
+    op.drop_table('walker')
@@ -0,0 +1,59 @@
+"""daily report rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-03-11 12:00:00
+
+Дневные сводки по заказам: количество и выручка по статусам, по гуляющим
+и занятость по времени. Сводка дня пересчитывается, когда версия списка заказов
+на эту дату в cache_version расходится с report_state. Для уже существующих заказов
+версии создаются здесь, чтобы первый пересчёт заполнил сводки за всё время
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'report_state',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'report_day_status',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('status', sa.String(4), primary_key=True),
+        sa.Column('walks', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'report_day_walker',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('who_walking', sa.String(10), primary_key=True),
+        sa.Column('walks', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'report_day_slot',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('hour_minute', sa.String(5), primary_key=True),
+        sa.Column('walks', sa.Integer(), nullable=False),
+    )
+    op.execute('''INSERT INTO cache_version (name, version)
+                  SELECT 'walk:' || to_char(start_date, 'YYYY-MM-DD'), 1
+                  FROM walk
+                  GROUP BY 1
+                  ON CONFLICT (name) DO NOTHING''')
+
+
+def downgrade() -> None:
+    op.drop_table('report_day_slot')
+    op.drop_table('report_day_walker')
+    op.drop_table('report_day_status')
+    op.drop_table('report_state')
@@ -0,0 +1,79 @@
+"""walk partitions
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-03-18 12:00:00
+
+Таблица walk секционируется по месяцам start_date. Создаются секции на месяцы,
+в которых есть заказы, и на MONTHS_AHEAD месяцев вперёд, а также секция walk_default для заказов
+за пределами созданных секций. Дальше секции создаёт DB.ensure_partitions.
+Первичный ключ секционированной таблицы обязан содержать start_date, поэтому он
+становится (walk_id, start_date), нумерация walk_id продолжается той же последовательностью
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+COLUMNS = 'walk_id, start_date, hour_minute, end_date, dog_id, status, created_at, price, who_walking, walker_id'
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def create_walk_table(name: str, partitioned: bool) -> None:
+    op.execute(f'''CREATE TABLE {name} (
+                       walk_id integer NOT NULL DEFAULT nextval('walk_walk_id_seq'),
+                       start_date timestamp without time zone NOT NULL,
+                       hour_minute varchar(5) NOT NULL,
+                       end_date timestamp without time zone NOT NULL,
+                       dog_id integer NOT NULL,
+                       status varchar(4) NOT NULL,
+                       created_at timestamp without time zone,
+                       price double precision NOT NULL,
+                       who_walking varchar(10),
+                       walker_id integer
+                   ){' PARTITION BY RANGE (start_date)' if partitioned else ''}''')
+
+
+def replace_walk_table(name: str, primary_key: list) -> None:
+    # Последовательность отвязывается от старой таблицы, чтобы пережить её удаление
+    op.execute('ALTER SEQUENCE walk_walk_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE walk')
+    op.execute(f'ALTER TABLE {name} RENAME TO walk')
+    op.execute('ALTER SEQUENCE walk_walk_id_seq OWNED BY walk.walk_id')
+    op.create_primary_key('walk_pkey', 'walk', primary_key)
+    op.create_unique_constraint('walk_dog_id_start_date_key', 'walk', ['dog_id', 'start_date'])
+    op.create_foreign_key('walk_dog_id_fkey', 'walk', 'dog', ['dog_id'], ['dog_id'])
+    op.create_foreign_key('walk_walker_id_fkey', 'walk', 'walker', ['walker_id'], ['walker_id'])
+    op.create_index('ix_walk_start_date_status', 'walk', ['start_date', 'status'])
+    op.create_index('ix_walk_start_date_walk_id', 'walk', ['start_date', 'walk_id'])
+    op.create_index('ix_walk_walker_id', 'walk', ['walker_id'])
+
+
+def upgrade() -> None:
+    current = date.today().replace(day=1)
+    months = set(op.get_bind().execute(sa.text("SELECT DISTINCT date_trunc('month', start_date)::date FROM walk")).scalars())
+    months |= {add_months(current, ahead) for ahead in range(MONTHS_AHEAD + 1)}
+
+    create_walk_table('walk_partitioned', partitioned=True)
+    for month in sorted(months):
+        op.execute(f'''CREATE TABLE walk_{month:%Y_%m} PARTITION OF walk_partitioned
+                       FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')''')
+    op.execute('CREATE TABLE walk_default PARTITION OF walk_partitioned DEFAULT')
+    op.execute(f'INSERT INTO walk_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM walk')
+    replace_walk_table('walk_partitioned', ['walk_id', 'start_date'])
+
+
+def downgrade() -> None:
+    create_walk_table('walk_plain', partitioned=False)
+    op.execute(f'INSERT INTO walk_plain ({COLUMNS}) SELECT {COLUMNS} FROM walk')
+    replace_walk_table('walk_plain', ['walk_id'])
@@ -0,0 +1,32 @@
+"""idempotency keys
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-03-25 12:00:00
+
+Сохранённые ответы на запросы с заголовком Idempotency-Key.
+Пустой response означает, что запрос с этим ключом ещё выполняется
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'idempotency_key',
+        sa.Column('key', sa.String(64), primary_key=True),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('response', sa.Text()),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_idempotency_key_created_at', 'idempotency_key', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('idempotency_key')
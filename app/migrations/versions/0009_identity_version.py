@@ -0,0 +1,47 @@
+"""identity version
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-04-01 12:00:00
+
+Версия 'identity' в cache_version, которую триггеры увеличивают при изменении
+ключей хозяина (phone, flat_number) или собаки (dog_name, user_id) и при удалении.
+По ней кэш хозяев и собак в воркерах узнаёт, что его записи устарели.
+Upsert бронирования ничего в этих полях не меняет и версию не трогает
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('''CREATE FUNCTION bump_identity_version() RETURNS trigger AS $$
+                  BEGIN
+                      INSERT INTO cache_version (name, version) VALUES ('identity', 1)
+                      ON CONFLICT (name) DO UPDATE SET version = cache_version.version + 1;
+                      RETURN NULL;
+                  END
+                  $$ LANGUAGE plpgsql''')
+    op.execute('''CREATE TRIGGER users_identity_updated AFTER UPDATE ON users FOR EACH ROW
+                  WHEN ((OLD.user_id, OLD.phone, OLD.flat_number) IS DISTINCT FROM (NEW.user_id, NEW.phone, NEW.flat_number))
+                  EXECUTE FUNCTION bump_identity_version()''')
+    op.execute('''CREATE TRIGGER users_identity_deleted AFTER DELETE OR TRUNCATE ON users FOR EACH STATEMENT
+                  EXECUTE FUNCTION bump_identity_version()''')
+    op.execute('''CREATE TRIGGER dog_identity_updated AFTER UPDATE ON dog FOR EACH ROW
+                  WHEN ((OLD.dog_id, OLD.dog_name, OLD.user_id) IS DISTINCT FROM (NEW.dog_id, NEW.dog_name, NEW.user_id))
+                  EXECUTE FUNCTION bump_identity_version()''')
+    op.execute('''CREATE TRIGGER dog_identity_deleted AFTER DELETE OR TRUNCATE ON dog FOR EACH STATEMENT
+                  EXECUTE FUNCTION bump_identity_version()''')
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER dog_identity_deleted ON dog')
+    op.execute('DROP TRIGGER dog_identity_updated ON dog')
+    op.execute('DROP TRIGGER users_identity_deleted ON users')
+    op.execute('DROP TRIGGER users_identity_updated ON users')
+    op.execute('DROP FUNCTION bump_identity_version()')
@@ -1,5 +1,5 @@
-from sqlalchemy import ForeignKey
-from sqlalchemy import Column, String, Text, Integer,DateTime, Float
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
+from sqlalchemy import Column, String, Text, Integer,DateTime, Date, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped
 from datetime import datetime
@@ -8,6 +8,7 @@ Base = declarative_base()
 
 class Users(Base):
     __tablename__ = "users"
+    __table_args__ = (UniqueConstraint('phone', 'flat_number', name='users_phone_flat_number_key'),)
     user_id: Mapped[int] = Column(Integer,primary_key=True)
     name: Mapped[str] = Column(String(1024),nullable=False)
     phone: Mapped[str] = Column(String(12),nullable=False)
@@ -16,6 +17,7 @@ class Users(Base):
 
 class Dog(Base):
     __tablename__ = "dog"
+    __table_args__ = (UniqueConstraint('dog_name', 'user_id', name='dog_dog_name_user_id_key'),)
     dog_id: Mapped[int] = Column(Integer,primary_key=True)
     dog_name: Mapped[int] = Column(String(1024),nullable=False)
     dog_description: Mapped[str] = Column(Text)
@@ -24,14 +26,20 @@ class Dog(Base):
 
 class Time_price(Base):
     __tablename__ = "time_price"
+    __table_args__ = (UniqueConstraint('hour_minute', name='time_price_hour_minute_key'),)
     time_id: Mapped[int] = Column(Integer,primary_key=True)
     hour_minute: Mapped[str] = Column(String(5),nullable=False)
     price: Mapped[float] = Column(Float,nullable=False)
 
 class Walk(Base):
     __tablename__ = "walk"
-    walk_id: Mapped[int] = Column(Integer,primary_key=True)
-    start_date = Column(DateTime(),nullable=False)
+    __table_args__ = (UniqueConstraint('dog_id', 'start_date', name='walk_dog_id_start_date_key'),
+                      Index('ix_walk_start_date_status', 'start_date', 'status'),
+                      Index('ix_walk_start_date_walk_id', 'start_date', 'walk_id'),
+                      Index('ix_walk_walker_id', 'walker_id'),
+                      {'postgresql_partition_by': 'RANGE (start_date)'})
+    walk_id: Mapped[int] = Column(Integer,primary_key=True,autoincrement=True)
+    start_date = Column(DateTime(),primary_key=True)
     hour_minute: Mapped[str]  = Column(String(5),nullable=False)
     end_date = Column(DateTime(),nullable=False)
     dog_id: Mapped[int] = Column(Integer, ForeignKey("dog.dog_id"),nullable=False)
@@ -39,4 +47,65 @@ class Walk(Base):
     created_at = Column(DateTime(),default=datetime.now)
     price: Mapped[float] = Column(Float,nullable=False)
     who_walking: Mapped[str] = Column(String(10))
+    walker_id: Mapped[int] = Column(Integer, ForeignKey("walker.walker_id"),nullable=True)
 
+class Cache_version(Base):
+    __tablename__ = "cache_version"
+    name: Mapped[str] = Column(String(64),primary_key=True)
+    version: Mapped[int] = Column(Integer,nullable=False,default=0)
+
+class Slot(Base):
+    __tablename__ = "slot"
+    start_date = Column(DateTime(),primary_key=True)
+    hour_minute: Mapped[str] = Column(String(5),nullable=False)
+    busy: Mapped[int] = Column(Integer,nullable=False,default=0)
+
+class Walker(Base):
+    __tablename__ = "walker"
+    __table_args__ = (UniqueConstraint('name', name='walker_name_key'),)
+    walker_id: Mapped[int] = Column(Integer,primary_key=True)
+    name: Mapped[str] = Column(String(10),nullable=False)
+    capacity: Mapped[int] = Column(Integer,nullable=False)
+    created_at = Column(DateTime(),default=datetime.now)
+
+class Walker_shift(Base):
+    __tablename__ = "walker_shift"
+    __table_args__ = (Index('ix_walker_shift_day_of_week', 'day_of_week'),)
+    shift_id: Mapped[int] = Column(Integer,primary_key=True)
+    walker_id: Mapped[int] = Column(Integer, ForeignKey("walker.walker_id", ondelete="CASCADE"),nullable=False)
+    day_of_week: Mapped[int] = Column(Integer,nullable=False)
+    shift_start: Mapped[str] = Column(String(5),nullable=False)
+    shift_end: Mapped[str] = Column(String(5),nullable=False)
+
+class Report_state(Base):
+    __tablename__ = "report_state"
+    day = Column(Date(),primary_key=True)
+    version: Mapped[int] = Column(Integer,nullable=False)
+
+class Report_day_status(Base):
+    __tablename__ = "report_day_status"
+    day = Column(Date(),primary_key=True)
+    status: Mapped[str] = Column(String(4),primary_key=True)
+    walks: Mapped[int] = Column(Integer,nullable=False)
+    revenue: Mapped[float] = Column(Float,nullable=False)
+
+class Report_day_walker(Base):
+    __tablename__ = "report_day_walker"
+    day = Column(Date(),primary_key=True)
+    who_walking: Mapped[str] = Column(String(10),primary_key=True)
+    walks: Mapped[int] = Column(Integer,nullable=False)
+    revenue: Mapped[float] = Column(Float,nullable=False)
+
+class Report_day_slot(Base):
+    __tablename__ = "report_day_slot"
+    day = Column(Date(),primary_key=True)
+    hour_minute: Mapped[str] = Column(String(5),primary_key=True)
+    walks: Mapped[int] = Column(Integer,nullable=False)
+
+class Idempotency_key(Base):
+    __tablename__ = "idempotency_key"
+    __table_args__ = (Index('ix_idempotency_key_created_at', 'created_at'),)
+    key: Mapped[str] = Column(String(64),primary_key=True)
+    fingerprint: Mapped[str] = Column(String(64),nullable=False)
+    response: Mapped[str] = Column(Text)
+    created_at = Column(DateTime(),nullable=False)
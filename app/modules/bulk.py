@@ -0,0 +1,116 @@
+import asyncio
+import csv
+import sys
+import orjson
+from settings import settings_bulk
+
+# Форматы выгрузки и загрузки заказов и их типы содержимого
+BULK_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+async def read_file(path: str):
+    """
+    Функция, читающая файл (или stdin, если path == '-') частями по read_size байт
+    Returns
+    -------
+    AsyncIterator[bytes]
+    """
+    file = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        while chunk := await asyncio.to_thread(file.read, settings_bulk['read_size']):
+            yield chunk
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+
+
+async def read_lines(chunks):
+    """
+    Функция, разбивающая поток байт на строки без символа перевода строки
+    В памяти находится только текущая часть потока и недочитанная строка
+    Parameters
+    ----------
+    chunks: AsyncIterator[bytes]
+        Пример: request.stream() или read_file('walks.csv')
+    Returns
+    -------
+    AsyncIterator[bytes]
+    """
+    tail = b''
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    if tail:
+        yield tail
+
+
+async def read_csv(chunks):
+    """
+    Функция, читающая заказы из CSV с заголовком
+    Запись может занимать несколько строк, если поле в кавычках содержит перевод строки,
+    но не больше max_record_size байт
+    Returns
+    -------
+    AsyncIterator[dict]
+        Заказы {колонка: значение} по одному или {'error': str} для нечитаемой записи
+    """
+    header = None
+    pending, quotes, size = [], 0, 0
+    async for line in read_lines(chunks):
+        pending.append(line)
+        quotes += line.count(b'"')
+        size += len(line)
+        if quotes % 2:
+            # Незакрытая кавычка не должна собрать в одну запись весь остаток файла
+            if size > settings_bulk['max_record_size']:
+                pending, quotes, size = [], 0, 0
+                yield {'error': 'Незакрытые кавычки'}
+            continue
+        record = b'\n'.join(pending)
+        pending, quotes, size = [], 0, 0
+        try:
+            values = next(csv.reader([record.decode('utf-8-sig' if header is None else 'utf-8')]), None)
+        except (UnicodeDecodeError, csv.Error):
+            yield {'error': 'Неправильная строка'}
+            continue
+        if not values:
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+        elif len(values) != len(header):
+            yield {'error': 'Неправильное количество полей'}
+        else:
+            yield dict(zip(header, values))
+    if pending:
+        yield {'error': 'Незакрытые кавычки'}
+
+
+async def read_ndjson(chunks):
+    """
+    Функция, читающая заказы из NDJSON, по объекту JSON на строку
+    Returns
+    -------
+    AsyncIterator[dict]
+        Заказы по одному или {'error': str} для нечитаемой строки
+    """
+    async for line in read_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            walk = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield {'error': 'Неправильная строка'}
+            continue
+        if not isinstance(walk, dict) or 'error' in walk:
+            yield {'error': 'Неправильная строка'}
+        else:
+            yield walk
+
+
+def read_walks(chunks, file_format: str):
+    """
+    Функция, читающая заказы из потока байт в формате file_format ('csv' или 'ndjson')
+    """
+    return read_csv(chunks) if file_format == 'csv' else read_ndjson(chunks)
@@ -1,7 +1,24 @@
+from calendar import monthrange
 from datetime import datetime
 import re
 from loguru import logger
 
+# Шаблоны компилируются один раз при импорте модуля
+TIME_WALK_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}")
+TIME_WALK_DOTTED_PATTERN = re.compile(r"\d{2}.\d{2}.\d{4} \d{2}:\d{2}")
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+DATE_DOTTED_PATTERN = re.compile(r"\d{2}.\d{2}.\d{4}")
+HOUR_MINUTE_PATTERN = re.compile(r"\d{1,2}:\d{2}")
+YEAR_PATTERN = re.compile(r"\d{4}")
+MONTH_PATTERN = re.compile(r"\d{4}-\d{2}")
+# Границы времени прогулки в формате ЧЧ:ММ, сравниваются как строки
+WALK_FIRST_TIME = '07:00'
+WALK_LAST_TIME = '23:00'
+# Поля заказа в выгрузке и загрузке
+# Номер квартиры хранится в users.flat_number (integer)
+FLAT_NUMBER_MAX = 2147483647
+IMPORTED_WALK_FIELDS = ('name', 'phone', 'flat_number', 'dog_name', 'dog_description', 'start_date', 'status', 'who_walking', 'price')
+
 
 class Checks:
 
@@ -22,22 +39,46 @@ class Checks:
             {'check_time': str}
         """
 
-        if re.fullmatch(r"\d{2}.\d{2}.\d{4} \d{2}:\d{2}",check_time):
-            check_time_format = f"{check_time[6:10]}-{check_time[3:5]}-{check_time[0:2]}{check_time[10:]}"
-    
+        return self.time_walk(check_time=check_time, now=datetime.now())
+
+    @logger.catch 
+    def check_times_walk(self, check_times: list) -> list:
+        """
+        Функция, проверяющая сразу много времён начала прогулок
+        Текущее время берётся один раз на весь список
+        Parameters
+        ----------
+        check_times: list
+            Даты начала прогулок
+            Пример: ['2024-01-30 14:30', '31.01.2024 14:30']
+        Returns
+        -------
+        list
+            Результат check_time_walk по каждому элементу
+        """
+        now = datetime.now()
+        time_walk = self.time_walk
+        return [time_walk(check_time=check_time, now=now) for check_time in check_times]
+
+    def time_walk(self, check_time: str, now: datetime) -> dict:
+        if TIME_WALK_DOTTED_PATTERN.fullmatch(check_time):
+            check_time = f"{check_time[6:10]}-{check_time[3:5]}-{check_time[0:2]}{check_time[10:]}"
+        elif not TIME_WALK_PATTERN.fullmatch(check_time):
+            return {'error': 'Неправильный формат времени'}
         try:
-            check_time_format = datetime.strptime(check_time,"%Y-%m-%d %H:%M")
-        except:
-            return 'Неправильный формат времени'
-        
+            check_time_format = datetime.fromisoformat(check_time)
+        except ValueError:
+            return {'error': 'Неправильный формат времени'}
+
         error = ''
-        if check_time_format < datetime.now():
+        if check_time_format < now:
             error += 'Дата должна быть в будущем. '
-        if datetime.strptime(check_time[11:], '%H:%M') < datetime.strptime("07:00", '%H:%M') or datetime.strptime(check_time[11:], '%H:%M') > datetime.strptime("23:00", '%H:%M'):
+        hour_minute = check_time[11:]
+        if hour_minute < WALK_FIRST_TIME or hour_minute > WALK_LAST_TIME:
             error += 'Время выгула должно быть не раньше 7 утра и не позже 11 вечера. '
         if check_time[14:] != '00' and check_time[14:] != '30':
             error += 'Время выгула должно начинаться либо в начале часа, либо в половину. '
-        
+
         if error != '':
             return {'error': error}
         else:
@@ -60,11 +101,13 @@ class Checks:
             {'current_date': str}
         """
 
-        if re.fullmatch(r"\d{2}.\d{2}.\d{4}",current_date):
+        if DATE_DOTTED_PATTERN.fullmatch(current_date):
             current_date = f"{current_date[6:]}-{current_date[3:5]}-{current_date[0:2]}"
+        elif not DATE_PATTERN.fullmatch(current_date):
+            return {'error': 'Неправильный формат времени'}
         try:
-            datetime.strptime(current_date,"%Y-%m-%d")
-        except:
+            datetime.fromisoformat(current_date)
+        except ValueError:
             return {'error': 'Неправильный формат времени'}
         return {'current_date':current_date}
     
@@ -84,6 +127,26 @@ class Checks:
             или
             {'check_phone': str}
         """
+        return self.phone(check_phone=check_phone)
+
+    @logger.catch 
+    def check_phones(self, check_phones: list) -> list:
+        """
+        Функция, проверяющая сразу много телефонов
+        Parameters
+        ----------
+        check_phones: list
+            Номера телефонов
+            Пример: ['89772234567', '+79772234567']
+        Returns
+        -------
+        list
+            Результат check_phone по каждому элементу
+        """
+        phone = self.phone
+        return [phone(check_phone=check_phone) for check_phone in check_phones]
+
+    def phone(self, check_phone: str) -> dict:
         if len(check_phone) > 12 or len(check_phone) < 11:
             return {'error': 'Неправильная длина номера телефона'}
         if check_phone[:2] != "+7" and check_phone[0] != '8':
@@ -91,4 +154,166 @@ class Checks:
         if len(check_phone) == 12:
             check_phone = '8'+check_phone[2:]
         return {'check_phone': check_phone}
-        
\ No newline at end of file
+        
+    @logger.catch 
+    def check_hour_minute(self, hour_minute: str) -> dict:
+        """
+        Функция, проверяющая время прогулки без даты
+        Parameters
+        ----------
+        hour_minute: str
+            Время в формате ЧЧ:ММ
+            Пример: '14:30'
+        Returns
+        -------
+        dict
+            {'error': str}
+            или
+            {'hour_minute': str}
+        """
+        if not HOUR_MINUTE_PATTERN.fullmatch(hour_minute):
+            return {'error': 'Неправильный формат времени'}
+        if len(hour_minute) == 4:
+            hour_minute = '0'+hour_minute
+        if hour_minute < WALK_FIRST_TIME or hour_minute > WALK_LAST_TIME:
+            return {'error': 'Время выгула должно быть не раньше 7 утра и не позже 11 вечера. '}
+        if hour_minute[3:] != '00' and hour_minute[3:] != '30':
+            return {'error': 'Время выгула должно начинаться либо в начале часа, либо в половину. '}
+        return {'hour_minute': hour_minute}
+
+    @logger.catch 
+    def check_report_range(self, date_from: str, date_to: str) -> dict:
+        """
+        Функция, проверяющая период отчёта. Границы можно указать годом, месяцем или днём
+        Parameters
+        ----------
+        date_from: str
+            Начало периода, берётся первый день
+            Пример: '2024', '2024-01' или '2024-01-15'
+        date_to: str
+            Конец периода, берётся последний день
+            Пример: '2024', '2024-03' или '2024-03-15'
+        Returns
+        -------
+        dict
+            {'error': str}
+            или
+            {'date_from': '2024-01-01', 'date_to': '2024-03-31'}
+        """
+        bounds = []
+        for value, last in ((date_from, False), (date_to, True)):
+            if YEAR_PATTERN.fullmatch(value):
+                value = f"{value}-12-31" if last else f"{value}-01-01"
+            elif MONTH_PATTERN.fullmatch(value):
+                if not 1 <= int(value[5:]) <= 12:
+                    return {'error': 'Неправильный формат времени'}
+                value = f"{value}-{monthrange(int(value[:4]), int(value[5:]))[1]:02d}" if last else f"{value}-01"
+            else:
+                check_date = self.check_current_date(current_date=value)
+                if 'error' in check_date:
+                    return check_date
+                value = check_date['current_date']
+            bounds.append(value)
+        if bounds[0] > bounds[1]:
+            return {'error': 'Начало периода должно быть не позже конца'}
+        return {'date_from': bounds[0], 'date_to': bounds[1]}
+
+    @logger.catch 
+    def check_status(self, status: str, who_walking: str|None = None) -> dict:
+        """
+        Функция, проверяющая новый статус заказа
+        Parameters
+        ----------
+        status: str
+            Статус заказа
+            Либо 'ACSS' (принято), либо 'RJCT' (отклонено), либо 'CRTD' (создано)
+        who_walking: str
+            Имя гуляющего, обязательно для статуса 'ACSS'
+        Returns
+        -------
+        dict
+            {'error': str}
+            или
+            {'status': str}
+        """
+        if len(status) > 4:
+            return {'error': 'Неправильный статус'}
+        if status == 'ACSS' and (not who_walking or who_walking == ''):
+            return {'error': 'Укажите имя гуляющего'}
+        return {'status': status}
+
+    @logger.catch 
+    def check_imported_walks(self, walks: list, allow_past: bool = False) -> list:
+        """
+        Функция, проверяющая сразу много заказов из выгрузки с теми же правилами, что и при создании заказа
+        Текущее время берётся один раз на весь список
+        Parameters
+        ----------
+        walks: list
+            Заказы, значения строками (CSV) или значениями JSON
+            Пример: [{'name': 'Иван', 'phone': '89558883344', 'flat_number': '1', 'dog_name': 'Барбос',
+                      'dog_description': None, 'start_date': '2024-01-30 14:00', 'status': 'ACSS',
+                      'who_walking': 'Петр', 'price': '500'}]
+        allow_past: bool
+            Разрешить прошедшие даты, чтобы загружать историю заказов
+        Returns
+        -------
+        list
+            По каждому заказу
+            {'error': str}
+            или
+            {'name': 'Иван', 'phone': '89558883344', 'flat_number': 1, 'dog_name': 'Барбос',
+             'dog_description': None, 'start_date': '2024-01-30 14:00', 'status': 'ACSS',
+             'who_walking': 'Петр', 'price': 500.0}
+            Статус по умолчанию 'CRTD', цена по умолчанию берётся из time_price при загрузке
+        """
+        now = datetime.min if allow_past else datetime.now()
+        return [self.imported_walk(walk=walk, now=now) for walk in walks]
+
+    # Непредвиденная ошибка в одной строке не должна оставить всю пачку без ответа
+    @logger.catch(default={'error': 'Неправильная строка'})
+    def imported_walk(self, walk: dict, now: datetime) -> dict:
+        if 'error' in walk:
+            return walk
+        values = {}
+        for field in IMPORTED_WALK_FIELDS:
+            value = walk.get(field)
+            if value is not None:
+                value = str(value).strip()
+            values[field] = value or None
+        for field in ('name', 'phone', 'flat_number', 'dog_name', 'start_date'):
+            if values[field] is None:
+                return {'error': f'Не заполнено поле {field}'}
+        if len(values['name']) > 1024 or len(values['dog_name']) > 1024:
+            return {'error': 'Слишком длинное имя'}
+        check_phone = self.phone(check_phone=values['phone'])
+        if 'error' in check_phone:
+            return check_phone
+        values['phone'] = check_phone['check_phone']
+        flat_number = values['flat_number']
+        if not (flat_number.isascii() and flat_number.isdigit()) or int(flat_number) > FLAT_NUMBER_MAX:
+            return {'error': 'Неправильный номер квартиры'}
+        values['flat_number'] = int(values['flat_number'])
+        check_time = self.time_walk(check_time=values['start_date'], now=now)
+        if 'error' in check_time:
+            return check_time
+        values['start_date'] = check_time['check_time']
+        values['status'] = values['status'] or 'CRTD'
+        if values['status'] not in ('CRTD', 'ACSS', 'RJCT'):
+            return {'error': 'Неправильный статус'}
+        check_status = self.check_status(status=values['status'], who_walking=values['who_walking'])
+        if 'error' in check_status:
+            return check_status
+        if values['who_walking'] is not None and len(values['who_walking']) > 10:
+            return {'error': 'Слишком длинное имя гуляющего'}
+        if values['price'] is not None:
+            try:
+                values['price'] = float(values['price'])
+            except ValueError:
+                return {'error': 'Неправильная цена'}
+            if not 0 < values['price'] < float('inf'):
+                return {'error': 'Неправильная цена'}
+        return values
+
+
+checks = Checks()
@@ -1,16 +1,222 @@
+import asyncio
+import gzip
+import os
 import re
-from sqlalchemy import and_, insert, text, update
+import orjson
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import Counter
+from itertools import groupby
+from functools import lru_cache
+from sqlalchemy import and_, bindparam, column, func, insert, literal, select, text, update
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy import values as values_list
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from models import *
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from datetime import date, datetime, timedelta
 from loguru import logger
+from modules.checks import checks
+from modules.events import WALKS_CHANNEL
+from modules.identity_cache import identity_cache
+from modules.metrics import tagged
+from modules.price_cache import price_cache
+from modules.replicas import replicas
+from modules.scheduler import assign_day, minutes
+from modules.storage import Storage
+from settings import settings_bulk, settings_partitions, settings_reports, settings_slot
 
-class DB:
-    def __init__(self,engine) -> None:
+# Все времена начала прогулок: с 07:00 до 23:00 каждые полчаса
+HALF_HOURS = [f"{hour:02d}:{minute}" for hour in range(7,24) for minute in ('00', '30')][:-1]
+
+WALKS_QUERY = ''' SELECT  
+                    walk.walk_id,
+                    walk.start_date,
+                    walk.end_date,
+                    walk.created_at,
+                    walk.status,
+                    walk.price,
+                    dog.dog_name,
+                    dog.dog_description, 
+                    users.phone, 
+                    users.name as user_name,
+                    walk.who_walking
+            FROM dog
+                INNER JOIN walk
+                    ON dog.dog_id = walk.dog_id
+                INNER JOIN users
+                    ON dog.user_id = users.user_id
+            WHERE (1=1)
+        '''
+
+
+@lru_cache(maxsize=None)
+def walks_statement(by_date: bool, by_status: bool, after: bool, limit: bool) -> TextClause:
+    """
+    Функция, собирающая запрос выдачи заказов один раз на каждый набор фильтров
+    Все значения передаются параметрами, поэтому у одного набора фильтров текст запроса
+    всегда один и тот же: SQLAlchemy не компилирует его заново, а asyncpg берёт
+    подготовленный на сервере запрос из своего кэша на соединении
+    """
+    query = WALKS_QUERY
+    if by_date:
+        query += " AND walk.start_date >= :date_from AND walk.start_date < :date_to "
+    if by_status:
+        query += " AND walk.status = :status "
+    if after:
+        query += " AND (walk.start_date, walk.walk_id) > (:after_date, :after_id) "
+    if after or limit:
+        query += " ORDER BY walk.start_date, walk.walk_id "
+    if limit:
+        query += " LIMIT :limit "
+    return text(query)
+
+
+def walks_query(current_date: str = None, status: str = None, after: tuple = None, limit: int = None) -> tuple:
+    """
+    Функция, выбирающая запрос для выдачи заказов и его параметры
+    Parameters
+    ----------
+    current_date: str
+        Дата, по которой будет осуществлён поиск заказов
+        Пример: '2024-01-30'
+    status: str
+        Статус заказа
+        Пример: 'CRTD'
+    after: tuple
+        (start_date, walk_id) заказа, после которого начинается выдача
+    limit: int
+        Максимальное количество заказов
+    Returns
+    -------
+    tuple
+        (запрос, словарь параметров)
+    """
+    params = {}
+    if current_date is not None:
+        params['date_from'] = datetime.strptime(current_date,"%Y-%m-%d")
+        params['date_to'] = params['date_from'] + timedelta(days=1)
+    if status is not None:
+        params['status'] = status
+    if after is not None:
+        params['after_date'], params['after_id'] = after
+    if limit is not None:
+        params['limit'] = limit
+    return walks_statement(current_date is not None, status is not None, after is not None, limit is not None), params
+
+
+# Запросы check_exist_object, собранные один раз, и имена их параметров
+EXIST_QUERIES = {
+    'users': (select(Users.user_id).where(and_(Users.phone == bindparam('phone'), Users.flat_number == bindparam('flat_number'))),
+              ('phone', 'flat_number')),
+    'dog': (select(Dog.dog_id).where(and_(Dog.dog_name == bindparam('dog_name'), Dog.user_id == bindparam('user_id'))), ('dog_name', 'user_id')),
+    'walk': (select(Walk.walk_id).where(and_(Walk.dog_id == bindparam('dog_id'), Walk.start_date == bindparam('start_date'))),
+             ('dog_id', 'start_date')),
+    'time_price': (select(Time_price.price).where(Time_price.hour_minute == bindparam('hour_minute')), ('hour_minute',)),
+}
+
+
+def walk_item(walk) -> dict:
+    """
+    Функция, превращающая строку запроса WALKS_QUERY в словарь заказа
+    """
+    return {
+        'walk_id': walk[0],
+        'start_date': walk[1].isoformat(' ', 'minutes'),
+        'end_date': walk[2].isoformat(' ', 'minutes'),
+        'created_at': walk[3].isoformat(' ', 'minutes'),
+        'status': walk[4],
+        'price': walk[5],
+        'dog_name': walk[6],
+        'dog_description':walk[7],
+        'phone': walk[8],
+        'user_name':walk[9],
+        'who_walking': walk[10]}
+
+
+# Ключ advisory-блокировки пересчёта сводок: пересчитывает один воркер, остальные пропускают
+REPORTS_LOCK = 3
+REPORT_PERIODS = {'day': 'YYYY-MM-DD', 'month': 'YYYY-MM', 'year': 'YYYY'}
+# Ключ advisory-блокировки создания и архивации секций walk
+PARTITIONS_LOCK = 4
+PARTITION_NAME = re.compile(r'walk_(\d{4})_(\d{2})')
+PARTITIONS_QUERY = '''SELECT child.relname
+                      FROM pg_inherits
+                         INNER JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                      WHERE pg_inherits.inhparent = 'walk'::regclass'''
+
+# Выгрузка заказов: сначала поля загрузки (IMPORTED_WALK_FIELDS), чтобы выгрузку можно было загрузить обратно
+EXPORT_QUERY = '''SELECT users.name, users.phone, users.flat_number, dog.dog_name, dog.dog_description,
+                         to_char(walk.start_date, 'YYYY-MM-DD HH24:MI') AS start_date,
+                         walk.status, walk.who_walking, walk.price, walk.walk_id,
+                         to_char(walk.end_date, 'YYYY-MM-DD HH24:MI') AS end_date,
+                         to_char(walk.created_at, 'YYYY-MM-DD HH24:MI') AS created_at
+                  FROM walk
+                     INNER JOIN dog ON dog.dog_id = walk.dog_id
+                     INNER JOIN users ON users.user_id = dog.user_id
+                  WHERE walk.start_date >= $1 AND walk.start_date < $2
+                  ORDER BY walk.start_date, walk.walk_id'''
+# Каждая строка - объект JSON. В CSV с символами \x01 и \x02 вместо кавычки и разделителя
+# COPY не экранирует JSON, так как в тексте JSON эти символы записываются как \u0001 и \u0002
+EXPORT_NDJSON_QUERY = f'SELECT row_to_json(walks) FROM ({EXPORT_QUERY}) walks'
+EXPORT_OPTIONS = {'csv': {'format': 'csv', 'header': True},
+                  'ndjson': {'format': 'csv', 'quote': '\x01', 'delimiter': '\x02'}}
+IMPORT_COLUMNS = ('line', 'name', 'phone', 'flat_number', 'dog_name', 'dog_description',
+                  'start_date', 'hour_minute', 'status', 'who_walking', 'price')
+
+
+def walks_version_name(day: datetime|str) -> str:
+    """
+    Функция, возвращающая имя версии списка заказов на дату в таблице cache_version
+    Пример: walks_version_name('2024-01-30') == 'walk:2024-01-30'
+    """
+    if isinstance(day, datetime):
+        return f"walk:{day:%Y-%m-%d}"
+    return f"walk:{day[:10]}"
+
+
+def walker_by_name(who_walking):
+    """
+    Функция, возвращающая подзапрос walker_id гуляющего по имени для записи who_walking вне schedule_walks
+    Имя не из списка гуляющих (или None) даёт NULL, поэтому walker_id не указывает на прежнего гуляющего
+    Пример: update(Walk).values(who_walking='Петр', walker_id=walker_by_name('Петр'))
+    """
+    return select(Walker.walker_id).where(Walker.name == who_walking).scalar_subquery()
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    Функция, сдвигающая первое число месяца на months месяцев
+    Пример: add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    """
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def encode_cursor(start_date: datetime, walk_id: int) -> str:
+    """
+    Функция, кодирующая позицию заказа в курсор для следующей страницы
+    """
+    return urlsafe_b64encode(f"{start_date.isoformat()}|{walk_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple|None:
+    """
+    Функция, раскодирующая курсор в (start_date, walk_id). Для неправильного курсора возвращает None
+    """
+    try:
+        start_date, walk_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(start_date), int(walk_id)
+    except ValueError:
+        return None
+
+
+class DB(Storage):
+    def __init__(self,engine: AsyncEngine) -> None:
          self.engine = engine
 
     @logger.catch
-    def insert(self, table_name: str, values: dict) -> dict:
+    @tagged
+    async def insert(self, table_name: str, values: dict) -> dict:
         """
         Функция для добавления данных в базу данных
         Parameters
@@ -36,19 +242,17 @@ class DB:
                 {'message': 'Объект сохранен',
                     'object_id': int}
         """
-        if table_name != 'walk':
-            object_id = self.check_exist_object(table_name=table_name,values=values)
-        else: 
-            object_id = None
+        if table_name == 'walk':
+            return await self.book_walk(values=values)
+        object_id = await self.check_exist_object(table_name=table_name,values=values)
         if object_id is not None:
             return {
                 'message': 'Объект уже существует',
                 'object_id': object_id}
-        with self.engine.connect() as connection:
-            session = Session(bind=self.engine)
+        async with AsyncSession(self.engine) as session:
             match table_name:
                 case 'users':
-                    object_id = session.scalars(
+                    object_id = (await session.scalars(
                         insert(Users).returning(Users.user_id),
                         [
                             {
@@ -57,9 +261,9 @@ class DB:
                                 'flat_number': values['flat_number']
                             }
                         ]
-                    ).all()
+                    )).all()
                 case 'dog':
-                    object_id = session.scalars(
+                    object_id = (await session.scalars(
                         insert(Dog).returning(Dog.dog_id),
                         [
                             {
@@ -68,9 +272,9 @@ class DB:
                                 'user_id': values['user_id']
                             }
                         ]
-                    ).all()
+                    )).all()
                 case 'time_price':
-                    object_id = session.scalars(
+                    object_id = (await session.scalars(
                         insert(Time_price).returning(Time_price.time_id),
                         [
                             {
@@ -78,47 +282,538 @@ class DB:
                                 'price': values['price']
                             }
                         ]
-                    ).all()
-                case 'walk':
-                    busy_time = session.query(Walk.start_date).filter(and_(Walk.start_date==values['start_date'],Walk.status!='RJCT')).all()
-                    if len(busy_time) >= 2:
-                        return {'error': 'Время уже занято'}
+                    )).all()
+                    await price_cache.bump(session=session)
+
+            await session.commit()
+        if table_name == 'time_price':
+            price_cache.invalidate()
+        return {'message': 'Объект сохранен',
+                'object_id': object_id[0]}
+
+    @logger.catch
+    @tagged
+    async def book_walk(self, values: dict) -> dict:
+        """
+        Функция бронирования прогулки в одной транзакции
+        Место на время занимается атомарным увеличением счётчика в таблице slot
+        (строка времени остаётся заблокированной до конца транзакции), поэтому
+        параллельные бронирования не могут превысить вместимость времени.
+        Хозяин и собака создаются (или находятся) через upsert
+        Parameters
+        ----------
+        values: dict
+            Словарь из значений, необходимый для создания заказа
+            Пример: {'start_date': '2024-01-30 14:00',
+                        'phone': '89664454560',
+                        'name': 'Иван',
+                        'flat_number': 1,
+                        'dog_name': 'Барбос',
+                        'dog_description': 'Особо активный, во время прогулки нужно с ним бегать'}
+        Returns
+        -------
+        dict
+            Если заказ уже существует, то
+                {'message': 'Объект уже существует',
+                    'object_id': int}
+            Если заказ создан, то
+                {'message': 'Объект сохранен',
+                    'object_id': int}
+            Иначе
+                {'error': str}
+        """
+        start_date = datetime.strptime(values['start_date'],"%Y-%m-%d %H:%M")
+        hour_minute = values['start_date'][11:]
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                price = await price_cache.get(session=session, hour_minute=hour_minute)
+                if not price:
+                    return {'error': 'Вы не создали цену для времени'}
+                if not await self.take_slots(session=session, slots=[(start_date, hour_minute)]):
+                    return {'error': 'Время уже занято'}
 
-                    user_id = self.insert(table_name='users', values={'name': values['name'], 'phone': values['phone'],'flat_number': values['flat_number']})['object_id']
-                    dog_id = self.insert(table_name='dog', values={'dog_name': values['dog_name'],'dog_description': values['dog_description'],'user_id': user_id})['object_id']
+                dog_id = await self.resolve_dog(session=session, values=values)
 
-                    price = self.check_exist_object(table_name='time_price', values={'hour_minute': values['start_date'][11:]})
+                object_id = (await session.execute(
+                    pg_insert(Walk).values(
+                        start_date=start_date,
+                        hour_minute=hour_minute,
+                        dog_id=dog_id,
+                        status='CRTD',
+                        price=price,
+                        end_date=start_date + timedelta(minutes=30),
+                        created_at=datetime.now()
+                    ).on_conflict_do_nothing(constraint='walk_dog_id_start_date_key').returning(Walk.walk_id)
+                )).scalar()
+                if object_id is None:
+                    await self.release_slots(session=session, start_dates=[start_date])
+                    object_id = (await session.execute(
+                        select(Walk.walk_id).where(and_(Walk.dog_id==dog_id,Walk.start_date==start_date))
+                    )).scalar()
+                    return {
+                        'message': 'Объект уже существует',
+                        'object_id': object_id}
+                await self.notify_walks(session=session, events=[
+                    {'event': 'created', 'walk_id': object_id, 'start_date': start_date, 'status': 'CRTD'}])
+                await self.bump_walks_versions(session=session, start_dates=[start_date])
+        return {'message': 'Объект сохранен',
+                'object_id': object_id}
 
-                    if not price:
-                        return {'error': 'Вы не создали цену для времени'}
+    @logger.catch
+    @tagged
+    async def book_walks(self, values: dict, start_dates: list) -> list:
+        """
+        Функция бронирования нескольких прогулок одной собаки в одной транзакции
+        Хозяин и собака находятся один раз, места на все времена занимаются одним
+        запросом, заказы создаются одной многострочной вставкой
+        Parameters
+        ----------
+        values: dict
+            Словарь из значений хозяина и собаки
+            Пример: {'phone': '89664454560',
+                        'name': 'Иван',
+                        'flat_number': 1,
+                        'dog_name': 'Барбос',
+                        'dog_description': 'Особо активный, во время прогулки нужно с ним бегать'}
+        start_dates: list
+            Даты начала прогулок
+            Пример: ['2024-01-30 14:00', '2024-01-31 14:00']
+        Returns
+        -------
+        list
+            Результат по каждому времени в порядке start_dates
+            [
+                {'start_date': '2024-01-30 14:00', 'message': 'Объект сохранен', 'object_id': 1},
+                {'start_date': '2024-01-31 14:00', 'error': 'Время уже занято'},
+                ...
+            ]
+        """
+        results = {}
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                prices = await price_cache.get_all(session=session)
+                wanted = {}
+                for start_date in sorted(set(start_dates)):
+                    if not prices.get(start_date[11:]):
+                        results[start_date] = {'error': 'Вы не создали цену для времени'}
+                    else:
+                        wanted[datetime.strptime(start_date,"%Y-%m-%d %H:%M")] = start_date
 
-                    object_id = self.check_exist_object(table_name='walk',values={'start_date': values['start_date'],'dog_id': dog_id})
-                    if object_id is not None:
-                        return {
-                            'message': 'Объект уже существует',
-                            'object_id': object_id}
-                    
-                    object_id = session.scalars(
-                        insert(Walk).returning(Walk.walk_id),
-                        [
+                if wanted:
+                    dog_id = await self.resolve_dog(session=session, values=values)
+                    existing = (await session.execute(
+                        select(Walk.start_date, Walk.walk_id).where(and_(Walk.dog_id==dog_id,Walk.start_date.in_(list(wanted))))
+                    )).all()
+                    for start_date, walk_id in existing:
+                        results[wanted.pop(start_date)] = {'message': 'Объект уже существует', 'object_id': walk_id}
+
+                if wanted:
+                    taken = await self.take_slots(session=session, slots=[(start_date, wanted[start_date][11:]) for start_date in wanted])
+                    for start_date in list(wanted):
+                        if start_date not in taken:
+                            results[wanted.pop(start_date)] = {'error': 'Время уже занято'}
+
+                if wanted:
+                    created = (await session.execute(
+                        pg_insert(Walk).values([
                             {
-                                'start_date': values['start_date'],
-                                'hour_minute': values['start_date'][11:],
+                                'start_date': start_date,
+                                'hour_minute': wanted[start_date][11:],
                                 'dog_id': dog_id,
                                 'status': 'CRTD',
-                                'price': price,
-                                'end_date': datetime.strptime(values['start_date'],"%Y-%m-%d %H:%M") + timedelta(minutes=30)
+                                'price': prices[wanted[start_date][11:]],
+                                'end_date': start_date + timedelta(minutes=30),
+                                'created_at': datetime.now()
                             }
-                        ]
-                    ).all()
+                            for start_date in wanted
+                        ]).on_conflict_do_nothing(constraint='walk_dog_id_start_date_key').returning(Walk.start_date, Walk.walk_id)
+                    )).all()
+                    for start_date, walk_id in created:
+                        results[wanted.pop(start_date)] = {'message': 'Объект сохранен', 'object_id': walk_id}
+                    if created:
+                        await self.notify_walks(session=session, events=[
+                            {'event': 'created', 'walk_id': walk_id, 'start_date': start_date, 'status': 'CRTD'}
+                            for start_date, walk_id in created])
+                        await self.bump_walks_versions(session=session, start_dates=[start_date for start_date, _ in created])
+                    # Заказ на это время успели создать параллельно, место возвращаем
+                    if wanted:
+                        await self.release_slots(session=session, start_dates=list(wanted))
+                        for start_date in wanted.values():
+                            results[start_date] = {'error': 'Объект уже существует'}
+        return [{'start_date': start_date, **results[start_date]} for start_date in start_dates]
 
-            session.commit()
-            session.close()
-        return {'message': 'Объект сохранен',
-                'object_id': object_id[0]}
+    @tagged
+    async def resolve_dog(self, session: AsyncSession, values: dict) -> int:
+        """
+        Функция, находящая или создающая хозяина и его собаку одним запросом
+        Для постоянных клиентов dog_id берётся из identity_cache без запросов к базе
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия в открытой транзакции
+        values: dict
+            Словарь с name, phone, flat_number, dog_name и dog_description
+        Returns
+        -------
+        int
+            dog_id собаки этого хозяина
+        """
+        dog_id = await identity_cache.get(session=session, phone=values['phone'], flat_number=values['flat_number'], dog_name=values['dog_name'])
+        if dog_id is not None:
+            return dog_id
+        insert_user = pg_insert(Users).values(name=values['name'], phone=values['phone'], flat_number=values['flat_number'], created_at=datetime.now())
+        user_row = insert_user.on_conflict_do_update(
+            constraint='users_phone_flat_number_key',
+            set_={'phone': insert_user.excluded.phone}
+        ).returning(Users.user_id).cte('user_row')
+        insert_dog = pg_insert(Dog).from_select(
+            ['dog_name', 'dog_description', 'user_id', 'created_at'],
+            select(literal(values['dog_name']), literal(values['dog_description'], Text), user_row.c.user_id, literal(datetime.now()))
+        )
+        dog_id, user_id = (await session.execute(
+            insert_dog.on_conflict_do_update(
+                constraint='dog_dog_name_user_id_key',
+                set_={'dog_name': insert_dog.excluded.dog_name}
+            ).returning(Dog.dog_id, Dog.user_id)
+        )).one()
+        identity_cache.remember(session=session, phone=values['phone'], flat_number=values['flat_number'], dog_name=values['dog_name'],
+                                user_id=user_id, dog_id=dog_id)
+        return dog_id
+
+    @tagged
+    async def take_slots(self, session: AsyncSession, slots: list) -> set:
+        """
+        Функция, занимающая места одним запросом в текущей транзакции
+        Если на одно время нужно несколько мест, они занимаются все вместе или не занимаются вовсе
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия в открытой транзакции
+        slots: list
+            Список (start_date, hour_minute), одно место на каждый элемент (время может повторяться)
+            Пример: [(datetime(2024, 1, 30, 14, 0), '14:00')]
+        Returns
+        -------
+        set
+            Времена начала, на которые места удалось занять
+        """
+        # Строки slot блокируются в порядке start_date, чтобы параллельные транзакции не ждали друг друга по кругу
+        counts = sorted((slot, count) for slot, count in Counter(slots).items() if count <= settings_slot['capacity'])
+        if not counts:
+            return set()
+        insert_slots = pg_insert(Slot).values([{'start_date': start_date, 'hour_minute': hour_minute, 'busy': count} for (start_date, hour_minute), count in counts])
+        taken = (await session.execute(
+            insert_slots.on_conflict_do_update(
+                index_elements=[Slot.start_date],
+                set_={'busy': Slot.busy + insert_slots.excluded.busy},
+                where=Slot.busy + insert_slots.excluded.busy <= settings_slot['capacity']
+            ).returning(Slot.start_date)
+        )).scalars().all()
+        return set(taken)
+
+    @tagged
+    async def release_slots(self, session: AsyncSession, start_dates: list) -> None:
+        """
+        Функция, освобождающая места одним запросом в текущей транзакции
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия в открытой транзакции
+        start_dates: list
+            Времена начала прогулок, одно место на каждый элемент (время может повторяться)
+            Пример: [datetime(2024, 1, 30, 14, 0)]
+        """
+        released = values_list(column('start_date', DateTime), column('count', Integer), name='released').data(list(Counter(start_dates).items()))
+        await session.execute(
+            update(Slot)
+            .where(Slot.start_date == released.c.start_date)
+            .values(busy=func.greatest(Slot.busy - released.c.count, 0))
+        )
+
+    @logger.catch
+    @tagged
+    async def update_walks(self, walks: list) -> list:
+        """
+        Функция для обновления статусов и гуляющих у нескольких заказов в одной транзакции
+        Все заказы меняются одним запросом UPDATE ... FROM (VALUES ...)
+        Parameters
+        ----------
+        walks: list
+            Список изменений, уже проверенных Checks.check_status, каждый walk_id не больше одного раза
+            Пример: [{'walk_id': 1, 'status': 'ACSS', 'who_walking': 'Петр'},
+                     {'walk_id': 2, 'status': 'RJCT', 'who_walking': None}]
+        Returns
+        -------
+        list
+            Результат по каждому заказу в порядке walks
+            [
+                {'walk_id': 1, 'message': 'Значение успешно изменено'},
+                {'walk_id': 2, 'error': 'Время уже занято'},
+                ...
+            ]
+        """
+        changes = {walk['walk_id']: walk for walk in walks}
+        results = {}
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                current = (await session.execute(
+                    select(Walk.walk_id, Walk.status, Walk.start_date, Walk.hour_minute)
+                    .where(Walk.walk_id.in_(list(changes))).order_by(Walk.walk_id).with_for_update()
+                )).all()
+                found = {walk.walk_id: walk for walk in current}
+                for walk_id in changes:
+                    if walk_id not in found:
+                        results[walk_id] = {'error': 'Заказ не найден'}
+
+                released = [walk.start_date for walk in current if walk.status != 'RJCT' and changes[walk.walk_id]['status'] == 'RJCT']
+                if released:
+                    await self.release_slots(session=session, start_dates=released)
+                restored = [walk for walk in current if walk.status == 'RJCT' and changes[walk.walk_id]['status'] != 'RJCT']
+                if restored:
+                    taken = await self.take_slots(session=session, slots=[(walk.start_date, walk.hour_minute) for walk in restored])
+                    for walk in restored:
+                        if walk.start_date not in taken:
+                            results[walk.walk_id] = {'error': 'Время уже занято'}
+
+                updated = [changes[walk_id] for walk_id in found if walk_id not in results]
+                if updated:
+                    new_values = values_list(column('walk_id', Integer), column('start_date', DateTime), column('status', String), column('who_walking', String), name='new_values').data(
+                        [(walk['walk_id'], found[walk['walk_id']].start_date, walk['status'], walk['who_walking']) for walk in updated]
+                    )
+                    # Диапазон start_date оставляет в плане только секции затронутых месяцев
+                    start_dates = [found[walk['walk_id']].start_date for walk in updated]
+                    await session.execute(
+                        update(Walk)
+                        .where(and_(Walk.walk_id == new_values.c.walk_id, Walk.start_date == new_values.c.start_date,
+                                    Walk.start_date.between(min(start_dates), max(start_dates))))
+                        .values(status=new_values.c.status, who_walking=new_values.c.who_walking,
+                                walker_id=walker_by_name(new_values.c.who_walking))
+                    )
+                    for walk in updated:
+                        results[walk['walk_id']] = {'message': 'Значение успешно изменено'}
+                    await self.notify_walks(session=session, events=[
+                        {'event': 'updated', 'walk_id': walk['walk_id'], 'start_date': found[walk['walk_id']].start_date,
+                         'status': walk['status'], 'previous_status': found[walk['walk_id']].status, 'who_walking': walk['who_walking']}
+                        for walk in updated])
+                    await self.bump_walks_versions(session=session, start_dates=start_dates)
+        return [{'walk_id': walk['walk_id'], **results[walk['walk_id']]} for walk in walks]
+
+    @tagged
+    async def notify_walks(self, session: AsyncSession, events: list) -> None:
+        """
+        Функция, публикующая события о заказах в канал WALKS_CHANNEL через NOTIFY
+        Postgres доставляет их подписчикам только после коммита транзакции
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, в транзакции которой изменяются заказы
+        events: list
+            Пример: [{'event': 'updated', 'walk_id': 1, 'start_date': datetime(2024, 1, 30, 14, 0),
+                      'status': 'ACSS', 'previous_status': 'CRTD', 'who_walking': 'Петр'}]
+        """
+        payloads = [orjson.dumps({**event, 'start_date': event['start_date'].isoformat(' ', 'minutes')}).decode() for event in events]
+        await session.execute(text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                              {'channel': WALKS_CHANNEL, 'payloads': payloads})
+
+    @tagged
+    async def bump_walks_versions(self, session: AsyncSession, start_dates: list) -> None:
+        """
+        Функция, увеличивающая версии списков заказов на даты прогулок в текущей транзакции
+        Вызывается последней перед коммитом, чтобы строка версии была заблокирована как можно меньше
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, в транзакции которой изменяются заказы
+        start_dates: list
+            Даты начала изменённых прогулок
+            Пример: [datetime(2024, 1, 30, 14, 0)]
+        """
+        names = sorted({walks_version_name(start_date) for start_date in start_dates})
+        insert_versions = pg_insert(Cache_version).values([{'name': name, 'version': 1} for name in names])
+        await session.execute(insert_versions.on_conflict_do_update(
+            index_elements=[Cache_version.name],
+            set_={'version': Cache_version.version + 1}
+        ))
 
     @logger.catch
-    def update(self, table_name: str, values: dict) -> dict:
+    @tagged
+    async def get_walks_version(self, current_date: str) -> int:
+        """
+        Функция получения версии списка заказов на дату
+        Версия меняется при каждом создании заказа на эту дату и изменении статуса такого заказа
+        Parameters
+        ----------
+        current_date: str
+            Дата
+            Пример: '2024-01-30'
+        Returns
+        -------
+        int
+            Версия, 0 если заказы на дату ещё не менялись
+        """
+        async with replicas.connect(primary=self.engine) as connection:
+            return (await connection.execute(
+                select(Cache_version.version).where(Cache_version.name == walks_version_name(current_date))
+            )).scalar() or 0
+
+    @logger.catch
+    @tagged
+    async def create_walker(self, name: str, capacity: int, shifts: list) -> dict:
+        """
+        Функция, создающая гуляющего или заменяющая вместимость и смены существующего
+        Parameters
+        ----------
+        name: str
+            Имя гуляющего (оно же записывается в who_walking назначенных заказов)
+            Пример: 'Петр'
+        capacity: int
+            Сколько прогулок в день может провести гуляющий
+            Пример: 8
+        shifts: list
+            Смены, уже проверенные Checks.check_hour_minute
+            Пример: [{'day_of_week': 1, 'start': '08:00', 'end': '14:00'}]
+        Returns
+        -------
+        dict
+            {'message': 'Гуляющий сохранен', 'object_id': int}
+        """
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                insert_walker = pg_insert(Walker).values(name=name, capacity=capacity, created_at=datetime.now())
+                walker_id = (await session.execute(insert_walker.on_conflict_do_update(
+                    constraint='walker_name_key',
+                    set_={'capacity': insert_walker.excluded.capacity}
+                ).returning(Walker.walker_id))).scalar()
+                await session.execute(Walker_shift.__table__.delete().where(Walker_shift.walker_id == walker_id))
+                if shifts:
+                    await session.execute(insert(Walker_shift).values([
+                        {'walker_id': walker_id, 'day_of_week': shift['day_of_week'],
+                         'shift_start': shift['start'], 'shift_end': shift['end']}
+                        for shift in shifts]))
+        return {'message': 'Гуляющий сохранен', 'object_id': walker_id}
+
+    @logger.catch
+    @tagged
+    async def schedule_walks(self, date_from: str, days: int = 1, reassign: bool = False) -> dict:
+        """
+        Функция, назначающая гуляющих принятым заказам ('ACSS') за период в одной транзакции
+        Заказы периода блокируются, распределяются по сменам алгоритмом scheduler.assign_day
+        и записываются обратно одним UPDATE
+        Parameters
+        ----------
+        date_from: str
+            Первый день периода
+            Пример: '2024-01-30'
+        days: int
+            Количество дней (1 - день, 7 - неделя)
+        reassign: bool
+            Если False, назначаются только заказы без гуляющего из walker (walker_id пуст), а уже
+            назначенные, в том числе вручную по имени гуляющего, учитываются как занятость.
+            Имя не из списка гуляющих считается временным и заменяется назначенным гуляющим.
+            Если True, все заказы периода распределяются заново
+        Returns
+        -------
+        dict
+            {'assigned': 120, 'unassigned': [walk_id, ...], 'load': {'Петр': 8, ...}}
+        """
+        day_from = datetime.strptime(date_from,"%Y-%m-%d")
+        day_to = day_from + timedelta(days=days)
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                walkers = {walker.walker_id: walker for walker in (await session.execute(
+                    select(Walker.walker_id, Walker.name, Walker.capacity)
+                )).all()}
+                shifts = {}
+                for walker_id, day_of_week, shift_start, shift_end in (await session.execute(
+                    select(Walker_shift.walker_id, Walker_shift.day_of_week, Walker_shift.shift_start, Walker_shift.shift_end)
+                )).all():
+                    shifts.setdefault(day_of_week, []).append((minutes(shift_start), minutes(shift_end), walker_id))
+                walks = (await session.execute(
+                    select(Walk.walk_id, Walk.start_date, Walk.end_date, Walk.walker_id, Walk.who_walking)
+                    .where(and_(Walk.start_date >= day_from, Walk.start_date < day_to, Walk.status == 'ACSS'))
+                    .order_by(Walk.start_date, Walk.walk_id).with_for_update()
+                )).all()
+
+                capacity = {walker_id: walker.capacity for walker_id, walker in walkers.items()}
+                assigned = []
+                unassigned = []
+                load = {}
+                for day, day_walks in groupby(walks, key=lambda walk: walk.start_date.date()):
+                    day_walks = list(day_walks)
+                    busy = set()
+                    day_load = {}
+                    if not reassign:
+                        for walk in day_walks:
+                            if walk.walker_id is not None:
+                                busy.add((walk.walker_id, walk.start_date.hour * 60 + walk.start_date.minute))
+                                day_load[walk.walker_id] = day_load.get(walk.walker_id, 0) + 1
+                    day_assigned, day_unassigned = assign_day(
+                        walks=[(walk.start_date.hour * 60 + walk.start_date.minute, walk.end_date.hour * 60 + walk.end_date.minute or 1440, walk.walk_id)
+                               for walk in day_walks if reassign or walk.walker_id is None],
+                        shifts=shifts.get(day.isoweekday(), []),
+                        capacity=capacity,
+                        busy=busy,
+                        load=day_load)
+                    assigned.extend(day_assigned)
+                    unassigned.extend(day_unassigned)
+                    for walker_id, count in day_load.items():
+                        load[walker_id] = load.get(walker_id, 0) + count
+
+                previous = {walk.walk_id: walk for walk in walks}
+                # Заказ, которому не хватило гуляющего, остаётся с прежним who_walking, но без walker_id
+                changes = [(walk_id, walker_id, walkers[walker_id].name) for walk_id, walker_id in assigned if previous[walk_id].walker_id != walker_id]
+                changes += [(walk_id, None, previous[walk_id].who_walking) for walk_id in unassigned if previous[walk_id].walker_id is not None]
+                if changes:
+                    # Массивы вместо VALUES: asyncpg ограничивает запрос 32767 параметрами
+                    await session.execute(text("""UPDATE walk
+                                                  SET walker_id = new_values.walker_id,
+                                                      who_walking = new_values.who_walking
+                                                  FROM unnest(CAST(:walk_ids AS integer[]), CAST(:walker_ids AS integer[]), CAST(:names AS varchar[]))
+                                                       AS new_values (walk_id, walker_id, who_walking)
+                                                  WHERE walk.walk_id = new_values.walk_id
+                                                     AND walk.start_date >= :day_from AND walk.start_date < :day_to"""),
+                                          {'day_from': day_from, 'day_to': day_to,
+                                           'walk_ids': [walk_id for walk_id, _, _ in changes],
+                                           'walker_ids': [walker_id for _, walker_id, _ in changes],
+                                           'names': [name for _, _, name in changes]})
+                    await self.notify_walks(session=session, events=[
+                        {'event': 'updated', 'walk_id': walk_id, 'start_date': previous[walk_id].start_date,
+                         'status': 'ACSS', 'previous_status': 'ACSS', 'who_walking': name}
+                        for walk_id, _, name in changes])
+                    await self.bump_walks_versions(session=session, start_dates=[previous[walk_id].start_date for walk_id, _, _ in changes])
+        logger.info(f'Назначено {len(assigned)} прогулок, без гуляющего {len(unassigned)}, изменено {len(changes)}')
+        return {'assigned': len(assigned),
+                'unassigned': unassigned,
+                'load': {walkers[walker_id].name: count for walker_id, count in load.items()}}
+
+    @logger.catch
+    @tagged
+    async def get_walk_ids(self, current_date: str, status: str = None) -> list:
+        """
+        Функция для получения id заказов по дате и статусу
+        Parameters
+        ----------
+        current_date: str
+            Дата, по которой будет осуществлён поиск заказов
+            Пример: '2024-01-30'
+        status: str
+            Статус заказа (опционален)
+            Пример: 'CRTD'
+        Returns
+        -------
+        list
+            [1, 2, ...]
+        """
+        date_from = datetime.strptime(current_date,"%Y-%m-%d")
+        query = select(Walk.walk_id).where(and_(Walk.start_date >= date_from, Walk.start_date < date_from + timedelta(days=1)))
+        if status is not None:
+            query = query.where(Walk.status == status)
+        async with AsyncSession(self.engine) as session:
+            return list((await session.execute(query.order_by(Walk.start_date, Walk.walk_id))).scalars().all())
+
+    @logger.catch
+    @tagged
+    async def update(self, table_name: str, values: dict) -> dict:
         """
         Функция для обновления данных в базе данных
         Parameters
@@ -131,33 +826,57 @@ class DB:
             Пример: {'walk_id': 1
                      'status': 'ACSS'}
             status может быть либо 'ACSS' (принято), либо 'RJCT' (отклонено), либо 'CRTD' (создано)
+            При переходе в 'RJCT' и обратно освобождается или занимается место на время
         Returns
         -------
         dict
             {'message': 'Значение успешно изменено'}
+            или, если при возврате из 'RJCT' время уже занято,
+            {'error': 'Время уже занято'}
+            или, если цены на время hour_minute нет,
+            {'error': 'Вы не создали цену для времени'}
         """
-        with self.engine.connect() as connection:
-            session = Session(bind=self.engine)
+        async with AsyncSession(self.engine) as session:
             match table_name:
                 case 'walk':
-                    session.scalars(
-                        update(Walk)
-                        .where(Walk.walk_id == values['walk_id'])
-                        .values(status=values['status'], who_walking=values['who_walking']).returning(Walk.walk_id)
-                    )
+                    walk = (await session.execute(
+                        select(Walk.status, Walk.start_date, Walk.hour_minute).where(Walk.walk_id == values['walk_id']).with_for_update()
+                    )).one_or_none()
+                    if walk is not None and (walk.status == 'RJCT') != (values['status'] == 'RJCT'):
+                        if values['status'] == 'RJCT':
+                            await self.release_slots(session=session, start_dates=[walk.start_date])
+                        elif not await self.take_slots(session=session, slots=[(walk.start_date, walk.hour_minute)]):
+                            return {'error': 'Время уже занято'}
+                    if walk is not None:
+                        await session.execute(
+                            update(Walk)
+                            .where(and_(Walk.walk_id == values['walk_id'], Walk.start_date == walk.start_date))
+                            .values(status=values['status'], who_walking=values['who_walking'],
+                                    walker_id=walker_by_name(values['who_walking']))
+                        )
+                        await self.notify_walks(session=session, events=[
+                            {'event': 'updated', 'walk_id': values['walk_id'], 'start_date': walk.start_date,
+                             'status': values['status'], 'previous_status': walk.status, 'who_walking': values['who_walking']}])
+                        await self.bump_walks_versions(session=session, start_dates=[walk.start_date])
                 case 'time_price':
-                    session.scalars(
+                    changed = (await session.execute(
                         update(Time_price)
                         .where(Time_price.hour_minute == values['hour_minute'])
-                        .values(price=values['price']).returning(Time_price.time_id)
-                    )
-            session.commit()
-            session.close()
+                        .values(price=values['price'])
+                        .returning(Time_price.time_id)
+                    )).first()
+                    if changed is None:
+                        return {'error': 'Вы не создали цену для времени'}
+                    await price_cache.bump(session=session)
+            await session.commit()
+        if table_name == 'time_price':
+            price_cache.invalidate()
         return {'message': 'Значение успешно изменено'}
 
-    
+
     @logger.catch
-    def check_exist_object(self, table_name: str, values: dict) -> int:
+    @tagged
+    async def check_exist_object(self, table_name: str, values: dict) -> int:
         """
         Функция для проверки существования объекта
         Parameters
@@ -168,34 +887,21 @@ class DB:
         values: dict
             Словарь из значений, необходимые для проверки наличия строк в таблице
             Пример: {'dog_id': 1
-                     'start_date': '2024-01-30 14:00'}
+                     'start_date': datetime(2024, 1, 30, 14, 0)}
         Returns
         -------
         int
             id объекта
         """
-        with self.engine.connect() as connection:
-            session = Session(bind=self.engine)
-            match table_name:
-                case 'users':
-                    object_id = session.query(Users.user_id).filter(and_(Users.phone==values['phone'],Users.flat_number==values['flat_number'])).all()
-                case 'dog':
-                    object_id = session.query(Dog.dog_id).filter(Dog.dog_name==values['dog_name']).all()
-                case 'walk':
-                    object_id = session.query(Walk.walk_id).filter(and_(Walk.dog_id==values['dog_id'],Walk.start_date==values['start_date'])).all()
-                case 'time_price':
-                    object_id = session.query(Time_price.price).filter(Time_price.hour_minute==values['hour_minute']).all()
-                case _:
-                    object_id = []
-            session.commit()
-            session.close()
-            if len(object_id) == 0:
-                return None
-            else:
-                return object_id[0][0]
-            
+        if table_name not in EXIST_QUERIES:
+            return None
+        query, names = EXIST_QUERIES[table_name]
+        async with self.engine.connect() as connection:
+            return (await connection.execute(query, {name: values[name] for name in names})).scalar()
+
     @logger.catch            
-    def get_all_walks(self, current_date: str = None, status: str = None) -> list:
+    @tagged
+    async def get_all_walks(self, current_date: str = None, status: str = None) -> list:
         """
         Функция для получения всех заказов по указанной дате и статусу (статус опционален)
         Parameters
@@ -228,54 +934,157 @@ class DB:
                 ...
             ]
         """
-        with self.engine.connect() as connection:
-            items = []
-            query = f''' SELECT  
-                                walk.walk_id,
-                                walk.start_date,
-                                walk.end_date,
-                                walk.created_at,
-                                walk.status,
-                                walk.price,
-                                dog.dog_name,
-                                dog.dog_description, 
-                                users.phone, 
-                                users.name as user_name,
-                                walk.who_walking
-                        FROM dog
-                            INNER JOIN walk
-                                ON dog.dog_id = walk.dog_id
-                            INNER JOIN users
-                                ON dog.user_id = users.user_id
-                        WHERE (1=1)
-                    '''
-            if current_date is not None:
-                query += f'''AND walk.start_date >= '{current_date} 00:00'
-                            AND walk.start_date <='{current_date} 23:59' '''
-            if status is not None:
-                query += f" AND walk.status = '{status}' "
-
-
-            walks = connection.execute(text(query))
-
-            for walk in walks:
-                    item = {
-                        'walk_id': walk[0],
-                        'start_date': datetime.strftime(walk[1],"%Y-%m-%d %H:%M"),
-                        'end_date': datetime.strftime(walk[2],"%Y-%m-%d %H:%M"),
-                        'created_at': datetime.strftime(walk[3],"%Y-%m-%d %H:%M"),
-                        'status': walk[4],
-                        'price': walk[5],
-                        'dog_name': walk[6],
-                        'dog_description':walk[7],
-                        'phone': walk[8],
-                        'user_name':walk[9],
-                        'who_walking': walk[10]}
-                    items.append(item)
-            return items
-        
+        query, params = walks_query(current_date=current_date, status=status)
+        async with replicas.connect(primary=self.engine) as connection:
+            walks = await connection.execute(query, params)
+            return [walk_item(walk) for walk in walks]
+
+    @logger.catch
+    @tagged
+    async def get_versioned_walks(self, current_date: str, status: str = None) -> dict:
+        """
+        Функция получения заказов за дату вместе с версией списка, к которой они относятся
+        Версия и заказы читаются на одном соединении в одном снимке (REPEATABLE READ),
+        поэтому отстающая реплика не отдаст старый список под новой версией
+        Parameters
+        ----------
+        current_date: str
+            Пример: '2024-01-30'
+        status: str
+            Пример: 'CRTD'
+        Returns
+        -------
+        dict
+            {'version': int, 'walks': list} - заказы как в get_all_walks
+        """
+        query, params = walks_query(current_date=current_date, status=status)
+        async with replicas.connect(primary=self.engine) as connection:
+            await connection.execution_options(isolation_level='REPEATABLE READ')
+            version = (await connection.execute(
+                select(Cache_version.version).where(Cache_version.name == walks_version_name(current_date))
+            )).scalar() or 0
+            walks = await connection.execute(query, params)
+            return {'version': version, 'walks': [walk_item(walk) for walk in walks]}
+
+    @logger.catch
+    @tagged
+    async def get_walks_page(self, current_date: str = None, status: str = None, limit: int = 100, cursor: str = None) -> dict:
+        """
+        Функция для постраничного получения заказов по указанной дате и статусу
+        Заказы упорядочены по (start_date, walk_id), следующая страница читается
+        начиная с последнего заказа предыдущей (keyset), а не через OFFSET
+        Parameters
+        ----------
+        current_date: str
+            Дата, по которой будет осуществлён поиск заказов
+            Пример: '2024-01-30'
+        status: str
+            Статус заказа
+            Пример: 'CRTD'
+        limit: int
+            Количество заказов на странице
+            Пример: 100
+        cursor: str
+            Курсор из next_cursor предыдущей страницы (для первой страницы не указывается)
+        Returns
+        -------
+        dict
+            {'walks': [...], 'next_cursor': str}
+            next_cursor равен None на последней странице
+            или
+            {'error': str}
+        """
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if after is None:
+                return {'error': 'Неправильный курсор'}
+        query, params = walks_query(current_date=current_date, status=status, after=after, limit=limit + 1)
+        async with replicas.connect(primary=self.engine) as connection:
+            walks = (await connection.execute(query, params)).all()
+        next_cursor = None
+        if len(walks) > limit:
+            walks = walks[:limit]
+            next_cursor = encode_cursor(start_date=walks[-1][1], walk_id=walks[-1][0])
+        return {'walks': [walk_item(walk) for walk in walks],
+                'next_cursor': next_cursor}
+
+    @tagged
+    async def stream_walks(self, current_date: str = None, status: str = None, chunk_size: int = 1000):
+        """
+        Функция для потокового получения заказов через серверный курсор
+        В памяти одновременно находится не больше chunk_size заказов
+        Parameters
+        ----------
+        current_date: str
+            Дата, по которой будет осуществлён поиск заказов
+            Пример: '2024-01-30'
+        status: str
+            Статус заказа
+            Пример: 'CRTD'
+        chunk_size: int
+            Сколько строк читать из курсора за раз
+        Returns
+        -------
+        AsyncIterator[dict]
+            Заказы в формате get_all_walks по одному
+        """
+        query, params = walks_query(current_date=current_date, status=status)
+        async with replicas.connect(primary=self.engine) as connection:
+            result = await connection.stream(query.execution_options(yield_per=chunk_size), params)
+            async for walks in result.partitions(chunk_size):
+                for walk in walks:
+                    yield walk_item(walk)
+
+    @logger.catch
+    @tagged
+    async def get_slots(self, date_from: str, date_to: str) -> list:
+        """
+        Функция для получения свободных мест и цен на каждое время в указанном периоде
+        Parameters
+        ----------
+        date_from: str
+            Первый день периода
+            Пример: '2024-01-30'
+        date_to: str
+            Последний день периода (включительно)
+            Пример: '2024-01-31'
+        Returns
+        -------
+        list
+            [
+                {
+                    'start_date': '2024-01-30 07:00',
+                    'free': 2,
+                    'price': 500.00
+                },
+                ...
+            ]
+        """
+        day = datetime.strptime(date_from,"%Y-%m-%d")
+        day_to = datetime.strptime(date_to,"%Y-%m-%d") + timedelta(days=1)
+        async with replicas.connect(primary=self.engine) as connection, AsyncSession(connection) as session:
+            busy = dict((await session.execute(
+                select(Slot.start_date, Slot.busy).where(and_(Slot.start_date >= day, Slot.start_date < day_to))
+            )).all())
+        # price_cache общий с book_walk, поэтому сверяется только с основной базой: отстающая реплика
+        # подложила бы в него старые цены
+        async with AsyncSession(self.engine) as session:
+            prices = await price_cache.get_all(session=session)
+        items = []
+        while day < day_to:
+            for half_hour in HALF_HOURS:
+                start_date = day.replace(hour=int(half_hour[:2]), minute=int(half_hour[3:]))
+                items.append({
+                    'start_date': f"{day:%Y-%m-%d} {half_hour}",
+                    'free': max(settings_slot['capacity'] - busy.get(start_date, 0), 0),
+                    'price': prices.get(half_hour)})
+            day += timedelta(days=1)
+        return items
+
     @logger.catch
-    def create_price(self,hour_minute: str|None = None,price: float|None = None) -> dict:
+    @tagged
+    async def create_price(self,hour_minute: str|None = None,price: float|None = None,schedule: list|None = None) -> dict:
         """
         Функция, устанавливающая цену на время
         Parameters
@@ -286,6 +1095,11 @@ class DB:
         price: float
             Цена прогулки
             Пример: 400.00
+        schedule: list
+            Расписание цен по интервалам времени (границы включаются), используется, если hour_minute пустой.
+            Время, не попавшее ни в один интервал, сохраняет прежнюю цену
+            Пример: [{'start': '07:00', 'end': '11:30', 'price': 400.00},
+                     {'start': '12:00', 'end': '23:00', 'price': 600.00}]
         Returns
         -------
         dict
@@ -294,35 +1108,531 @@ class DB:
             {'message': str}
         """
         if not hour_minute:
-            prices = None
-
-            with self.engine.connect() as connection:
-                query = f'''SELECT * FROM time_price'''
-                prices = connection.execute(text(query))
-            count_price = 0
-            for pr in prices:
-                count_price+=1
-                break
-            for i in range(7,24):
-                if i < 10:
-                    hour = f"0{i}"
-                else:
-                    hour = f"{i}"
+            if schedule:
+                prices = {}
+                for band in schedule:
+                    for half_hour in HALF_HOURS:
+                        if band['start'] <= half_hour <= band['end']:
+                            prices[half_hour] = band['price']
+                if not prices:
+                    return {'error': 'Интервалы не покрывают ни одного времени прогулки'}
+            else:
                 if not price:
                     price = 500
-                if count_price == 0:
-                    self.insert(table_name='time_price', values={'hour_minute': hour+':00','price': price})
-                    if i != 23:
-                        self.insert(table_name='time_price', values={'hour_minute': hour+':30','price': price})
-                else:
-                    self.update(table_name='time_price', values={'hour_minute': hour+':00','price': price})
-                    if i != 23:
-                        self.update(table_name='time_price', values={'hour_minute': hour+':30','price': price})
+                prices = {half_hour: price for half_hour in HALF_HOURS}
+
+            async with AsyncSession(self.engine) as session:
+                insert_prices = pg_insert(Time_price).values([{'hour_minute': half_hour, 'price': prices[half_hour]} for half_hour in prices])
+                await session.execute(insert_prices.on_conflict_do_update(
+                    constraint='time_price_hour_minute_key',
+                    set_={'price': insert_prices.excluded.price}
+                ))
+                await price_cache.bump(session=session)
+                await session.commit()
+            price_cache.invalidate()
             return {'message': 'Цены добавлены'}
         else:
             if not price:
                 return {'error': 'Не указана цена'}
             else:
-                self.update(table_name='time_price', values={'hour_minute': hour_minute,'price': price})
+                result = await self.update(table_name='time_price', values={'hour_minute': hour_minute,'price': price})
+                if 'error' in result:
+                    return result
             return {'message': 'Цена изменена'}
 
+    @logger.catch
+    @tagged
+    async def refresh_reports(self, batch: int = settings_reports['refresh_batch']) -> int:
+        """
+        Функция, пересчитывающая дневные сводки за изменившиеся даты
+        Дата считается изменившейся, если версия её списка заказов в cache_version
+        (её увеличивает каждое создание заказа и смена статуса) не совпадает с report_state.
+        Сводка дня пересчитывается целиком по индексу start_date, всего walk не читается
+        Parameters
+        ----------
+        batch: int
+            Сколько дат пересчитывать за один вызов
+        Returns
+        -------
+        int
+            Количество пересчитанных дат (0, если пересчёт уже идёт в другом воркере)
+        """
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                if not (await session.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': REPORTS_LOCK})).scalar():
+                    return 0
+                dirty = (await session.execute(text("""SELECT to_date(substr(cache_version.name, 6), 'YYYY-MM-DD') AS day, cache_version.version
+                                                       FROM cache_version
+                                                          LEFT JOIN report_state ON report_state.day = to_date(substr(cache_version.name, 6), 'YYYY-MM-DD')
+                                                       WHERE cache_version.name LIKE 'walk:%'
+                                                          AND report_state.version IS DISTINCT FROM cache_version.version
+                                                       ORDER BY 1
+                                                       LIMIT :batch"""), {'batch': batch})).all()
+                if not dirty:
+                    return 0
+                days = {'days': [day for day, _ in dirty]}
+                for table in ('report_day_status', 'report_day_walker', 'report_day_slot'):
+                    await session.execute(text(f"DELETE FROM {table} WHERE day = ANY(:days)"), days)
+                day_walks = """FROM unnest(CAST(:days AS date[])) AS days (day)
+                                  INNER JOIN walk ON walk.start_date >= days.day AND walk.start_date < days.day + 1"""
+                await session.execute(text(f"""INSERT INTO report_day_status (day, status, walks, revenue)
+                                               SELECT days.day, walk.status, count(*), sum(walk.price)
+                                               {day_walks}
+                                               GROUP BY days.day, walk.status"""), days)
+                await session.execute(text(f"""INSERT INTO report_day_walker (day, who_walking, walks, revenue)
+                                               SELECT days.day, walk.who_walking, count(*), sum(walk.price)
+                                               {day_walks}
+                                               WHERE walk.status != 'RJCT' AND walk.who_walking IS NOT NULL
+                                               GROUP BY days.day, walk.who_walking"""), days)
+                await session.execute(text(f"""INSERT INTO report_day_slot (day, hour_minute, walks)
+                                               SELECT days.day, walk.hour_minute, count(*)
+                                               {day_walks}
+                                               WHERE walk.status != 'RJCT'
+                                               GROUP BY days.day, walk.hour_minute"""), days)
+                insert_state = pg_insert(Report_state).values([{'day': day, 'version': version} for day, version in dirty])
+                await session.execute(insert_state.on_conflict_do_update(
+                    index_elements=[Report_state.day],
+                    set_={'version': insert_state.excluded.version}
+                ))
+        logger.debug(f'Сводки пересчитаны за {len(dirty)} дат')
+        return len(dirty)
+
+    @logger.catch
+    @tagged
+    async def get_revenue_report(self, date_from: str, date_to: str, period: str = 'month') -> list:
+        """
+        Функция получения количества заказов и выручки по статусам из дневных сводок
+        Parameters
+        ----------
+        date_from: str
+            Первый день
+            Пример: '2024-01-01'
+        date_to: str
+            Последний день (включительно)
+            Пример: '2024-12-31'
+        period: str
+            Группировка: 'day', 'month' или 'year'
+        Returns
+        -------
+        list
+            [
+                {
+                    'period': '2024-01',
+                    'walks': 120,
+                    'revenue': 60000.00,
+                    'statuses': {'ACSS': {'walks': 100, 'revenue': 50000.00}, 'RJCT': {...}, 'CRTD': {...}}
+                },
+                ...
+            ]
+            revenue считается без отклонённых заказов
+        """
+        async with replicas.connect(primary=self.engine) as connection:
+            rows = (await connection.execute(text("""SELECT to_char(day, :format) AS period, status, sum(walks), sum(revenue)
+                                                     FROM report_day_status
+                                                     WHERE day >= :date_from AND day <= :date_to
+                                                     GROUP BY 1, 2
+                                                     ORDER BY 1, 2"""),
+                                             {'format': REPORT_PERIODS[period],
+                                              'date_from': datetime.strptime(date_from,"%Y-%m-%d").date(),
+                                              'date_to': datetime.strptime(date_to,"%Y-%m-%d").date()})).all()
+        items = {}
+        for period_name, status, walks, revenue in rows:
+            item = items.setdefault(period_name, {'period': period_name, 'walks': 0, 'revenue': 0.0, 'statuses': {}})
+            item['statuses'][status] = {'walks': walks, 'revenue': revenue}
+            item['walks'] += walks
+            if status != 'RJCT':
+                item['revenue'] += revenue
+        return list(items.values())
+
+    @logger.catch
+    @tagged
+    async def get_walkers_report(self, date_from: str, date_to: str) -> list:
+        """
+        Функция получения количества прогулок и выручки по гуляющим из дневных сводок
+        Parameters
+        ----------
+        date_from: str
+            Первый день
+            Пример: '2024-01-01'
+        date_to: str
+            Последний день (включительно)
+            Пример: '2024-01-31'
+        Returns
+        -------
+        list
+            [{'who_walking': 'Петр', 'walks': 40, 'revenue': 20000.00}, ...] по убыванию выручки
+        """
+        async with replicas.connect(primary=self.engine) as connection:
+            rows = (await connection.execute(text("""SELECT who_walking, sum(walks), sum(revenue)
+                                                     FROM report_day_walker
+                                                     WHERE day >= :date_from AND day <= :date_to
+                                                     GROUP BY 1
+                                                     ORDER BY 3 DESC, 1"""),
+                                             {'date_from': datetime.strptime(date_from,"%Y-%m-%d").date(),
+                                              'date_to': datetime.strptime(date_to,"%Y-%m-%d").date()})).all()
+        return [{'who_walking': who_walking, 'walks': walks, 'revenue': revenue} for who_walking, walks, revenue in rows]
+
+    @logger.catch
+    @tagged
+    async def get_utilization_report(self, date_from: str, date_to: str) -> list:
+        """
+        Функция получения занятости каждого времени за период из дневных сводок
+        Parameters
+        ----------
+        date_from: str
+            Первый день
+            Пример: '2024-01-01'
+        date_to: str
+            Последний день (включительно)
+            Пример: '2024-01-31'
+        Returns
+        -------
+        list
+            [{'hour_minute': '07:00', 'walks': 40, 'places': 62, 'utilization': 0.645}, ...]
+            places - сколько мест было на это время за период (дни * settings_slot['capacity'])
+        """
+        day_from = datetime.strptime(date_from,"%Y-%m-%d").date()
+        day_to = datetime.strptime(date_to,"%Y-%m-%d").date()
+        async with replicas.connect(primary=self.engine) as connection:
+            walks = dict((await connection.execute(text("""SELECT hour_minute, sum(walks)
+                                                           FROM report_day_slot
+                                                           WHERE day >= :date_from AND day <= :date_to
+                                                           GROUP BY 1"""),
+                                                   {'date_from': day_from, 'date_to': day_to})).all())
+        places = ((day_to - day_from).days + 1) * settings_slot['capacity']
+        return [{'hour_minute': half_hour,
+                 'walks': walks.get(half_hour, 0),
+                 'places': places,
+                 'utilization': round(walks.get(half_hour, 0) / places, 3)}
+                for half_hour in HALF_HOURS]
+
+    @logger.catch
+    @tagged
+    async def ensure_partitions(self, months_ahead: int = settings_partitions['months_ahead']) -> list:
+        """
+        Функция, создающая месячные секции walk на текущий месяц и months_ahead месяцев вперёд
+        Заказы, попавшие в walk_default (на месяц, для которого секции не было), переносятся
+        в созданную для их месяца секцию
+        Parameters
+        ----------
+        months_ahead: int
+            На сколько месяцев вперёд создавать секции
+        Returns
+        -------
+        list
+            Имена созданных секций
+            Пример: ['walk_2024_06', 'walk_2024_07']
+        """
+        current = date.today().replace(day=1)
+        created = []
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                await session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITIONS_LOCK})
+                existing = set((await session.execute(text(PARTITIONS_QUERY))).scalars().all())
+                stray = (await session.execute(text("SELECT DISTINCT date_trunc('month', start_date)::date FROM walk_default"))).scalars().all()
+                for month in sorted({add_months(current, months) for months in range(months_ahead + 1)} | set(stray)):
+                    name = f"walk_{month:%Y_%m}"
+                    if name in existing:
+                        continue
+                    # Секция собирается отдельной таблицей и присоединяется, когда заказы её месяца уже перенесены из walk_default
+                    await session.execute(text(f'CREATE TABLE {name} (LIKE walk INCLUDING DEFAULTS)'))
+                    await session.execute(text(f'''WITH moved AS (DELETE FROM walk_default
+                                                                  WHERE start_date >= :month_from AND start_date < :month_to
+                                                                  RETURNING *)
+                                                   INSERT INTO {name} SELECT * FROM moved'''),
+                                          {'month_from': month, 'month_to': add_months(month, 1)})
+                    await session.execute(text(f"ALTER TABLE walk ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"))
+                    created.append(name)
+        if created:
+            logger.info(f'Созданы секции {", ".join(created)}')
+        return created
+
+    @logger.catch
+    @tagged
+    async def archive_partitions(self, keep_months: int = settings_partitions['keep_months'],
+                                 directory: str = settings_partitions['archive_directory']) -> dict:
+        """
+        Функция, убирающая из walk секции месяцев раньше, чем keep_months месяцев назад
+        Если задан directory, секция выгружается в directory/walk_ГГГГ_ММ.csv.gz и удаляется,
+        иначе отсоединяется и остаётся в базе отдельной таблицей walk_archive_ГГГГ_ММ.
+        Перед архивацией пересчитываются сводки, чтобы отчёты сохранили архивные месяцы
+        Parameters
+        ----------
+        keep_months: int
+            Сколько прошедших месяцев оставить в walk, не считая текущего
+        directory: str
+            Каталог для выгрузки или пустая строка, чтобы только отсоединить секции
+        Returns
+        -------
+        dict
+            {'archived': ['walk_2023_01', ...], 'files': ['/backup/walk_2023_01.csv.gz', ...]}
+        """
+        await self.refresh_reports()
+        bound = add_months(date.today().replace(day=1), -keep_months)
+        archived, files = [], []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                await session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITIONS_LOCK})
+                for name in sorted((await session.execute(text(PARTITIONS_QUERY))).scalars().all()):
+                    month = PARTITION_NAME.fullmatch(name)
+                    if month is not None and date(int(month[1]), int(month[2]), 1) < bound:
+                        archived.append(name)
+                if directory:
+                    connection = (await (await session.connection()).get_raw_connection()).driver_connection
+                    for name in archived:
+                        path = os.path.join(directory, f'{name}.csv.gz')
+                        with gzip.open(path, 'wb') as archive:
+                            await connection.copy_from_table(name, output=archive, format='csv', header=True)
+                        files.append(path)
+                # Исключительная блокировка walk берётся только после выгрузки и держится до конца транзакции
+                for name in archived:
+                    await session.execute(text(f'ALTER TABLE walk DETACH PARTITION {name}'))
+                    if directory:
+                        await session.execute(text(f'DROP TABLE {name}'))
+                    else:
+                        await session.execute(text(f'ALTER TABLE {name} RENAME TO walk_archive_{name[5:]}'))
+        if archived:
+            logger.info(f'В архив убраны секции {", ".join(archived)}')
+        return {'archived': archived, 'files': files}
+
+    @tagged
+    async def export_walks(self, date_from: str, date_to: str, file_format: str = 'csv'):
+        """
+        Функция для потоковой выгрузки заказов через COPY TO STDOUT
+        Части выгрузки передаются через очередь на export_queue частей: если получатель
+        не успевает, COPY ждёт, поэтому память не зависит от количества заказов
+        Parameters
+        ----------
+        date_from: str
+            Первый день выгрузки
+            Пример: '2024-01-01'
+        date_to: str
+            Последний день выгрузки (включительно)
+            Пример: '2024-12-31'
+        file_format: str
+            'csv' (с заголовком) или 'ndjson'
+        Returns
+        -------
+        AsyncIterator[bytes]
+            Части файла выгрузки
+        """
+        query = EXPORT_QUERY if file_format == 'csv' else EXPORT_NDJSON_QUERY
+        date_from = datetime.fromisoformat(date_from)
+        date_to = datetime.fromisoformat(date_to) + timedelta(days=1)
+        chunks = asyncio.Queue(maxsize=settings_bulk['export_queue'])
+
+        async with replicas.connect(primary=self.engine) as connection:
+            driver_connection = (await connection.get_raw_connection()).driver_connection
+
+            async def copy():
+                try:
+                    await driver_connection.copy_from_query(query, date_from, date_to, output=chunks.put, **EXPORT_OPTIONS[file_format])
+                except Exception as error:
+                    await chunks.put(error)
+                else:
+                    await chunks.put(None)
+
+            copying = asyncio.create_task(copy())
+            try:
+                while (chunk := await chunks.get()) is not None:
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield bytes(chunk)
+            finally:
+                # Получатель прервал выгрузку: соединение с недочитанным COPY в пул не возвращается
+                if not copying.done():
+                    copying.cancel()
+                    await asyncio.gather(copying, return_exceptions=True)
+                    await connection.invalidate()
+
+    @logger.catch
+    @tagged
+    async def import_walks(self, walks, allow_past: bool = False, batch: int = settings_bulk['batch']) -> dict:
+        """
+        Функция загрузки заказов пачками по batch заказов, каждая пачка в своей транзакции
+        Заказы проверяются Checks.check_imported_walks, загружаются через COPY во временную
+        таблицу и переносятся в walk несколькими запросами на всю пачку: хозяева и собаки
+        находятся или создаются одним запросом на таблицу, места на время занимаются в пределах
+        вместимости slot. В памяти находится не больше одной пачки
+        Parameters
+        ----------
+        walks: AsyncIterator[dict]
+            Заказы, например из modules.bulk.read_walks
+            Пример: {'name': 'Иван', 'phone': '89558883344', 'flat_number': '1', 'dog_name': 'Барбос',
+                     'start_date': '2024-01-30 14:00'}
+        allow_past: bool
+            Разрешить прошедшие даты, чтобы загружать историю заказов
+        batch: int
+            Количество заказов в пачке
+        Returns
+        -------
+        dict
+            {'imported': 9990, 'existing': 5, 'errors': 5,
+             'error_samples': [{'line': 17, 'error': 'Время уже занято'}, ...]}
+            line - номер заказа в файле, начиная с 1 (заголовок CSV не считается),
+            error_samples содержит первые error_samples ошибок
+        """
+        summary = {'imported': 0, 'existing': 0, 'errors': 0, 'error_samples': []}
+        pending, first_line = [], 1
+        async for walk in walks:
+            pending.append(walk)
+            if len(pending) >= batch:
+                await self.merge_walks(walks=pending, first_line=first_line, allow_past=allow_past, summary=summary)
+                first_line += len(pending)
+                pending = []
+        if pending:
+            await self.merge_walks(walks=pending, first_line=first_line, allow_past=allow_past, summary=summary)
+        return summary
+
+    @tagged
+    async def merge_walks(self, walks: list, first_line: int, allow_past: bool, summary: dict) -> None:
+        """
+        Функция, проверяющая и загружающая одну пачку import_walks и добавляющая её итоги в summary
+        """
+        failed, records = [], []
+        for line, walk in enumerate(checks.check_imported_walks(walks=walks, allow_past=allow_past), start=first_line):
+            if 'error' in walk:
+                failed.append((line, walk['error']))
+            else:
+                records.append((line, walk['name'], walk['phone'], walk['flat_number'], walk['dog_name'], walk['dog_description'],
+                                datetime.fromisoformat(walk['start_date']), walk['start_date'][11:], walk['status'],
+                                walk['who_walking'], walk['price']))
+        imported = skipped = 0
+        if records:
+            imported, skipped, rejected = await self.merge_records(records=records)
+            failed = sorted(failed + rejected)
+
+        summary['imported'] += imported
+        summary['existing'] += skipped
+        summary['errors'] += len(failed)
+        summary['error_samples'].extend({'line': line, 'error': error}
+                                        for line, error in failed[:settings_bulk['error_samples'] - len(summary['error_samples'])])
+
+    @tagged
+    async def merge_records(self, records: list) -> tuple:
+        """
+        Функция, переносящая проверенные заказы пачки в walk в одной транзакции
+        Parameters
+        ----------
+        records: list
+            Заказы в порядке IMPORT_COLUMNS
+        Returns
+        -------
+        tuple
+            (количество созданных заказов, количество уже существующих, [(line, error), ...])
+        """
+        async with AsyncSession(self.engine) as session:
+            async with session.begin():
+                # ON COMMIT DROP: таблица живёт одну транзакцию и работает через пулер транзакций
+                await session.execute(text('''CREATE TEMP TABLE walk_import (
+                                                  line integer NOT NULL,
+                                                  name varchar(1024) NOT NULL,
+                                                  phone varchar(12) NOT NULL,
+                                                  flat_number integer NOT NULL,
+                                                  dog_name varchar(1024) NOT NULL,
+                                                  dog_description text,
+                                                  start_date timestamp NOT NULL,
+                                                  hour_minute varchar(5) NOT NULL,
+                                                  status varchar(4) NOT NULL,
+                                                  who_walking varchar(10),
+                                                  price double precision,
+                                                  user_id integer,
+                                                  dog_id integer,
+                                                  existing boolean NOT NULL DEFAULT false,
+                                                  error text
+                                              ) ON COMMIT DROP'''))
+                connection = (await (await session.connection()).get_raw_connection()).driver_connection
+                await connection.copy_records_to_table('walk_import', records=records, columns=IMPORT_COLUMNS)
+                await session.execute(text('ANALYZE walk_import'))
+
+                # Хозяева и собаки создаются по одному на ключ, первый заказ в файле задаёт имя и описание
+                await session.execute(text('''INSERT INTO users (name, phone, flat_number, created_at)
+                                              SELECT DISTINCT ON (phone, flat_number) name, phone, flat_number, localtimestamp
+                                              FROM walk_import
+                                              ORDER BY phone, flat_number, line
+                                              ON CONFLICT ON CONSTRAINT users_phone_flat_number_key DO NOTHING'''))
+                await session.execute(text('''UPDATE walk_import SET user_id = users.user_id
+                                              FROM users
+                                              WHERE users.phone = walk_import.phone AND users.flat_number = walk_import.flat_number'''))
+                await session.execute(text('''INSERT INTO dog (dog_name, dog_description, user_id, created_at)
+                                              SELECT DISTINCT ON (user_id, dog_name) dog_name, dog_description, user_id, localtimestamp
+                                              FROM walk_import
+                                              ORDER BY user_id, dog_name, line
+                                              ON CONFLICT ON CONSTRAINT dog_dog_name_user_id_key DO NOTHING'''))
+                await session.execute(text('''UPDATE walk_import SET dog_id = dog.dog_id
+                                              FROM dog
+                                              WHERE dog.user_id = walk_import.user_id AND dog.dog_name = walk_import.dog_name'''))
+
+                await session.execute(text('''UPDATE walk_import SET price = time_price.price
+                                              FROM time_price
+                                              WHERE walk_import.price IS NULL AND time_price.hour_minute = walk_import.hour_minute'''))
+                await session.execute(text("UPDATE walk_import SET error = 'Вы не создали цену для времени' WHERE price IS NULL"))
+
+                # Повтор заказа в пачке и уже созданный заказ считаются существующими, как в book_walks.
+                # Диапазон start_date оставляет в плане только секции месяцев пачки
+                await session.execute(text('''UPDATE walk_import SET existing = true
+                                              FROM walk_import earlier
+                                              WHERE earlier.dog_id = walk_import.dog_id AND earlier.start_date = walk_import.start_date
+                                                 AND earlier.line < walk_import.line AND walk_import.error IS NULL'''))
+                await session.execute(text('''UPDATE walk_import SET existing = true
+                                              FROM walk
+                                              WHERE walk.dog_id = walk_import.dog_id AND walk.start_date = walk_import.start_date
+                                                 AND walk.start_date BETWEEN :first AND :last AND walk_import.error IS NULL'''),
+                                      {'first': min(record[6] for record in records), 'last': max(record[6] for record in records)})
+
+                # Строки slot создаются и блокируются в порядке start_date, как в take_slots,
+                # после чего заказы сверх вместимости времени получают ошибку в порядке файла
+                await session.execute(text('''INSERT INTO slot (start_date, hour_minute, busy)
+                                              SELECT DISTINCT start_date, hour_minute, 0
+                                              FROM walk_import
+                                              WHERE error IS NULL AND NOT existing AND status <> 'RJCT'
+                                              ORDER BY start_date
+                                              ON CONFLICT (start_date) DO NOTHING'''))
+                await session.execute(text('''SELECT slot.start_date
+                                              FROM slot
+                                              WHERE slot.start_date IN (SELECT start_date FROM walk_import
+                                                                        WHERE error IS NULL AND NOT existing AND status <> 'RJCT')
+                                              ORDER BY slot.start_date
+                                              FOR UPDATE'''))
+                await session.execute(text('''UPDATE walk_import SET error = 'Время уже занято'
+                                              FROM (SELECT line, start_date,
+                                                           row_number() OVER (PARTITION BY start_date ORDER BY line) AS place
+                                                    FROM walk_import
+                                                    WHERE error IS NULL AND NOT existing AND status <> 'RJCT') wanted
+                                                 INNER JOIN slot ON slot.start_date = wanted.start_date
+                                              WHERE walk_import.line = wanted.line AND wanted.place > :capacity - slot.busy'''),
+                                      {'capacity': settings_slot['capacity']})
+                # Повтор заказа, который не удалось создать, получает ту же ошибку
+                await session.execute(text('''UPDATE walk_import SET existing = false, error = earlier.error
+                                              FROM walk_import earlier
+                                              WHERE earlier.dog_id = walk_import.dog_id AND earlier.start_date = walk_import.start_date
+                                                 AND earlier.line < walk_import.line AND walk_import.existing
+                                                 AND NOT earlier.existing AND earlier.error IS NOT NULL'''))
+
+                created = (await session.execute(text('''WITH created AS (
+                                                              INSERT INTO walk (start_date, hour_minute, end_date, dog_id, status, created_at, price, who_walking, walker_id)
+                                                              SELECT start_date, hour_minute, start_date + interval '30 minutes', dog_id, status,
+                                                                     localtimestamp, price, who_walking,
+                                                                     (SELECT walker.walker_id FROM walker WHERE walker.name = walk_import.who_walking)
+                                                              FROM walk_import
+                                                              WHERE error IS NULL AND NOT existing
+                                                              ORDER BY line
+                                                              ON CONFLICT ON CONSTRAINT walk_dog_id_start_date_key DO NOTHING
+                                                              RETURNING start_date, status
+                                                          ), taken AS (
+                                                              UPDATE slot SET busy = slot.busy + counted.busy
+                                                              FROM (SELECT start_date, count(*) AS busy FROM created
+                                                                    WHERE status <> 'RJCT' GROUP BY start_date) counted
+                                                              WHERE slot.start_date = counted.start_date
+                                                          )
+                                                          SELECT date_trunc('day', start_date) AS day, count(*) FROM created GROUP BY 1'''))).all()
+                imported = sum(count for _, count in created)
+                if created:
+                    # Подписчики дат перечитывают список целиком вместо события на каждый заказ
+                    await self.notify_walks(session=session, events=[{'event': 'resync', 'start_date': day} for day, _ in created])
+                    await self.bump_walks_versions(session=session, start_dates=[day for day, _ in created])
+
+                rejected = [tuple(row) for row in (await session.execute(text('SELECT line, error FROM walk_import WHERE error IS NOT NULL'))).all()]
+        return imported, len(records) - imported - len(rejected), rejected
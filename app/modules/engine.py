@@ -0,0 +1,90 @@
+from uuid import uuid4
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from loguru import logger
+from settings import settings_db, settings_pool, settings_pooler, settings_replicas
+
+
+def pool_limits(workers: int = settings_pool['workers']) -> tuple:
+    """
+    Функция, урезающая пул воркера до его доли общего бюджета соединений
+    Parameters
+    ----------
+    workers: int
+        Количество воркеров uvicorn
+        Пример: 4
+    Returns
+    -------
+    tuple
+        (pool_size, max_overflow), пример: (5, 15) при бюджете 80 на 4 воркера
+    """
+    share = max(settings_pool['connection_budget'] // max(workers, 1), 1)
+    pool_size = min(settings_pool['pool_size'], share)
+    max_overflow = max(min(settings_pool['max_overflow'], share - pool_size), 0)
+    return pool_size, max_overflow
+
+
+def make_engine(database: str = None, host: str = None, port: str = None) -> AsyncEngine:
+    """
+    Функция создания движка базы данных по настройкам settings_db, settings_pool и settings_pooler
+    Через пулер транзакций соединение с сервером меняется между транзакциями, поэтому
+    кэш подготовленных запросов asyncpg выключается, а statement_timeout ставится через
+    SET LOCAL в начале каждой транзакции, а не параметром соединения
+    Parameters
+    ----------
+    database: str
+        База данных, по умолчанию settings_db['database']
+        Пример: 'walks_dogs'
+    host: str
+        Сервер базы, если он не из settings_db (например, реплика). Такой сервер подключается напрямую, без пулера
+    port: str
+        Порт сервера host
+    Returns
+    -------
+    AsyncEngine
+        Движок базы данных
+    """
+    pooler = settings_pooler['enabled'] and host is None
+    host, port = host or settings_db['host'], port or settings_db['port']
+    connect_args = {}
+    if pooler:
+        host, port = settings_pooler['host'], settings_pooler['port']
+        connect_args['statement_cache_size'] = 0
+        connect_args['prepared_statement_cache_size'] = 0
+        connect_args['prepared_statement_name_func'] = lambda: f'__asyncpg_{uuid4()}__'
+    else:
+        # Запросы с одинаковым текстом готовятся на сервере один раз на соединение
+        connect_args['prepared_statement_cache_size'] = settings_pool['prepared_statement_cache_size']
+        if settings_pool['statement_timeout_ms']:
+            connect_args['server_settings'] = {'statement_timeout': str(settings_pool['statement_timeout_ms'])}
+
+    pool_size, max_overflow = pool_limits()
+    engine = create_async_engine(f"postgresql+asyncpg://{settings_db['username']}:{settings_db['password']}@{host}:{port}/{database or settings_db['database']}",
+                                 pool_size=pool_size,
+                                 max_overflow=max_overflow,
+                                 pool_pre_ping=settings_pool['pre_ping'],
+                                 pool_recycle=settings_pool['recycle'],
+                                 connect_args=connect_args)
+
+    if pooler and settings_pool['statement_timeout_ms']:
+        @event.listens_for(engine.sync_engine, 'begin')
+        def set_statement_timeout(connection):
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {settings_pool['statement_timeout_ms']}")
+
+    logger.info(f'Пул соединений {host}:{port}: pool_size={pool_size}, max_overflow={max_overflow}, пулер={pooler}')
+    return engine
+
+
+def make_replica_engines(database: str = None) -> list:
+    """
+    Функция создания движков реплик из settings_replicas['hosts']
+    Returns
+    -------
+    list
+        [AsyncEngine, ...], пустой, если реплики не настроены
+    """
+    engines = []
+    for replica in settings_replicas['hosts']:
+        host, _, port = replica.partition(':')
+        engines.append(make_engine(database=database, host=host, port=port or settings_db['port']))
+    return engines
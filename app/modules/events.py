@@ -0,0 +1,136 @@
+import asyncio
+from collections import defaultdict
+import asyncpg
+import orjson
+from loguru import logger
+from settings import settings_db, settings_events
+
+WALKS_CHANNEL = 'walks'
+
+
+class Subscription:
+    """
+    Подписка одного клиента на события заказов за дату и/или со статусом
+    """
+    __slots__ = ('current_date', 'status', 'queue')
+
+    def __init__(self, current_date: str|None, status: str|None, queue_size: int) -> None:
+        self.current_date = current_date
+        self.status = status
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, event: dict) -> None:
+        # Клиент не успевает читать: события выбрасываются, клиент должен перечитать список
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'event': 'resync'})
+
+
+class WalkEvents:
+    """
+    Рассылка событий о заказах подписчикам этого воркера
+    DB публикует события через NOTIFY в транзакции изменения, поэтому они приходят
+    только после коммита. Каждый воркер держит одно соединение с LISTEN и раскладывает
+    события по подпискам, сгруппированным по дате. При потере соединения подписчики
+    получают событие resync, так как часть событий могла быть пропущена
+    """
+
+    def __init__(self, queue_size: int = settings_events['queue_size'], reconnect_after: float = settings_events['reconnect_after']) -> None:
+        self.queue_size = queue_size
+        self.reconnect_after = reconnect_after
+        self.subscriptions = defaultdict(set)
+        self.task = None
+
+    async def start(self) -> None:
+        self.task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def listen(self) -> None:
+        # LISTEN не работает через пулер транзакций, поэтому соединение всегда прямое
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(user=settings_db['username'], password=settings_db['password'],
+                                                   host=settings_db['host'], port=settings_db['port'], database=settings_db['database'])
+                lost = asyncio.get_running_loop().create_future()
+                connection.add_termination_listener(lambda _: lost.done() or lost.set_result(None))
+                await connection.add_listener(WALKS_CHANNEL, self.dispatch)
+                logger.info(f'Подписка на канал {WALKS_CHANNEL} установлена')
+                await lost
+                logger.warning(f'Соединение с каналом {WALKS_CHANNEL} потеряно')
+            except (OSError, asyncpg.PostgresError) as error:
+                logger.warning(f'Не удалось подписаться на канал {WALKS_CHANNEL}: {error}')
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            self.broadcast({'event': 'resync'})
+            await asyncio.sleep(self.reconnect_after)
+
+    def dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        self.publish(orjson.loads(payload))
+
+    def publish(self, event: dict) -> None:
+        """
+        Функция, раздающая событие подписчикам этого воркера
+        Вызывается для событий из NOTIFY, а хранилищем в памяти - напрямую
+        Parameters
+        ----------
+        event: dict
+            Пример: {'event': 'created', 'walk_id': 1, 'start_date': '2024-01-30 14:00', 'status': 'CRTD'}
+        """
+        current_date = event['start_date'][:10]
+        # resync за дату (после загрузки заказов) получают подписчики этой даты с любым статусом
+        resync = event['event'] == 'resync'
+        for subscription in self.subscriptions.get(current_date, ()):
+            if resync or subscription.status is None or subscription.status in (event['status'], event.get('previous_status')):
+                subscription.push(event)
+        for subscription in self.subscriptions.get(None, ()):
+            if resync or subscription.status is None or subscription.status in (event['status'], event.get('previous_status')):
+                subscription.push(event)
+
+    def broadcast(self, event: dict) -> None:
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.push(event)
+
+    def subscribe(self, current_date: str = None, status: str = None) -> Subscription:
+        """
+        Функция создания подписки
+        Parameters
+        ----------
+        current_date: str
+            Дата прогулок или None для всех дат
+            Пример: '2024-01-30'
+        status: str
+            Статус заказа или None для всех статусов. Событие изменения приходит,
+            если подходит новый или прежний статус
+            Пример: 'ACSS'
+        Returns
+        -------
+        Subscription
+            Подписка, события читаются из subscription.queue
+        """
+        subscription = Subscription(current_date=current_date, status=status, queue_size=self.queue_size)
+        self.subscriptions[current_date].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(subscription.current_date)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.current_date]
+
+
+walk_events = WalkEvents()
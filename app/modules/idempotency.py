@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import time
+import orjson
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from loguru import logger
+from modules.metrics import tagged
+from modules.response_cache import ResponseCache
+from settings import settings_idempotency
+
+IDEMPOTENCY_HEADER = 'idempotency-key'
+
+
+def fingerprint(values: dict) -> str:
+    """
+    Функция, возвращающая отпечаток параметров запроса, чтобы один ключ
+    нельзя было повторно использовать для другого запроса
+    Пример: fingerprint({'phone': '89558883344', 'start_date': '2024-01-30 14:00'}) == '5f1c...'
+    """
+    return hashlib.sha256(orjson.dumps(values, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class Idempotency:
+    """
+    Ответы на запросы с заголовком Idempotency-Key
+    Первый ответ на ключ хранится ttl секунд в таблице idempotency_key и в LRU процесса,
+    повтор запроса получает сохранённый ответ, а сам запрос не выполняется.
+    Одновременные запросы с одним ключом внутри процесса ждут одно выполнение,
+    в разных воркерах - пока воркер, занявший ключ, сохранит ответ в таблицу
+    """
+
+    def __init__(self, ttl: float = settings_idempotency['ttl'], max_entries: int = settings_idempotency['max_entries'],
+                 wait: float = settings_idempotency['wait']) -> None:
+        self.ttl = ttl
+        self.wait = wait
+        self.responses = ResponseCache(ttl=ttl, max_entries=max_entries)
+        self.running = {}
+
+    async def run(self, engine: AsyncEngine|None, key: str, values: dict, call) -> dict:
+        """
+        Функция, выполняющая запрос не больше одного раза на ключ
+        Parameters
+        ----------
+        engine: AsyncEngine
+            Движок основной базы или None для хранилища в памяти: тогда ответы хранятся только в LRU процесса
+        key: str
+            Значение заголовка Idempotency-Key
+            Пример: '3f6c2a0e-8f4b-4c55-a1de-5b8d0f1e9c21'
+        values: dict
+            Параметры запроса, по которым проверяется, что ключ не используется для другого запроса
+        call: Callable[[], Awaitable[dict]]
+            Выполнение запроса
+        Returns
+        -------
+        dict
+            Ответ первого выполнения
+            или
+            {'error': 'Ключ идемпотентности уже использован для другого запроса'}
+            {'error': 'Запрос с этим ключом ещё выполняется'}
+        """
+        request = fingerprint(values)
+        cached = self.responses.get((key, request))
+        if cached is not None:
+            return orjson.loads(cached)
+        running = self.running.get(key)
+        if running is None:
+            # Задача защищена от отмены: если первый клиент оборвал соединение, остальные дождутся ответа
+            running = (request, asyncio.ensure_future(self.execute(engine=engine, key=key, request=request, call=call)))
+            self.running[key] = running
+            running[1].add_done_callback(lambda _: self.running.pop(key, None))
+        if running[0] != request:
+            return {'error': 'Ключ идемпотентности уже использован для другого запроса'}
+        return await asyncio.shield(running[1])
+
+    async def execute(self, engine: AsyncEngine|None, key: str, request: str, call) -> dict:
+        if engine is None:
+            # Без таблицы idempotency_key отпечаток запроса, занявшего ключ, хранится в том же LRU
+            stored = self.responses.get((key,))
+            if stored is not None and stored.decode() != request:
+                return {'error': 'Ключ идемпотентности уже использован для другого запроса'}
+            result = await call()
+            if result is not None:
+                self.responses.put((key,), request.encode())
+                self.responses.put((key, request), orjson.dumps(result))
+            return result
+        deadline = time.monotonic() + self.wait
+        while True:
+            async with AsyncSession(engine) as session:
+                async with session.begin():
+                    claimed, stored = await self.claim(session=session, key=key, request=request)
+            if claimed:
+                break
+            if stored is None:
+                # Ключ освободили между попыткой занять его и чтением
+                continue
+            if stored.fingerprint != request:
+                return {'error': 'Ключ идемпотентности уже использован для другого запроса'}
+            if stored.response is not None:
+                self.responses.put((key, request), stored.response.encode())
+                return orjson.loads(stored.response)
+            if time.monotonic() > deadline:
+                return {'error': 'Запрос с этим ключом ещё выполняется'}
+            await asyncio.sleep(settings_idempotency['poll_interval'])
+
+        result = None
+        try:
+            result = await call()
+        finally:
+            async with AsyncSession(engine) as session:
+                async with session.begin():
+                    await self.finish(session=session, key=key, result=result)
+        if result is not None:
+            self.responses.put((key, request), orjson.dumps(result))
+        return result
+
+    @tagged
+    async def claim(self, session: AsyncSession, key: str, request: str) -> tuple:
+        """
+        Функция, занимающая ключ для выполнения запроса
+        Ключ можно занять, если его нет, он устарел или занявший его воркер не сохранил
+        ответ за claim_timeout секунд
+        Returns
+        -------
+        tuple
+            (True, None), если ключ занят этим вызовом,
+            иначе (False, (fingerprint, response)) сохранённого ключа
+        """
+        claimed = (await session.execute(text("""INSERT INTO idempotency_key (key, fingerprint, response, created_at)
+                                                 VALUES (:key, :fingerprint, NULL, localtimestamp)
+                                                 ON CONFLICT (key) DO UPDATE
+                                                    SET fingerprint = excluded.fingerprint, response = NULL, created_at = excluded.created_at
+                                                    WHERE idempotency_key.created_at < localtimestamp - make_interval(secs => :ttl)
+                                                       OR (idempotency_key.response IS NULL
+                                                           AND idempotency_key.created_at < localtimestamp - make_interval(secs => :claim_timeout))
+                                                 RETURNING key"""),
+                                         {'key': key, 'fingerprint': request, 'ttl': self.ttl,
+                                          'claim_timeout': settings_idempotency['claim_timeout']})).scalar()
+        if claimed is not None:
+            return True, None
+        return False, (await session.execute(text('SELECT fingerprint, response FROM idempotency_key WHERE key = :key'), {'key': key})).one_or_none()
+
+    @tagged
+    async def finish(self, session: AsyncSession, key: str, result: dict|None) -> None:
+        """
+        Функция, сохраняющая ответ на ключ
+        Если запрос завершился исключением (result is None), ключ освобождается, и повтор выполнит запрос заново
+        """
+        if result is None:
+            await session.execute(text('DELETE FROM idempotency_key WHERE key = :key AND response IS NULL'), {'key': key})
+        else:
+            await session.execute(text('UPDATE idempotency_key SET response = :response WHERE key = :key'),
+                                  {'key': key, 'response': orjson.dumps(result).decode()})
+
+    @logger.catch
+    @tagged
+    async def purge(self, engine: AsyncEngine) -> int:
+        """
+        Функция, удаляющая устаревшие ключи
+        Returns
+        -------
+        int
+            Количество удалённых ключей
+        """
+        async with AsyncSession(engine) as session:
+            async with session.begin():
+                deleted = (await session.execute(text('DELETE FROM idempotency_key WHERE created_at < localtimestamp - make_interval(secs => :ttl)'),
+                                                 {'ttl': self.ttl})).rowcount
+        if deleted:
+            logger.debug(f'Удалено устаревших ключей идемпотентности: {deleted}')
+        return deleted
+
+
+idempotency = Idempotency()
@@ -0,0 +1,124 @@
+import time
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from loguru import logger
+from modules.metrics import tagged
+from models import Cache_version
+from settings import settings_cache
+
+# Версию увеличивают триггеры migrations/versions/0009 при изменении или удалении хозяина или собаки
+IDENTITY_VERSION = 'identity'
+# Ключ session.info, в котором найденные в транзакции хозяева и собаки ждут коммита
+PENDING_IDENTITIES = 'pending_identities'
+
+
+class IdentityCache:
+    """
+    Кэш хозяев и собак в памяти процесса
+    Хранит user_id по (phone, flat_number) и dog_id по (user_id, dog_name), при переполнении
+    вытесняются самые давно использованные записи. Записи добавляются только после коммита
+    транзакции, в которой хозяин и собака были найдены или созданы. Изменение или удаление
+    хозяина или собаки увеличивает версию в cache_version, кэш сверяет её с базой
+    не чаще, чем раз в identity_check_interval секунд, и при расхождении очищается
+    """
+
+    def __init__(self, check_interval: float = settings_cache['identity_check_interval'],
+                 max_entries: int = settings_cache['identity_max_entries']) -> None:
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.users = OrderedDict()
+        self.dogs = OrderedDict()
+        self.version = None
+        self.checked_at = 0.0
+
+    def invalidate(self) -> None:
+        """
+        Функция, очищающая кэш
+        """
+        self.users.clear()
+        self.dogs.clear()
+        self.version = None
+        self.checked_at = 0.0
+
+    async def get(self, session: AsyncSession, phone: str, flat_number: int, dog_name: str) -> int|None:
+        """
+        Функция получения dog_id собаки хозяина
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, через которую при необходимости сверяется версия
+        phone: str
+            Пример: '89558883344'
+        flat_number: int
+            Пример: 1
+        dog_name: str
+            Пример: 'Барбос'
+        Returns
+        -------
+        int
+            dog_id или None, если хозяина или собаки нет в кэше
+        """
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            await self.refresh(session=session)
+        user_id = self.users.get((phone, flat_number))
+        if user_id is None:
+            return None
+        self.users.move_to_end((phone, flat_number))
+        dog_id = self.dogs.get((user_id, dog_name))
+        if dog_id is not None:
+            self.dogs.move_to_end((user_id, dog_name))
+        return dog_id
+
+    def put(self, phone: str, flat_number: int, dog_name: str, user_id: int, dog_id: int) -> None:
+        """
+        Функция, сохраняющая хозяина и собаку в кэш
+        """
+        for entries, key, value in ((self.users, (phone, flat_number), user_id), (self.dogs, (user_id, dog_name), dog_id)):
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def remember(self, session: AsyncSession, phone: str, flat_number: int, dog_name: str, user_id: int, dog_id: int) -> None:
+        """
+        Функция, откладывающая сохранение хозяина и собаки в кэш до коммита транзакции session
+        Если до коммита кэш успеет очиститься из-за новой версии, запись не сохраняется
+        """
+        session.info.setdefault(PENDING_IDENTITIES, []).append((self.version, phone, flat_number, dog_name, user_id, dog_id))
+
+    @tagged
+    async def refresh(self, session: AsyncSession) -> None:
+        """
+        Функция, сверяющая версию с базой и очищающая кэш, если версия изменилась
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия базы данных
+        """
+        version = (await session.execute(
+            select(Cache_version.version).where(Cache_version.name == IDENTITY_VERSION)
+        )).scalar() or 0
+        if version != self.version:
+            if self.version is not None:
+                logger.debug(f'Хозяева или собаки изменились, кэш очищен, версия {version}')
+            self.users.clear()
+            self.dogs.clear()
+            self.version = version
+        self.checked_at = time.monotonic()
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def put_committed_identities(session: Session) -> None:
+    for version, *identity in session.info.pop(PENDING_IDENTITIES, ()):
+        if version == identity_cache.version:
+            identity_cache.put(*identity)
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_rolled_back_identities(session: Session) -> None:
+    session.info.pop(PENDING_IDENTITIES, None)
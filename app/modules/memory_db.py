@@ -0,0 +1,620 @@
+import csv
+import io
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import count, groupby
+import orjson
+from loguru import logger
+from modules.checks import checks
+from modules.db import HALF_HOURS, decode_cursor, encode_cursor, walk_item
+from modules.events import walk_events
+from modules.scheduler import assign_day, minutes
+from modules.storage import Storage
+from settings import settings_bulk, settings_reports, settings_slot
+
+# Номер времени прогулки в массиве цен: '07:00' - 0, '07:30' - 1, ..., '23:00' - 32
+HALF_HOUR_INDEX = {half_hour: index for index, half_hour in enumerate(HALF_HOURS)}
+# Длина периода отчёта в дате ГГГГ-ММ-ДД
+PERIOD_LENGTHS = {'day': 10, 'month': 7, 'year': 4}
+# Колонки выгрузки в порядке modules.db.EXPORT_QUERY
+EXPORT_COLUMNS = ('name', 'phone', 'flat_number', 'dog_name', 'dog_description', 'start_date',
+                  'status', 'who_walking', 'price', 'walk_id', 'end_date', 'created_at')
+EXPORT_CHUNK = 1000
+
+
+class StoredWalk:
+    """
+    Заказ в памяти, поля как у таблицы walk
+    """
+    __slots__ = ('walk_id', 'start_date', 'hour_minute', 'end_date', 'dog_id', 'status', 'created_at', 'price', 'who_walking', 'walker_id')
+
+    def __init__(self, walk_id: int, start_date: datetime, hour_minute: str, dog_id: int, status: str, price: float,
+                 who_walking: str|None = None) -> None:
+        self.walk_id = walk_id
+        self.start_date = start_date
+        self.hour_minute = hour_minute
+        self.end_date = start_date + timedelta(minutes=30)
+        self.dog_id = dog_id
+        self.status = status
+        self.created_at = datetime.now()
+        self.price = float(price)
+        self.who_walking = who_walking
+        self.walker_id = None
+
+
+def walk_order(walk: StoredWalk) -> tuple:
+    return walk.start_date, walk.walk_id
+
+
+def export_price(price: float) -> float|int:
+    # Как float8 в выгрузке PostgreSQL: 450, а не 450.0
+    return int(price) if price.is_integer() else price
+
+
+class MemoryDB(Storage):
+    """
+    Хранилище в памяти процесса для локального профилирования и быстрых проверок без базы
+    Данные живут, пока работает процесс, и не видны другим воркерам. Индексы:
+    хозяева - словарь по (phone, flat_number), собаки - по (user_id, dog_name),
+    заказы - по walk_id, по (dog_id, start_date) и списки по дням, упорядоченные по (start_date, walk_id),
+    места - словарь занятости по start_date, цены - массив по номеру времени прогулки.
+    Методы не ждут ввода-вывода, поэтому каждое изменение выполняется целиком без переключения задач
+    """
+
+    def __init__(self) -> None:
+        self.ids = {table: count(1) for table in ('users', 'dog', 'walk', 'time_price', 'walker')}
+        self.users = {}
+        self.user_rows = {}
+        self.dogs = {}
+        self.dog_rows = {}
+        self.prices = [None] * len(HALF_HOURS)
+        self.price_ids = [None] * len(HALF_HOURS)
+        self.walks = {}
+        self.walk_keys = {}
+        self.days = {}
+        self.day_keys = []
+        self.slots = {}
+        self.versions = {}
+        self.walkers = {}
+        self.walker_ids = {}
+        self.shifts = {}
+        self.reports = {}
+
+    def price(self, hour_minute: str) -> float|None:
+        index = HALF_HOUR_INDEX.get(hour_minute)
+        return None if index is None else self.prices[index]
+
+    def resolve_dog(self, values: dict) -> int:
+        """
+        Функция, находящая или создающая хозяина и собаку, как DB.resolve_dog:
+        имя хозяина и описание собаки у существующих не меняются
+        """
+        user_id = self.users.get((values['phone'], values['flat_number']))
+        if user_id is None:
+            user_id = next(self.ids['users'])
+            self.users[(values['phone'], values['flat_number'])] = user_id
+            self.user_rows[user_id] = (values['name'], values['phone'], values['flat_number'])
+        dog_id = self.dogs.get((user_id, values['dog_name']))
+        if dog_id is None:
+            dog_id = next(self.ids['dog'])
+            self.dogs[(user_id, values['dog_name'])] = dog_id
+            self.dog_rows[dog_id] = (values['dog_name'], values.get('dog_description'), user_id)
+        return dog_id
+
+    def add_walk(self, start_date: datetime, hour_minute: str, dog_id: int, status: str, price: float,
+                 who_walking: str|None = None) -> StoredWalk:
+        walk = StoredWalk(walk_id=next(self.ids['walk']), start_date=start_date, hour_minute=hour_minute, dog_id=dog_id,
+                          status=status, price=price, who_walking=who_walking)
+        walk.walker_id = self.walker_ids.get(who_walking)
+        self.walks[walk.walk_id] = walk
+        self.walk_keys[(dog_id, start_date)] = walk.walk_id
+        day = start_date.date()
+        if day not in self.days:
+            self.days[day] = []
+            insort(self.day_keys, day)
+        insort(self.days[day], walk, key=walk_order)
+        return walk
+
+    def take_slots(self, start_dates: list) -> set:
+        """
+        Функция, занимающая места, как DB.take_slots: на одно время все вместе или ни одного
+        """
+        taken = set()
+        for start_date, places in sorted(Counter(start_dates).items()):
+            if self.slots.get(start_date, 0) + places <= settings_slot['capacity']:
+                self.slots[start_date] = self.slots.get(start_date, 0) + places
+                taken.add(start_date)
+        return taken
+
+    def release_slots(self, start_dates: list) -> None:
+        for start_date, places in Counter(start_dates).items():
+            if start_date in self.slots:
+                self.slots[start_date] = max(self.slots[start_date] - places, 0)
+
+    def notify_walks(self, events: list) -> None:
+        for event in events:
+            walk_events.publish({**event, 'start_date': event['start_date'].isoformat(' ', 'minutes')})
+
+    def bump_walks_versions(self, start_dates: list) -> None:
+        for day in {start_date.date() for start_date in start_dates}:
+            self.versions[day] = self.versions.get(day, 0) + 1
+
+    def item(self, walk: StoredWalk) -> dict:
+        dog_name, dog_description, user_id = self.dog_rows[walk.dog_id]
+        user_name, phone, _ = self.user_rows[user_id]
+        return walk_item((walk.walk_id, walk.start_date, walk.end_date, walk.created_at, walk.status, walk.price,
+                          dog_name, dog_description, phone, user_name, walk.who_walking))
+
+    def select_walks(self, current_date: str = None, status: str = None, after: tuple = None):
+        """
+        Функция, перебирающая заказы в порядке (start_date, walk_id)
+        Parameters
+        ----------
+        current_date: str
+            Дата или None для всех дат
+        status: str
+            Статус или None для всех статусов
+        after: tuple
+            (start_date, walk_id) заказа, после которого начинается перебор
+        """
+        if current_date is not None:
+            days = [date.fromisoformat(current_date)]
+        else:
+            days = self.day_keys[bisect_left(self.day_keys, after[0].date()) if after else 0:]
+        for day in days:
+            walks = self.days.get(day, ())
+            position = bisect_right(walks, after, key=walk_order) if after else 0
+            # Копия дня: при потоковой выдаче в день могут добавиться заказы
+            for walk in walks[position:]:
+                if status is None or walk.status == status:
+                    yield walk
+
+    @logger.catch
+    async def insert(self, table_name: str, values: dict) -> dict:
+        if table_name == 'walk':
+            return await self.book_walk(values=values)
+        match table_name:
+            case 'users':
+                object_id = self.users.get((values['phone'], values['flat_number']))
+            case 'dog':
+                object_id = self.dogs.get((values['user_id'], values['dog_name']))
+            case 'time_price':
+                if values['hour_minute'] not in HALF_HOUR_INDEX:
+                    return {'error': 'Неправильный формат времени'}
+                object_id = self.price(values['hour_minute'])
+            case _:
+                return None
+        if object_id is not None:
+            return {'message': 'Объект уже существует',
+                    'object_id': object_id}
+        match table_name:
+            case 'users':
+                object_id = next(self.ids['users'])
+                self.users[(values['phone'], values['flat_number'])] = object_id
+                self.user_rows[object_id] = (values['name'], values['phone'], values['flat_number'])
+            case 'dog':
+                object_id = next(self.ids['dog'])
+                self.dogs[(values['user_id'], values['dog_name'])] = object_id
+                self.dog_rows[object_id] = (values['dog_name'], values['dog_description'], values['user_id'])
+            case 'time_price':
+                object_id = next(self.ids['time_price'])
+                self.prices[HALF_HOUR_INDEX[values['hour_minute']]] = float(values['price'])
+                self.price_ids[HALF_HOUR_INDEX[values['hour_minute']]] = object_id
+        return {'message': 'Объект сохранен',
+                'object_id': object_id}
+
+    @logger.catch
+    async def book_walk(self, values: dict) -> dict:
+        start_date = datetime.strptime(values['start_date'],"%Y-%m-%d %H:%M")
+        hour_minute = values['start_date'][11:]
+        price = self.price(hour_minute)
+        if not price:
+            return {'error': 'Вы не создали цену для времени'}
+        if not self.take_slots(start_dates=[start_date]):
+            return {'error': 'Время уже занято'}
+        dog_id = self.resolve_dog(values=values)
+        walk_id = self.walk_keys.get((dog_id, start_date))
+        if walk_id is not None:
+            self.release_slots(start_dates=[start_date])
+            return {'message': 'Объект уже существует',
+                    'object_id': walk_id}
+        walk = self.add_walk(start_date=start_date, hour_minute=hour_minute, dog_id=dog_id, status='CRTD', price=price)
+        self.notify_walks(events=[{'event': 'created', 'walk_id': walk.walk_id, 'start_date': start_date, 'status': 'CRTD'}])
+        self.bump_walks_versions(start_dates=[start_date])
+        return {'message': 'Объект сохранен',
+                'object_id': walk.walk_id}
+
+    @logger.catch
+    async def book_walks(self, values: dict, start_dates: list) -> list:
+        results = {}
+        wanted = {}
+        for start_date in sorted(set(start_dates)):
+            if not self.price(start_date[11:]):
+                results[start_date] = {'error': 'Вы не создали цену для времени'}
+            else:
+                wanted[datetime.strptime(start_date,"%Y-%m-%d %H:%M")] = start_date
+        if wanted:
+            dog_id = self.resolve_dog(values=values)
+            for start_date in list(wanted):
+                walk_id = self.walk_keys.get((dog_id, start_date))
+                if walk_id is not None:
+                    results[wanted.pop(start_date)] = {'message': 'Объект уже существует', 'object_id': walk_id}
+        if wanted:
+            taken = self.take_slots(start_dates=list(wanted))
+            for start_date in list(wanted):
+                if start_date not in taken:
+                    results[wanted.pop(start_date)] = {'error': 'Время уже занято'}
+        if wanted:
+            created = [self.add_walk(start_date=start_date, hour_minute=wanted[start_date][11:], dog_id=dog_id,
+                                     status='CRTD', price=self.price(wanted[start_date][11:]))
+                       for start_date in wanted]
+            for walk in created:
+                results[wanted[walk.start_date]] = {'message': 'Объект сохранен', 'object_id': walk.walk_id}
+            self.notify_walks(events=[{'event': 'created', 'walk_id': walk.walk_id, 'start_date': walk.start_date, 'status': 'CRTD'}
+                                      for walk in created])
+            self.bump_walks_versions(start_dates=list(wanted))
+        return [{'start_date': start_date, **results[start_date]} for start_date in start_dates]
+
+    @logger.catch
+    async def update(self, table_name: str, values: dict) -> dict:
+        match table_name:
+            case 'walk':
+                walk = self.walks.get(values['walk_id'])
+                if walk is not None and (walk.status == 'RJCT') != (values['status'] == 'RJCT'):
+                    if values['status'] == 'RJCT':
+                        self.release_slots(start_dates=[walk.start_date])
+                    elif not self.take_slots(start_dates=[walk.start_date]):
+                        return {'error': 'Время уже занято'}
+                if walk is not None:
+                    previous_status = walk.status
+                    walk.status = values['status']
+                    walk.who_walking = values['who_walking']
+                    walk.walker_id = self.walker_ids.get(walk.who_walking)
+                    self.notify_walks(events=[
+                        {'event': 'updated', 'walk_id': walk.walk_id, 'start_date': walk.start_date,
+                         'status': walk.status, 'previous_status': previous_status, 'who_walking': walk.who_walking}])
+                    self.bump_walks_versions(start_dates=[walk.start_date])
+            case 'time_price':
+                if self.price(values['hour_minute']) is None:
+                    return {'error': 'Вы не создали цену для времени'}
+                self.prices[HALF_HOUR_INDEX[values['hour_minute']]] = float(values['price'])
+        return {'message': 'Значение успешно изменено'}
+
+    @logger.catch
+    async def update_walks(self, walks: list) -> list:
+        changes = {walk['walk_id']: walk for walk in walks}
+        results = {}
+        found = {walk_id: self.walks[walk_id] for walk_id in sorted(changes) if walk_id in self.walks}
+        for walk_id in changes:
+            if walk_id not in found:
+                results[walk_id] = {'error': 'Заказ не найден'}
+
+        released = [walk.start_date for walk in found.values() if walk.status != 'RJCT' and changes[walk.walk_id]['status'] == 'RJCT']
+        if released:
+            self.release_slots(start_dates=released)
+        restored = [walk for walk in found.values() if walk.status == 'RJCT' and changes[walk.walk_id]['status'] != 'RJCT']
+        if restored:
+            taken = self.take_slots(start_dates=[walk.start_date for walk in restored])
+            for walk in restored:
+                if walk.start_date not in taken:
+                    results[walk.walk_id] = {'error': 'Время уже занято'}
+
+        updated = [found[walk_id] for walk_id in found if walk_id not in results]
+        events = []
+        for walk in updated:
+            events.append({'event': 'updated', 'walk_id': walk.walk_id, 'start_date': walk.start_date,
+                           'status': changes[walk.walk_id]['status'], 'previous_status': walk.status,
+                           'who_walking': changes[walk.walk_id]['who_walking']})
+            walk.status = changes[walk.walk_id]['status']
+            walk.who_walking = changes[walk.walk_id]['who_walking']
+            walk.walker_id = self.walker_ids.get(walk.who_walking)
+            results[walk.walk_id] = {'message': 'Значение успешно изменено'}
+        if updated:
+            self.notify_walks(events=events)
+            self.bump_walks_versions(start_dates=[walk.start_date for walk in updated])
+        return [{'walk_id': walk['walk_id'], **results[walk['walk_id']]} for walk in walks]
+
+    @logger.catch
+    async def get_walk_ids(self, current_date: str, status: str = None) -> list:
+        return [walk.walk_id for walk in self.select_walks(current_date=current_date, status=status)]
+
+    @logger.catch
+    async def get_all_walks(self, current_date: str = None, status: str = None) -> list:
+        return [self.item(walk) for walk in self.select_walks(current_date=current_date, status=status)]
+
+    @logger.catch
+    async def get_versioned_walks(self, current_date: str, status: str = None) -> dict:
+        return {'version': self.versions.get(date.fromisoformat(current_date), 0),
+                'walks': [self.item(walk) for walk in self.select_walks(current_date=current_date, status=status)]}
+
+    @logger.catch
+    async def get_walks_page(self, current_date: str = None, status: str = None, limit: int = 100, cursor: str = None) -> dict:
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if after is None:
+                return {'error': 'Неправильный курсор'}
+        walks = []
+        for walk in self.select_walks(current_date=current_date, status=status, after=after):
+            walks.append(walk)
+            if len(walks) > limit:
+                break
+        next_cursor = None
+        if len(walks) > limit:
+            walks = walks[:limit]
+            next_cursor = encode_cursor(start_date=walks[-1].start_date, walk_id=walks[-1].walk_id)
+        return {'walks': [self.item(walk) for walk in walks],
+                'next_cursor': next_cursor}
+
+    async def stream_walks(self, current_date: str = None, status: str = None, chunk_size: int = 1000):
+        for walk in self.select_walks(current_date=current_date, status=status):
+            yield self.item(walk)
+
+    @logger.catch
+    async def get_walks_version(self, current_date: str) -> int:
+        return self.versions.get(date.fromisoformat(current_date), 0)
+
+    @logger.catch
+    async def get_slots(self, date_from: str, date_to: str) -> list:
+        day = datetime.strptime(date_from,"%Y-%m-%d")
+        day_to = datetime.strptime(date_to,"%Y-%m-%d") + timedelta(days=1)
+        items = []
+        while day < day_to:
+            for half_hour, price in zip(HALF_HOURS, self.prices):
+                start_date = day.replace(hour=int(half_hour[:2]), minute=int(half_hour[3:]))
+                items.append({
+                    'start_date': f"{day:%Y-%m-%d} {half_hour}",
+                    'free': max(settings_slot['capacity'] - self.slots.get(start_date, 0), 0),
+                    'price': price})
+            day += timedelta(days=1)
+        return items
+
+    @logger.catch
+    async def create_price(self, hour_minute: str|None = None, price: float|None = None, schedule: list|None = None) -> dict:
+        if not hour_minute:
+            if schedule:
+                prices = {}
+                for band in schedule:
+                    for half_hour in HALF_HOURS:
+                        if band['start'] <= half_hour <= band['end']:
+                            prices[half_hour] = band['price']
+                if not prices:
+                    return {'error': 'Интервалы не покрывают ни одного времени прогулки'}
+            else:
+                if not price:
+                    price = 500
+                prices = {half_hour: price for half_hour in HALF_HOURS}
+            for half_hour, half_hour_price in prices.items():
+                index = HALF_HOUR_INDEX[half_hour]
+                if self.price_ids[index] is None:
+                    self.price_ids[index] = next(self.ids['time_price'])
+                self.prices[index] = float(half_hour_price)
+            return {'message': 'Цены добавлены'}
+        else:
+            if not price:
+                return {'error': 'Не указана цена'}
+            else:
+                result = await self.update(table_name='time_price', values={'hour_minute': hour_minute,'price': price})
+                if 'error' in result:
+                    return result
+            return {'message': 'Цена изменена'}
+
+    @logger.catch
+    async def create_walker(self, name: str, capacity: int, shifts: list) -> dict:
+        walker_id = self.walker_ids.get(name)
+        if walker_id is None:
+            walker_id = next(self.ids['walker'])
+            self.walker_ids[name] = walker_id
+        self.walkers[walker_id] = (name, capacity)
+        self.shifts[walker_id] = [(shift['day_of_week'], shift['start'], shift['end']) for shift in shifts]
+        return {'message': 'Гуляющий сохранен', 'object_id': walker_id}
+
+    @logger.catch
+    async def schedule_walks(self, date_from: str, days: int = 1, reassign: bool = False) -> dict:
+        day_from = date.fromisoformat(date_from)
+        shifts = {}
+        for walker_id, walker_shifts in self.shifts.items():
+            for day_of_week, shift_start, shift_end in walker_shifts:
+                shifts.setdefault(day_of_week, []).append((minutes(shift_start), minutes(shift_end), walker_id))
+        walks = [walk for day in range(days) for walk in self.days.get(day_from + timedelta(days=day), ()) if walk.status == 'ACSS']
+
+        capacity = {walker_id: walker_capacity for walker_id, (_, walker_capacity) in self.walkers.items()}
+        assigned = []
+        unassigned = []
+        load = {}
+        for day, day_walks in groupby(walks, key=lambda walk: walk.start_date.date()):
+            day_walks = list(day_walks)
+            busy = set()
+            day_load = {}
+            if not reassign:
+                for walk in day_walks:
+                    if walk.walker_id is not None:
+                        busy.add((walk.walker_id, walk.start_date.hour * 60 + walk.start_date.minute))
+                        day_load[walk.walker_id] = day_load.get(walk.walker_id, 0) + 1
+            day_assigned, day_unassigned = assign_day(
+                walks=[(walk.start_date.hour * 60 + walk.start_date.minute, walk.end_date.hour * 60 + walk.end_date.minute or 1440, walk.walk_id)
+                       for walk in day_walks if reassign or walk.walker_id is None],
+                shifts=shifts.get(day.isoweekday(), []),
+                capacity=capacity,
+                busy=busy,
+                load=day_load)
+            assigned.extend(day_assigned)
+            unassigned.extend(day_unassigned)
+            for walker_id, walks_count in day_load.items():
+                load[walker_id] = load.get(walker_id, 0) + walks_count
+
+        # Заказ, которому не хватило гуляющего, остаётся с прежним who_walking, но без walker_id
+        changes = [(self.walks[walk_id], walker_id, self.walkers[walker_id][0]) for walk_id, walker_id in assigned
+                   if self.walks[walk_id].walker_id != walker_id]
+        changes += [(self.walks[walk_id], None, self.walks[walk_id].who_walking) for walk_id in unassigned
+                    if self.walks[walk_id].walker_id is not None]
+        for walk, walker_id, name in changes:
+            walk.walker_id = walker_id
+            walk.who_walking = name
+        if changes:
+            self.notify_walks(events=[
+                {'event': 'updated', 'walk_id': walk.walk_id, 'start_date': walk.start_date,
+                 'status': 'ACSS', 'previous_status': 'ACSS', 'who_walking': name}
+                for walk, _, name in changes])
+            self.bump_walks_versions(start_dates=[walk.start_date for walk, _, _ in changes])
+        logger.info(f'Назначено {len(assigned)} прогулок, без гуляющего {len(unassigned)}, изменено {len(changes)}')
+        return {'assigned': len(assigned),
+                'unassigned': unassigned,
+                'load': {self.walkers[walker_id][0]: walks_count for walker_id, walks_count in load.items()}}
+
+    @logger.catch
+    async def refresh_reports(self, batch: int = settings_reports['refresh_batch']) -> int:
+        dirty = sorted(day for day, version in self.versions.items() if self.reports.get(day, (None,))[0] != version)[:batch]
+        for day in dirty:
+            statuses, walkers, slots = {}, {}, Counter()
+            for walk in self.days.get(day, ()):
+                status = statuses.setdefault(walk.status, [0, 0.0])
+                status[0] += 1
+                status[1] += walk.price
+                if walk.status != 'RJCT':
+                    slots[walk.hour_minute] += 1
+                    if walk.who_walking is not None:
+                        walker = walkers.setdefault(walk.who_walking, [0, 0.0])
+                        walker[0] += 1
+                        walker[1] += walk.price
+            self.reports[day] = (self.versions[day], statuses, walkers, slots)
+        if dirty:
+            logger.debug(f'Сводки пересчитаны за {len(dirty)} дат')
+        return len(dirty)
+
+    def day_reports(self, date_from: str, date_to: str):
+        day_from = date.fromisoformat(date_from)
+        day_to = date.fromisoformat(date_to)
+        for day, report in self.reports.items():
+            if day_from <= day <= day_to:
+                yield day, report
+
+    @logger.catch
+    async def get_revenue_report(self, date_from: str, date_to: str, period: str = 'month') -> list:
+        totals = {}
+        for day, (_, statuses, _, _) in self.day_reports(date_from=date_from, date_to=date_to):
+            for status, (walks, revenue) in statuses.items():
+                total = totals.setdefault((day.isoformat()[:PERIOD_LENGTHS[period]], status), [0, 0.0])
+                total[0] += walks
+                total[1] += revenue
+        items = {}
+        for (period_name, status), (walks, revenue) in sorted(totals.items()):
+            item = items.setdefault(period_name, {'period': period_name, 'walks': 0, 'revenue': 0.0, 'statuses': {}})
+            item['statuses'][status] = {'walks': walks, 'revenue': revenue}
+            item['walks'] += walks
+            if status != 'RJCT':
+                item['revenue'] += revenue
+        return list(items.values())
+
+    @logger.catch
+    async def get_walkers_report(self, date_from: str, date_to: str) -> list:
+        totals = {}
+        for _, (_, _, walkers, _) in self.day_reports(date_from=date_from, date_to=date_to):
+            for who_walking, (walks, revenue) in walkers.items():
+                total = totals.setdefault(who_walking, [0, 0.0])
+                total[0] += walks
+                total[1] += revenue
+        return [{'who_walking': who_walking, 'walks': walks, 'revenue': revenue}
+                for who_walking, (walks, revenue) in sorted(totals.items(), key=lambda total: (-total[1][1], total[0]))]
+
+    @logger.catch
+    async def get_utilization_report(self, date_from: str, date_to: str) -> list:
+        walks = Counter()
+        for _, (_, _, _, slots) in self.day_reports(date_from=date_from, date_to=date_to):
+            walks.update(slots)
+        places = ((date.fromisoformat(date_to) - date.fromisoformat(date_from)).days + 1) * settings_slot['capacity']
+        return [{'hour_minute': half_hour,
+                 'walks': walks.get(half_hour, 0),
+                 'places': places,
+                 'utilization': round(walks.get(half_hour, 0) / places, 3)}
+                for half_hour in HALF_HOURS]
+
+    @logger.catch
+    async def import_walks(self, walks, allow_past: bool = False, batch: int = settings_bulk['batch']) -> dict:
+        summary = {'imported': 0, 'existing': 0, 'errors': 0, 'error_samples': []}
+        pending, first_line = [], 1
+        async for walk in walks:
+            pending.append(walk)
+            if len(pending) >= batch:
+                self.merge_walks(walks=pending, first_line=first_line, allow_past=allow_past, summary=summary)
+                first_line += len(pending)
+                pending = []
+        if pending:
+            self.merge_walks(walks=pending, first_line=first_line, allow_past=allow_past, summary=summary)
+        return summary
+
+    def merge_walks(self, walks: list, first_line: int, allow_past: bool, summary: dict) -> None:
+        """
+        Функция, загружающая одну пачку import_walks по правилам DB.merge_records: повтор заказа
+        в пачке считается существующим или получает ошибку первого такого заказа
+        """
+        failed, created = [], []
+        skipped = 0
+        first = {}
+        for line, walk in enumerate(checks.check_imported_walks(walks=walks, allow_past=allow_past), start=first_line):
+            if 'error' in walk:
+                failed.append((line, walk['error']))
+                continue
+            dog_id = self.resolve_dog(values=walk)
+            start_date = datetime.fromisoformat(walk['start_date'])
+            price = walk['price'] or self.price(walk['start_date'][11:])
+            if price is None:
+                failed.append((line, 'Вы не создали цену для времени'))
+                first.setdefault((dog_id, start_date), 'Вы не создали цену для времени')
+                continue
+            if (dog_id, start_date) in first:
+                if first[(dog_id, start_date)] is None:
+                    skipped += 1
+                else:
+                    failed.append((line, first[(dog_id, start_date)]))
+                continue
+            error = None
+            if (dog_id, start_date) in self.walk_keys:
+                skipped += 1
+            elif walk['status'] != 'RJCT' and not self.take_slots(start_dates=[start_date]):
+                error = 'Время уже занято'
+            else:
+                created.append(self.add_walk(start_date=start_date, hour_minute=walk['start_date'][11:], dog_id=dog_id,
+                                             status=walk['status'], price=price, who_walking=walk['who_walking']))
+            first[(dog_id, start_date)] = error
+            if error is not None:
+                failed.append((line, error))
+        if created:
+            days = sorted({walk.start_date.date() for walk in created})
+            self.notify_walks(events=[{'event': 'resync', 'start_date': datetime.combine(day, datetime.min.time())} for day in days])
+            self.bump_walks_versions(start_dates=[walk.start_date for walk in created])
+
+        summary['imported'] += len(created)
+        summary['existing'] += skipped
+        summary['errors'] += len(failed)
+        summary['error_samples'].extend({'line': line, 'error': error}
+                                        for line, error in failed[:settings_bulk['error_samples'] - len(summary['error_samples'])])
+
+    async def export_walks(self, date_from: str, date_to: str, file_format: str = 'csv'):
+        day_from = date.fromisoformat(date_from)
+        day_to = date.fromisoformat(date_to)
+        days = self.day_keys[bisect_left(self.day_keys, day_from):bisect_right(self.day_keys, day_to)]
+        rows = (self.export_row(walk) for day in days for walk in list(self.days[day]))
+        if file_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(EXPORT_COLUMNS)
+            while True:
+                chunk = [row for _, row in zip(range(EXPORT_CHUNK), rows)]
+                writer.writerows(chunk)
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                if len(chunk) < EXPORT_CHUNK:
+                    return
+        else:
+            while chunk := [row for _, row in zip(range(EXPORT_CHUNK), rows)]:
+                yield b''.join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))) + b'\n' for row in chunk)
+
+    def export_row(self, walk: StoredWalk) -> tuple:
+        dog_name, dog_description, user_id = self.dog_rows[walk.dog_id]
+        user_name, phone, flat_number = self.user_rows[user_id]
+        return (user_name, phone, flat_number, dog_name, dog_description, walk.start_date.isoformat(' ', 'minutes'),
+                walk.status, walk.who_walking, export_price(walk.price), walk.walk_id,
+                walk.end_date.isoformat(' ', 'minutes'), walk.created_at.isoformat(' ', 'minutes'))
@@ -0,0 +1,178 @@
+import re
+import time
+from contextvars import ContextVar
+from functools import wraps
+from inspect import isasyncgenfunction
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from loguru import logger
+from settings import settings_metrics
+
+# Метод DB, который сейчас выполняет запросы; выставляется декоратором tagged
+db_method = ContextVar('db_method', default='other')
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FINGERPRINT_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+|%\(\w+\)s")
+FINGERPRINT_LISTS = re.compile(r"\((?:\s*\?\s*,)*\s*\?\s*\)(?:\s*,\s*\((?:\s*\?\s*,)*\s*\?\s*\))+")
+FINGERPRINT_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Функция, приводящая SQL-запрос к виду без значений
+    Строки, числа и параметры заменяются на ?, многострочные VALUES сворачиваются в одну строку
+    Parameters
+    ----------
+    statement: str
+        Текст запроса
+        Пример: "SELECT * FROM walk WHERE walk_id = $1"
+    Returns
+    -------
+    str
+        "SELECT * FROM walk WHERE walk_id = ?"
+    """
+    statement = FINGERPRINT_LITERALS.sub('?', statement)
+    statement = FINGERPRINT_SPACES.sub(' ', statement).strip()
+    return FINGERPRINT_LISTS.sub('(...)', statement)
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus с произвольными метками
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def observe(self, values: tuple, seconds: float) -> None:
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * len(BUCKETS), 0.0, 0]
+        buckets = series[0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for values, (buckets, total, count) in sorted(self.series.items()):
+            labels = ','.join(f'{label}="{value}"' for label, value in zip(self.labels, values))
+            for bound, bucket in zip(BUCKETS, buckets):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Metrics:
+    """
+    Метрики приложения: время SQL-запросов по методам DB, время HTTP-запросов по маршрутам
+    и состояние пула соединений. Отдаются в текстовом формате Prometheus
+    """
+
+    def __init__(self, slow_query_ms: float = settings_metrics['slow_query_ms']) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.queries = Histogram('db_query_duration_seconds', 'Время выполнения SQL-запросов', ('method', 'operation'))
+        self.requests = Histogram('http_request_duration_seconds', 'Время обработки HTTP-запросов', ('method', 'route', 'status'))
+        self.slow_queries = {}
+        self.engines = []
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """
+        Функция, подключающая замер времени запросов и состояние пула движка
+        Parameters
+        ----------
+        engine: AsyncEngine
+            Движок базы данных
+        """
+        event.listen(engine.sync_engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute', self.after_cursor_execute)
+        self.engines.append(engine)
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany) -> None:
+        # Время начала хранится в контексте выполнения, а не в connection.info: для упавшего запроса
+        # after_cursor_execute не вызывается, и запись в соединении из пула осталась бы навсегда
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, 'query_started', None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        method = db_method.get()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.queries.observe((method, operation), seconds)
+        if seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries[method] = self.slow_queries.get(method, 0) + 1
+            logger.warning(f'Медленный запрос {seconds * 1000:.1f} мс в {method}: {fingerprint(statement)}')
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        self.requests.observe((method, route, str(status)), seconds)
+
+    def render(self) -> str:
+        """
+        Функция, собирающая все метрики в текстовый формат Prometheus
+        Returns
+        -------
+        str
+            Текст для ответа /metrics
+        """
+        lines = self.queries.render() + self.requests.render()
+        lines.append('# HELP db_slow_queries_total Количество медленных SQL-запросов')
+        lines.append('# TYPE db_slow_queries_total counter')
+        for method, count in sorted(self.slow_queries.items()):
+            lines.append(f'db_slow_queries_total{{method="{method}"}} {count}')
+        for name, help, gauge in (('db_pool_size', 'Размер пула соединений', 'size'),
+                                  ('db_pool_checked_out', 'Соединения, занятые запросами', 'checkedout'),
+                                  ('db_pool_checked_in', 'Свободные соединения в пуле', 'checkedin'),
+                                  ('db_pool_overflow', 'Соединения сверх размера пула', 'overflow')):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} gauge')
+            for engine in self.engines:
+                lines.append(f'{name}{{host="{engine.url.host}",database="{engine.url.database}"}} {getattr(engine.pool, gauge)()}')
+        return '\n'.join(lines) + '\n'
+
+
+def tagged(function):
+    """
+    Декоратор, помечающий SQL-запросы внутри метода именем этого метода
+    Вложенные вызовы помечают запросы самым внутренним методом
+    """
+    name = function.__qualname__
+    if isasyncgenfunction(function):
+        # Метка ставится на каждый шаг генератора, чтобы не протекать в код, который его читает
+        @wraps(function)
+        async def generator(*args, **kwargs):
+            items = function(*args, **kwargs)
+            try:
+                while True:
+                    token = db_method.set(name)
+                    try:
+                        item = await items.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        db_method.reset(token)
+                    yield item
+            finally:
+                await items.aclose()
+        return generator
+
+    @wraps(function)
+    async def wrapper(*args, **kwargs):
+        token = db_method.set(name)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            db_method.reset(token)
+    return wrapper
+
+
+metrics = Metrics()
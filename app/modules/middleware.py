@@ -0,0 +1,80 @@
+import time
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from modules.metrics import metrics
+from modules.replicas import READ_PRIMARY, read_primary
+from modules.responses import LEGACY_JSON_HEADER, use_legacy_json
+from settings import settings_replicas
+
+# Промежуточные обработчики написаны на чистом ASGI, а не через @app.middleware("http"):
+# BaseHTTPMiddleware заводит на каждый запрос отдельную задачу и поток для тела ответа,
+# что на тысячах открытых подписок /subscribe/walks стоит около 120 КБ на соединение
+
+
+class LegacyJsonMiddleware:
+    """
+    Включает старый формат JSON для запроса с заголовком LEGACY_JSON_HEADER
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'http':
+            use_legacy_json(Headers(scope=scope).get(LEGACY_JSON_HEADER))
+        await self.app(scope, receive, send)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Клиент, который только что что-то записал, несколько секунд читает с основной базы,
+    чтобы не увидеть отстающую реплику. Метка передаётся cookie или одноимённым заголовком
+    """
+
+    def __init__(self, app, seconds: int = settings_replicas['read_your_writes_seconds']) -> None:
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        read_primary.set(READ_PRIMARY in headers or READ_PRIMARY in cookie_parser(headers.get('cookie', '')))
+        if not self.seconds or not scope['path'].startswith(('/create/', '/update/')):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_marked(message) -> None:
+            if message['type'] == 'http.response.start':
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append('set-cookie', f'{READ_PRIMARY}=1; Max-Age={self.seconds}; Path=/; SameSite=lax')
+                response_headers[READ_PRIMARY] = str(self.seconds)
+            await send(message)
+        await self.app(scope, receive, send_marked)
+
+
+class MetricsMiddleware:
+    """
+    Замеряет время от получения запроса до начала ответа по маршрутам.
+    Для потоковых ответов (NDJSON, подписки) это время до первых байт, а не длительность потока
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        async def send_timed(message) -> None:
+            if message['type'] == 'http.response.start':
+                route = scope.get('route')
+                metrics.observe_request(method=scope['method'],
+                                        route=route.path if route else 'unmatched',
+                                        status=message['status'],
+                                        seconds=time.perf_counter() - started)
+            await send(message)
+        await self.app(scope, receive, send_timed)
@@ -0,0 +1,29 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from loguru import logger
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alembic.ini')
+# Ключ advisory-блокировки, чтобы миграции не запускались одновременно из нескольких воркеров
+MIGRATION_LOCK = 2
+
+
+def upgrade_schema(connection) -> None:
+    """
+    Функция, обновляющая схему базы данных до последней миграции
+    Вызывается при старте приложения через AsyncConnection.run_sync.
+    База, созданная через create_all до появления миграций, помечается ревизией 0001
+    Parameters
+    ----------
+    connection: Connection
+        Синхронное соединение в открытой транзакции
+    """
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK})
+    config = Config(ALEMBIC_INI)
+    config.attributes['connection'] = connection
+    tables = inspect(connection).get_table_names()
+    if 'walk' in tables and 'alembic_version' not in tables:
+        logger.info('Схема создана без миграций, помечаем её ревизией 0001')
+        command.stamp(config, '0001')
+    command.upgrade(config, 'head')
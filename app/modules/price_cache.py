@@ -0,0 +1,106 @@
+import time
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+from modules.metrics import tagged
+from models import Cache_version, Time_price
+from settings import settings_cache
+
+PRICE_VERSION = 'time_price'
+
+
+class PriceCache:
+    """
+    Кэш таблицы time_price в памяти процесса
+    Цены хранятся по ключу hour_minute. Каждое изменение цен увеличивает версию
+    в таблице cache_version, а кэш сверяет свою версию с базой не чаще, чем раз
+    в price_check_interval секунд, поэтому несколько воркеров uvicorn видят
+    изменения цен другого воркера не позже этого интервала
+    """
+
+    def __init__(self, check_interval: float = settings_cache['price_check_interval']) -> None:
+        self.check_interval = check_interval
+        self.prices = {}
+        self.version = None
+        self.checked_at = 0.0
+
+    def invalidate(self) -> None:
+        """
+        Функция, сбрасывающая кэш. Следующее обращение к ценам перечитает их из базы
+        """
+        self.version = None
+        self.checked_at = 0.0
+
+    async def get(self, session: AsyncSession, hour_minute: str) -> float|None:
+        """
+        Функция получения цены на время
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, через которую при необходимости сверяется версия цен
+        hour_minute: str
+            Время прогулки в формате ЧЧ:ММ
+            Пример: '14:30'
+        Returns
+        -------
+        float
+            Цена прогулки или None, если цена на время не создана
+        """
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            await self.refresh(session=session)
+        return self.prices.get(hour_minute)
+
+    async def get_all(self, session: AsyncSession) -> dict:
+        """
+        Функция получения всех цен
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, через которую при необходимости сверяется версия цен
+        Returns
+        -------
+        dict
+            {'07:00': 500.00, '07:30': 500.00, ...}
+        """
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            await self.refresh(session=session)
+        return self.prices
+
+    @tagged
+    async def refresh(self, session: AsyncSession) -> None:
+        """
+        Функция, сверяющая версию цен с базой и перечитывающая цены, если версия изменилась
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия базы данных
+        """
+        version = (await session.execute(
+            select(Cache_version.version).where(Cache_version.name == PRICE_VERSION)
+        )).scalar() or 0
+        if version != self.version:
+            prices = (await session.execute(select(Time_price.hour_minute, Time_price.price))).all()
+            self.prices = {hour_minute: price for hour_minute, price in prices}
+            self.version = version
+            logger.debug(f'Цены перечитаны, версия {version}')
+        self.checked_at = time.monotonic()
+
+    @tagged
+    async def bump(self, session: AsyncSession) -> None:
+        """
+        Функция, увеличивающая версию цен в текущей транзакции
+        После коммита транзакции нужно вызвать invalidate
+        Parameters
+        ----------
+        session: AsyncSession
+            Сессия, в транзакции которой изменяются цены
+        """
+        insert_version = pg_insert(Cache_version).values(name=PRICE_VERSION, version=1)
+        await session.execute(insert_version.on_conflict_do_update(
+            index_elements=[Cache_version.name],
+            set_={'version': Cache_version.version + 1}
+        ))
+
+
+price_cache = PriceCache()
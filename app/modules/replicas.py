@@ -0,0 +1,78 @@
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from loguru import logger
+from settings import settings_replicas
+
+READ_PRIMARY = 'x-read-primary'
+# Выставляется на время запроса, если клиент недавно что-то записал и должен читать с основной базы
+read_primary = ContextVar('read_primary', default=False)
+
+
+class Replicas:
+    """
+    Реплики базы только для чтения
+    Читающие методы DB берут соединение у реплик по кругу. Реплика, к которой не удалось
+    подключиться, пропускается retry_after секунд, а чтение уходит на основную базу.
+    Если реплик нет или выставлен read_primary, читается основная база
+    """
+
+    def __init__(self, retry_after: float = settings_replicas['retry_after']) -> None:
+        self.retry_after = retry_after
+        self.engines = []
+        self.position = 0
+        self.down_until = {}
+
+    def choose(self, primary: AsyncEngine) -> AsyncEngine:
+        """
+        Функция выбора движка для чтения
+        Parameters
+        ----------
+        primary: AsyncEngine
+            Движок основной базы
+        Returns
+        -------
+        AsyncEngine
+            Следующая живая реплика или primary
+        """
+        if read_primary.get():
+            return primary
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[self.position % len(self.engines)]
+            self.position += 1
+            if self.down_until.get(engine, 0.0) <= now:
+                return engine
+        return primary
+
+    @asynccontextmanager
+    async def connect(self, primary: AsyncEngine) -> AsyncConnection:
+        """
+        Соединение для чтения: с реплики, а при ошибке подключения к ней - с основной базы
+        Parameters
+        ----------
+        primary: AsyncEngine
+            Движок основной базы
+        """
+        engine = self.choose(primary=primary)
+        try:
+            connection = await engine.connect().start()
+        except (DBAPIError, OSError) as error:
+            if engine is primary:
+                raise
+            self.down_until[engine] = time.monotonic() + self.retry_after
+            logger.warning(f'Реплика {engine.url.host}:{engine.url.port} недоступна, чтение с основной базы: {error}')
+            connection = await primary.connect().start()
+        try:
+            yield connection
+        finally:
+            await connection.close()
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+replicas = Replicas()
@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+from settings import settings_cache
+
+
+class ResponseCache:
+    """
+    Кэш уже сериализованных ответов в памяти процесса
+    Запись живёт ttl секунд, при переполнении вытесняется самая давно использованная.
+    Ключ должен включать версию данных, тогда изменение данных не требует сброса кэша
+    """
+
+    def __init__(self, ttl: float = settings_cache['walks_ttl'], max_entries: int = settings_cache['walks_max_entries']) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key: tuple) -> bytes|None:
+        """
+        Функция получения ответа из кэша
+        Parameters
+        ----------
+        key: tuple
+            Пример: ('2024-01-30', 'ACSS', 12, False)
+        Returns
+        -------
+        bytes
+            Тело ответа или None, если его нет или оно устарело
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: tuple, body: bytes) -> None:
+        """
+        Функция, сохраняющая тело ответа в кэш
+        """
+        self.entries[key] = (time.monotonic(), body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+walks_cache = ResponseCache()
@@ -0,0 +1,40 @@
+import json
+from contextvars import ContextVar
+import orjson
+from fastapi.responses import JSONResponse
+from settings import settings_json
+
+# Заголовок, которым клиент может попросить старый формат ответа
+LEGACY_JSON_HEADER = 'x-legacy-json'
+
+legacy_json = ContextVar('legacy_json', default=settings_json['legacy'])
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    Ответ, который сериализуется один раз через orjson
+    Для старых клиентов (settings_json['legacy'] или заголовок X-Legacy-Json: 1)
+    тело ответа, как и раньше, является JSON-строкой с json.dumps внутри
+    """
+
+    def render(self, content) -> bytes:
+        if legacy_json.get():
+            return orjson.dumps(json.dumps(content, ensure_ascii=False))
+        return orjson.dumps(content)
+
+
+def use_legacy_json(header: str|None) -> None:
+    """
+    Функция, выбирающая формат ответа для текущего запроса
+    Вызывается на каждый запрос: контекст может быть общим для нескольких запросов
+    (например, у клиента httpx с ASGITransport), и выбор прошлого запроса не должен в нём остаться
+    Parameters
+    ----------
+    header: str
+        Значение заголовка X-Legacy-Json или None, тогда формат берётся из settings_json['legacy']
+        Пример: '1'
+    """
+    if header is None:
+        legacy_json.set(settings_json['legacy'])
+    else:
+        legacy_json.set(header.lower() in ('1', 'true', 'yes'))
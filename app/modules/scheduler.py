@@ -0,0 +1,67 @@
+from heapq import heappop, heappush
+from itertools import groupby
+
+
+def minutes(hour_minute: str) -> int:
+    """
+    Функция, переводящая время ЧЧ:ММ в минуты от начала суток
+    Пример: minutes('14:30') == 870
+    """
+    return int(hour_minute[:2]) * 60 + int(hour_minute[3:5])
+
+
+def assign_day(walks: list, shifts: list, capacity: dict, busy: set, load: dict) -> tuple:
+    """
+    Функция распределения прогулок одного дня между гуляющими
+    Жадный алгоритм для интервалов: прогулки перебираются по времени начала, каждая отдаётся
+    свободному гуляющему, чья смена заканчивается раньше всех. Так гуляющие с длинными
+    сменами остаются для поздних прогулок. Гуляющий ведёт одну прогулку за раз
+    и не больше capacity прогулок за день. Сложность O((прогулки + смены) * log(смены))
+    Parameters
+    ----------
+    walks: list
+        Прогулки дня [(начало в минутах, конец в минутах, walk_id), ...], отсортированные по началу
+        Пример: [(600, 630, 1), (600, 630, 2)]
+    shifts: list
+        Смены гуляющих в этот день [(начало в минутах, конец в минутах, walker_id), ...]
+        Пример: [(420, 720, 1), (540, 1380, 2)]
+    capacity: dict
+        Сколько прогулок за день может провести гуляющий, {walker_id: int}
+    busy: set
+        Уже назначенные прогулки {(walker_id, начало в минутах), ...}
+    load: dict
+        Сколько прогулок уже назначено гуляющему в этот день, {walker_id: int}, дополняется
+    Returns
+    -------
+    tuple
+        ([(walk_id, walker_id), ...], [walk_id без гуляющего, ...])
+    """
+    shifts = sorted(shifts)
+    available = []
+    position = 0
+    assigned = []
+    unassigned = []
+    for start, group in groupby(walks, key=lambda walk: walk[0]):
+        while position < len(shifts) and shifts[position][0] <= start:
+            heappush(available, (shifts[position][1], shifts[position][2]))
+            position += 1
+        taken = set()
+        postponed = []
+        for _, end, walk_id in group:
+            while available:
+                shift_end, walker_id = heappop(available)
+                if shift_end < end or load.get(walker_id, 0) >= capacity[walker_id]:
+                    # Смена кончилась или гуляющий выбрал дневную норму - больше он не понадобится
+                    continue
+                postponed.append((shift_end, walker_id))
+                if walker_id in taken or (walker_id, start) in busy:
+                    continue
+                taken.add(walker_id)
+                load[walker_id] = load.get(walker_id, 0) + 1
+                assigned.append((walk_id, walker_id))
+                break
+            else:
+                unassigned.append(walk_id)
+        for shift in postponed:
+            heappush(available, shift)
+    return assigned, unassigned
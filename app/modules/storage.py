@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+
+
+class Storage(ABC):
+    """
+    Хранилище заказов, с которым работают маршруты routings.py и bulk.py
+    Реализации: modules.db.DB (PostgreSQL) и modules.memory_db.MemoryDB (память процесса),
+    выбираются настройкой settings_storage['backend']. Параметры и ответы методов
+    у реализаций одинаковые, подробно они описаны в DB
+    """
+
+    @abstractmethod
+    async def insert(self, table_name: str, values: dict) -> dict:
+        """
+        Создание заказа ('walk'), хозяина ('users'), собаки ('dog') или цены ('time_price')
+        """
+
+    @abstractmethod
+    async def book_walks(self, values: dict, start_dates: list) -> list:
+        """
+        Создание нескольких заказов одной собаки
+        """
+
+    @abstractmethod
+    async def update(self, table_name: str, values: dict) -> dict:
+        """
+        Изменение статуса заказа ('walk') или цены ('time_price')
+        """
+
+    @abstractmethod
+    async def update_walks(self, walks: list) -> list:
+        """
+        Изменение статусов нескольких заказов
+        """
+
+    @abstractmethod
+    async def get_walk_ids(self, current_date: str, status: str = None) -> list:
+        """
+        id заказов за дату в порядке (start_date, walk_id)
+        """
+
+    @abstractmethod
+    async def get_all_walks(self, current_date: str = None, status: str = None) -> list:
+        """
+        Все заказы за дату и/или со статусом
+        """
+
+    @abstractmethod
+    async def get_versioned_walks(self, current_date: str, status: str = None) -> dict:
+        """
+        Заказы за дату и версия списка, которую они отражают
+        """
+
+    @abstractmethod
+    async def get_walks_page(self, current_date: str = None, status: str = None, limit: int = 100, cursor: str = None) -> dict:
+        """
+        Страница заказов по курсору (start_date, walk_id)
+        """
+
+    @abstractmethod
+    def stream_walks(self, current_date: str = None, status: str = None, chunk_size: int = 1000):
+        """
+        Заказы по одному, AsyncIterator[dict]
+        """
+
+    @abstractmethod
+    async def get_walks_version(self, current_date: str) -> int:
+        """
+        Версия списка заказов за дату
+        """
+
+    @abstractmethod
+    async def get_slots(self, date_from: str, date_to: str) -> list:
+        """
+        Свободные места и цены на каждое время периода
+        """
+
+    @abstractmethod
+    async def create_price(self, hour_minute: str|None = None, price: float|None = None, schedule: list|None = None) -> dict:
+        """
+        Установка цены на время, на все времена или по интервалам
+        """
+
+    @abstractmethod
+    async def create_walker(self, name: str, capacity: int, shifts: list) -> dict:
+        """
+        Создание гуляющего или замена его вместимости и смен
+        """
+
+    @abstractmethod
+    async def schedule_walks(self, date_from: str, days: int = 1, reassign: bool = False) -> dict:
+        """
+        Назначение гуляющих принятым заказам за период
+        """
+
+    @abstractmethod
+    async def refresh_reports(self) -> int:
+        """
+        Пересчёт дневных сводок за изменившиеся даты
+        """
+
+    @abstractmethod
+    async def get_revenue_report(self, date_from: str, date_to: str, period: str = 'month') -> list:
+        """
+        Количество заказов и выручка по статусам за период
+        """
+
+    @abstractmethod
+    async def get_walkers_report(self, date_from: str, date_to: str) -> list:
+        """
+        Количество прогулок и выручка по гуляющим за период
+        """
+
+    @abstractmethod
+    async def get_utilization_report(self, date_from: str, date_to: str) -> list:
+        """
+        Занятость каждого времени за период
+        """
+
+    @abstractmethod
+    async def import_walks(self, walks, allow_past: bool = False) -> dict:
+        """
+        Загрузка заказов из AsyncIterator[dict]
+        """
+
+    @abstractmethod
+    def export_walks(self, date_from: str, date_to: str, file_format: str = 'csv'):
+        """
+        Выгрузка заказов за период, AsyncIterator[bytes]
+        """
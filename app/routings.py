@@ -1,23 +1,111 @@
-import json
-from fastapi import FastAPI
+import asyncio
+import orjson
+from collections import Counter
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+from modules.bulk import BULK_FORMATS, read_walks
 from modules.db import DB
-from modules.checks import Checks
-from sqlalchemy import create_engine
-from models import Base
-from settings import settings_db
+from modules.engine import make_engine, make_replica_engines
+from modules.memory_db import MemoryDB
+from modules.events import walk_events
+from modules.idempotency import IDEMPOTENCY_HEADER, idempotency
+from modules.checks import checks
+from modules.metrics import metrics
+from modules.migrations import upgrade_schema
+from modules.middleware import LegacyJsonMiddleware, MetricsMiddleware, ReadYourWritesMiddleware
+from modules.replicas import replicas
+from modules.response_cache import walks_cache
+from modules.responses import LEGACY_JSON_HEADER, ORJSONResponse, legacy_json
+from schemas import Price_band, Walker_profile, Walks_booking, Walks_status
+from settings import settings_events, settings_idempotency, settings_partitions, settings_reports, settings_slot, settings_storage
 
 
-app = FastAPI()
+def configure(new_engine: AsyncEngine|None, replica_engines: list = ()) -> None:
+    """
+    Функция, задающая базу, с которой работают маршруты
+    Вызывается при импорте по настройкам, а бенчмарки вызывают её ещё раз со своей базой
+    до запуска lifespan
+    Parameters
+    ----------
+    new_engine: AsyncEngine
+        Движок основной базы или None для хранилища в памяти
+    replica_engines: list
+        Движки реплик для чтения
+    """
+    global engine, storage
+    engine = new_engine
+    replicas.engines = list(replica_engines)
+    if engine is None:
+        # Без базы: данные живут до остановки процесса и не видны другим воркерам
+        storage = MemoryDB()
+        return
+    metrics.instrument(engine)
+    for replica in replicas.engines:
+        metrics.instrument(replica)
+    storage = DB(engine=engine)
+
+
+if settings_storage['backend'] == 'memory':
+    configure(None)
+else:
+    configure(make_engine(), make_replica_engines())
+
+
+async def run_periodically(job, interval: float):
+    while True:
+        await job()
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if engine is not None:
+        async with engine.begin() as connection:
+            await connection.run_sync(upgrade_schema)
+        await walk_events.start()
+        tasks = [asyncio.create_task(run_periodically(storage.refresh_reports, settings_reports['refresh_interval'])),
+                 asyncio.create_task(run_periodically(storage.ensure_partitions, settings_partitions['maintenance_interval'])),
+                 asyncio.create_task(run_periodically(lambda: idempotency.purge(engine=engine), settings_idempotency['purge_interval']))]
+    yield
+    for task in tasks:
+        task.cancel()
+    await walk_events.stop()
+    if engine is not None:
+        await engine.dispose()
+    await replicas.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+# Последний добавленный обработчик выполняется первым
+app.add_middleware(LegacyJsonMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
 
-engine = create_engine(f"postgresql+psycopg2://{settings_db['username']}:{settings_db['password']}@{settings_db['host']}:{settings_db['port']}/{settings_db['database']}")
 
-Base.metadata.create_all(engine)
+@app.get("/metrics")
+async def get_metrics():
+    """
+        Метрики приложения в текстовом формате Prometheus
+        Returns
+        -------
+        str
+            Время SQL-запросов по методам DB, время HTTP-запросов по маршрутам,
+            количество медленных запросов и состояние пула соединений
+    """
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
 
 
 
 @app.post("/create/walk")
-async def create_walk(name: str, 
+async def create_walk(request: Request,
+                      name: str, 
                       phone: str, 
                       dog_name:str,
                       flat_number: int, 
@@ -45,6 +133,8 @@ async def create_walk(name: str,
         dog_description: str
             Описание собаки, её особенности
             Пример: Особо активный, во время прогулки нужно с ним бегать
+        Заголовок Idempotency-Key (до 64 символов) защищает от повторного бронирования
+        при повторе запроса: на повтор с тем же ключом возвращается первый ответ
         Returns
         -------
         json
@@ -56,33 +146,135 @@ async def create_walk(name: str,
                     'object_id': int}
             Если цена для времени не была создана, то
                 {'error': 'Вы не создали цену для времени'}
+            Если ключ уже использован с другими параметрами, то
+                {'error': 'Ключ идемпотентности уже использован для другого запроса'}
     """
-    
-    check = Checks()
-    check_date = check.check_time_walk(check_time=start_date)
-    check_phone = check.check_phone(check_phone=phone)
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is not None and not 0 < len(key) <= 64:
+        return ORJSONResponse({'error': 'Ключ идемпотентности должен быть от 1 до 64 символов'})
+
+    check_date = checks.check_time_walk(check_time=start_date)
+    check_phone = checks.check_phone(check_phone=phone)
 
     if 'error' in check_date:
-        return json.dumps(check_date,ensure_ascii=False)
+        return ORJSONResponse(check_date)
     else:
         start_date = check_date['check_time']
     
     if 'error' in check_phone:
-        return json.dumps(check_phone,ensure_ascii=False)
+        return ORJSONResponse(check_phone)
     else:
         phone = check_phone['check_phone']
     
-    db = DB(engine=engine)
-    result = db.insert(table_name='walk', values= {'name': name,
-                                          'phone': phone,
-                                          'dog_name': dog_name,
-                                          'dog_description': dog_description,
-                                          'flat_number': flat_number,
-                                          'start_date': start_date})
-    return json.dumps(result,ensure_ascii=False)
+    values = {'name': name,
+              'phone': phone,
+              'dog_name': dog_name,
+              'dog_description': dog_description,
+              'flat_number': flat_number,
+              'start_date': start_date}
+    if key is None:
+        return ORJSONResponse(await storage.insert(table_name='walk', values=values))
+    return ORJSONResponse(await idempotency.run(engine=engine, key=key, values=values,
+                                                call=lambda: storage.insert(table_name='walk', values=values)))
+
+@app.post("/create/walks")
+async def create_walks(booking: Walks_booking):
+    """
+        Создание нескольких заказов для одной собаки
+        Parameters
+        ----------
+        booking: json
+            Хозяин, собака и либо список дат начала прогулок, либо правило повторения
+            Пример: {"name": "Иван", "phone": "89558883344", "dog_name": "Барбос", "flat_number": 1,
+                     "dog_description": "Особо активный",
+                     "start_dates": ["2024-01-30 14:00", "2024-01-31 14:00"]}
+            или
+                    {"name": "Иван", "phone": "89558883344", "dog_name": "Барбос", "flat_number": 1,
+                     "recurrence": {"days_of_week": [1, 2, 3, 4, 5], "time": "14:00",
+                                    "date_from": "2024-01-29", "date_to": "2024-02-09"}}
+            days_of_week: 1 - понедельник, ..., 7 - воскресенье
+        Returns
+        -------
+        json
+            { 'walks':
+                [
+                    {'start_date': '2024-01-30 14:00', 'message': 'Объект сохранен', 'object_id': 1},
+                    {'start_date': '2024-01-31 14:00', 'error': 'Время уже занято'},
+                    ...
+                ]
+            }
+            или
+            {'error': str}
+    """
+    check_phone = checks.check_phone(check_phone=booking.phone)
+    if 'error' in check_phone:
+        return ORJSONResponse(check_phone)
+
+    if booking.recurrence:
+        recurrence = booking.recurrence
+        check_time = checks.check_hour_minute(hour_minute=recurrence.time)
+        if 'error' in check_time:
+            return ORJSONResponse(check_time)
+        check_from = checks.check_current_date(current_date=recurrence.date_from)
+        if 'error' in check_from:
+            return ORJSONResponse(check_from)
+        check_to = checks.check_current_date(current_date=recurrence.date_to)
+        if 'error' in check_to:
+            return ORJSONResponse(check_to)
+        if not recurrence.days_of_week:
+            return ORJSONResponse({'error': 'Не указаны дни недели'})
+        if any(day < 1 or day > 7 for day in recurrence.days_of_week):
+            return ORJSONResponse({'error': 'Дни недели должны быть от 1 до 7'})
+        day_from = datetime.strptime(check_from['current_date'],"%Y-%m-%d")
+        day_to = datetime.strptime(check_to['current_date'],"%Y-%m-%d")
+        # За каждые 7 дней набирается хотя бы одна дата, поэтому дальше batch_limit недель смотреть незачем,
+        # а даты считаются от day_from и не выходят за day_to (datetime.max тоже)
+        days = min((day_to - day_from).days, 7 * (settings_slot['batch_limit'] + 1))
+        start_dates = []
+        for offset in range(days + 1):
+            day = day_from + timedelta(days=offset)
+            if day.isoweekday() in recurrence.days_of_week:
+                start_dates.append(f"{day:%Y-%m-%d} {check_time['hour_minute']}")
+                if len(start_dates) > settings_slot['batch_limit']:
+                    break
+    else:
+        start_dates = booking.start_dates or []
+
+    if not start_dates:
+        return ORJSONResponse({'error': 'Не указаны даты прогулок'})
+    if len(start_dates) > settings_slot['batch_limit']:
+        return ORJSONResponse({'error': f"Нельзя создать больше {settings_slot['batch_limit']} заказов за раз"})
+
+    results = []
+    valid = []
+    for start_date, check_date in zip(start_dates, checks.check_times_walk(check_times=start_dates)):
+        if 'error' in check_date:
+            results.append({'start_date': start_date, 'error': check_date['error']})
+        else:
+            results.append(None)
+            valid.append(check_date['check_time'])
+
+    if valid:
+        booked = iter(await storage.book_walks(values={'name': booking.name,
+                                                       'phone': check_phone['check_phone'],
+                                                       'dog_name': booking.dog_name,
+                                                       'dog_description': booking.dog_description,
+                                                       'flat_number': booking.flat_number},
+                                               start_dates=valid))
+        results = [result or next(booked) for result in results]
+    return ORJSONResponse({'walks': results})
+
+
+def walks_etag(current_date: str, status: str|None, version: int, legacy: bool) -> str:
+    """
+    Функция, возвращающая ETag списка заказов за дату в формате ответа
+    Пример: walks_etag('2024-01-30', 'ACSS', 3, False) == '"2024-01-30:ACSS:3:json"'
+    """
+    return f'"{current_date}:{status or ""}:{version}:{"legacy" if legacy else "json"}"'
+
 
 @app.post("/get/walks")
-async def get_walks(current_date: str = None, status: str = None):
+async def get_walks(request: Request, current_date: str = None, status: str = None, limit: int = None, cursor: str = None, stream: bool = False):
     """
         Функция для получения всех заказов по указанной дате и статусу (оба параметра опциональны)
         Parameters
@@ -95,6 +287,18 @@ async def get_walks(current_date: str = None, status: str = None):
             Может быть None (если никакое значение не получено). 
             Либо 'ACSS' (принято), либо 'RJCT' (отклонено), либо 'CRTD' (создано)
             Пример: 'CRTD'
+        limit: int
+            Размер страницы (от 1 до 1000). Если указан, заказы выдаются постранично
+            и в ответ добавляется 'next_cursor'
+            Пример: 100
+        cursor: str
+            'next_cursor' из предыдущей страницы
+        stream: bool
+            Если true, заказы отдаются потоком в формате NDJSON (один заказ на строку),
+            limit и cursor при этом не используются
+        Для списка за дату (без limit, cursor и stream) отдаётся заголовок ETag с версией
+        заказов на эту дату и форматом ответа (X-Legacy-Json). Если клиент прислал его же
+        в If-None-Match, ответ 304 без тела
         Returns
         -------
         json
@@ -114,24 +318,161 @@ async def get_walks(current_date: str = None, status: str = None):
                         'who_walking': 'Петр'
                     }, 
                     ...
-                ]
+                ],
+                'next_cursor': str (только если указан limit)
             }
     """
-    check = Checks()
     if current_date:
-        check_date = check.check_current_date(current_date=current_date)
+        check_date = checks.check_current_date(current_date=current_date)
         if 'error' in check_date:
-            return json.dumps(check_date,ensure_ascii=False)
+            return ORJSONResponse(check_date)
         else:
             current_date = check_date['current_date']
 
     if status:
         if len(status) > 4:
-            return json.dumps({'error': 'Неправильный статус'},ensure_ascii=False)
+            return ORJSONResponse({'error': 'Неправильный статус'})
         
-    db = DB(engine=engine)
-    items = db.get_all_walks(current_date=current_date,status=status)
-    return json.dumps({'walks': items},ensure_ascii=False)
+    if stream:
+        async def lines():
+            async for item in storage.stream_walks(current_date=current_date,status=status):
+                yield orjson.dumps(item) + b'\n'
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+    if limit is not None or cursor:
+        if limit is None:
+            limit = 100
+        if limit < 1 or limit > 1000:
+            return ORJSONResponse({'error': 'Размер страницы должен быть от 1 до 1000'})
+        return ORJSONResponse(await storage.get_walks_page(current_date=current_date,status=status,limit=limit,cursor=cursor))
+    if current_date:
+        legacy = legacy_json.get()
+        version = await storage.get_walks_version(current_date=current_date)
+        # Старый и новый формат - разные представления одного списка, поэтому у них разные ETag
+        headers = {'ETag': walks_etag(current_date, status, version, legacy), 'Cache-Control': 'no-cache', 'Vary': LEGACY_JSON_HEADER}
+        if headers['ETag'] in [tag.strip().removeprefix('W/') for tag in request.headers.get('if-none-match', '').split(',')]:
+            return Response(status_code=304, headers=headers)
+        body = walks_cache.get((current_date, status, version, legacy))
+        if body is None:
+            # Версия могла быть прочитана с другой реплики, поэтому ETag и ключ кэша берутся
+            # из версии, прочитанной в одном снимке с заказами
+            snapshot = await storage.get_versioned_walks(current_date=current_date,status=status)
+            headers['ETag'] = walks_etag(current_date, status, snapshot['version'], legacy)
+            response = ORJSONResponse({'walks': snapshot['walks']}, headers=headers)
+            walks_cache.put((current_date, status, snapshot['version'], legacy), response.body)
+            return response
+        return Response(body, media_type='application/json', headers=headers)
+    items = await storage.get_all_walks(current_date=current_date,status=status)
+    return ORJSONResponse({'walks': items})
+
+
+@app.get("/subscribe/walks")
+async def subscribe_walks(current_date: str = None, status: str = None):
+    """
+        Подписка на изменения заказов в формате Server-Sent Events вместо опроса /get/walks
+        Parameters
+        ----------
+        current_date: str
+            Дата прогулок (опциональна)
+            Пример: '2024-01-30'
+        status: str
+            Статус заказа (опционален). Событие изменения приходит, если подходит новый или прежний статус
+            Пример: 'ACSS'
+        Returns
+        -------
+        text/event-stream
+            event: created
+            data: {"event": "created", "walk_id": 1, "start_date": "2024-01-30 14:00", "status": "CRTD"}
+
+            event: updated
+            data: {"event": "updated", "walk_id": 1, "start_date": "2024-01-30 14:00", "status": "ACSS", "previous_status": "CRTD", "who_walking": "Петр"}
+
+            event: resync
+            data: {"event": "resync"}
+            (часть событий могла потеряться, список нужно перечитать через /get/walks)
+
+            event: resync
+            data: {"event": "resync", "start_date": "2024-01-30 00:00"}
+            (на дату загружены заказы через /import/walks, список за дату нужно перечитать)
+            Раз в settings_events['keepalive'] секунд без событий приходит комментарий ': ping'
+            или
+            {'error': str}
+    """
+    if current_date:
+        check_date = checks.check_current_date(current_date=current_date)
+        if 'error' in check_date:
+            return ORJSONResponse(check_date)
+        current_date = check_date['current_date']
+    if status and len(status) > 4:
+        return ORJSONResponse({'error': 'Неправильный статус'})
+
+    async def events():
+        # Подписка создаётся внутри генератора: если клиент отключится до начала ответа,
+        # генератор не запустится и подписка не останется без unsubscribe
+        subscription = walk_events.subscribe(current_date=current_date, status=status)
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=settings_events['keepalive'])
+                except asyncio.TimeoutError:
+                    yield b': ping\n\n'
+                    continue
+                yield b'event: ' + event['event'].encode() + b'\ndata: ' + orjson.dumps(event) + b'\n\n'
+        finally:
+            walk_events.unsubscribe(subscription)
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.get("/slots")
+async def get_slots(date: str = None, date_from: str = None, date_to: str = None):
+    """
+        Функция для получения свободных мест и цен на каждое время
+        Parameters
+        ----------
+        date: str
+            День, по которому нужны свободные места
+            Пример: '2024-01-30'
+        date_from: str
+            Первый день периода (используется, если date не указан)
+            Пример: '2024-01-30'
+        date_to: str
+            Последний день периода, включительно (если не указан, то равен date_from)
+            Пример: '2024-02-05'
+        Returns
+        -------
+        json
+            { 'slots':
+                [
+                    {
+                        'start_date': '2024-01-30 07:00',
+                        'free': 2,
+                        'price': 500.00
+                    },
+                    ...
+                ]
+            }
+    """
+    if date:
+        date_from = date_to = date
+    if not date_from:
+        return ORJSONResponse({'error': 'Укажите дату'})
+    if not date_to:
+        date_to = date_from
+    check_from = checks.check_current_date(current_date=date_from)
+    if 'error' in check_from:
+        return ORJSONResponse(check_from)
+    check_to = checks.check_current_date(current_date=date_to)
+    if 'error' in check_to:
+        return ORJSONResponse(check_to)
+    date_from, date_to = check_from['current_date'], check_to['current_date']
+    if date_from > date_to:
+        return ORJSONResponse({'error': 'Начало периода позже конца'})
+    if (datetime.strptime(date_to,"%Y-%m-%d") - datetime.strptime(date_from,"%Y-%m-%d")).days >= 31:
+        return ORJSONResponse({'error': 'Период не может быть больше 31 дня'})
+
+    items = await storage.get_slots(date_from=date_from,date_to=date_to)
+    return ORJSONResponse({'slots': items})
 
 
 @app.put("/update/walk/status")
@@ -157,30 +498,175 @@ async def update_status(walk_id: int, status: str, who_walking: str = None):
             или
             {'message': str}
     """
-    db = DB(engine=engine)
     if status:
-        if len(status) > 4:
-            return json.dumps({'error': 'Неправильный статус'},ensure_ascii=False)
-        if status == 'ACSS' and (not who_walking or who_walking == ''):
-            return json.dumps({'error': 'Укажите имя гуляющего'},ensure_ascii=False)
-    return json.dumps(db.update(table_name='walk',values={'walk_id': walk_id,'status': status,'who_walking': who_walking}),ensure_ascii=False)
+        check_status = checks.check_status(status=status, who_walking=who_walking)
+        if 'error' in check_status:
+            return ORJSONResponse(check_status)
+    return ORJSONResponse(await storage.update(table_name='walk',values={'walk_id': walk_id,'status': status,'who_walking': who_walking}))
+
+
+@app.put("/update/walks/status")
+async def update_walks_status(update: Walks_status):
+    """
+        Функция обновления статусов у нескольких заказов
+        Parameters
+        ----------
+        update: json
+            Либо список изменений по каждому заказу
+            Пример: {"walks": [{"walk_id": 1, "status": "ACSS", "who_walking": "Петр"},
+                               {"walk_id": 2, "status": "RJCT"}]}
+            либо фильтр по дате (и текущему статусу) с новым статусом для всех найденных заказов
+            Пример: {"current_date": "2024-01-30", "from_status": "CRTD",
+                     "status": "ACSS", "who_walking": "Петр"}
+            Статусы проверяются так же, как в /update/walk/status
+        Returns
+        -------
+        json
+            { 'walks':
+                [
+                    {'walk_id': 1, 'message': 'Значение успешно изменено'},
+                    {'walk_id': 2, 'error': 'Время уже занято'},
+                    {'walk_id': 3, 'error': 'Заказ указан несколько раз'},
+                    ...
+                ]
+            }
+            или
+            {'error': str}
+    """
+    if update.walks:
+        walks = [walk.model_dump() for walk in update.walks]
+    elif update.current_date and update.status:
+        check_date = checks.check_current_date(current_date=update.current_date)
+        if 'error' in check_date:
+            return ORJSONResponse(check_date)
+        walk_ids = await storage.get_walk_ids(current_date=check_date['current_date'], status=update.from_status)
+        walks = [{'walk_id': walk_id, 'status': update.status, 'who_walking': update.who_walking} for walk_id in walk_ids]
+        if not walks:
+            return ORJSONResponse({'walks': []})
+    else:
+        return ORJSONResponse({'error': 'Укажите заказы или дату со статусом'})
+    if len(walks) > settings_slot['batch_limit']:
+        return ORJSONResponse({'error': f"Нельзя изменить больше {settings_slot['batch_limit']} заказов за раз"})
+
+    results = []
+    valid = []
+    # Какое из нескольких изменений одного заказа применять, неизвестно, поэтому не применяется ни одно
+    counts = Counter(walk['walk_id'] for walk in walks)
+    for walk in walks:
+        check_status = checks.check_status(status=walk['status'], who_walking=walk['who_walking'])
+        if counts[walk['walk_id']] > 1:
+            results.append({'walk_id': walk['walk_id'], 'error': 'Заказ указан несколько раз'})
+        elif 'error' in check_status:
+            results.append({'walk_id': walk['walk_id'], 'error': check_status['error']})
+        else:
+            results.append(None)
+            valid.append(walk)
+    if valid:
+        updated = iter(await storage.update_walks(walks=valid))
+        results = [result or next(updated) for result in results]
+    return ORJSONResponse({'walks': results})
+
+
+@app.post("/create/walker")
+async def create_walker(walker: Walker_profile):
+    """
+        Создание гуляющего или замена его вместимости и смен
+        Parameters
+        ----------
+        walker: Walker_profile
+            Пример: {'name': 'Петр',
+                     'capacity': 8,
+                     'shifts': [{'day_of_week': 1, 'start': '08:00', 'end': '14:00'},
+                                {'day_of_week': 2, 'start': '12:00', 'end': '20:00'}]}
+            name - не длиннее 10 символов, capacity - сколько прогулок в день может провести гуляющий,
+            day_of_week - от 1 (понедельник) до 7 (воскресенье)
+        Returns
+        -------
+        json
+            {'message': 'Гуляющий сохранен', 'object_id': int}
+            или
+            {'error': str}
+    """
+    if not walker.name or len(walker.name) > 10:
+        return ORJSONResponse({'error': 'Имя гуляющего должно быть от 1 до 10 символов'})
+    if walker.capacity < 1:
+        return ORJSONResponse({'error': 'Вместимость должна быть больше 0'})
+    shifts = []
+    for shift in walker.shifts:
+        if shift.day_of_week < 1 or shift.day_of_week > 7:
+            return ORJSONResponse({'error': 'Дни недели должны быть от 1 до 7'})
+        check_start = checks.check_hour_minute(hour_minute=shift.start)
+        if 'error' in check_start:
+            return ORJSONResponse(check_start)
+        check_end = checks.check_hour_minute(hour_minute=shift.end)
+        if 'error' in check_end:
+            return ORJSONResponse(check_end)
+        if check_start['hour_minute'] >= check_end['hour_minute']:
+            return ORJSONResponse({'error': 'Начало смены должно быть раньше конца'})
+        shifts.append({'day_of_week': shift.day_of_week, 'start': check_start['hour_minute'], 'end': check_end['hour_minute']})
+    return ORJSONResponse(await storage.create_walker(name=walker.name, capacity=walker.capacity, shifts=shifts))
+
+
+@app.post("/schedule/walks")
+async def schedule_walks(date_from: str, days: int = 1, reassign: bool = False):
+    """
+        Автоматическое назначение гуляющих принятым заказам ('ACSS') за день или неделю
+        Parameters
+        ----------
+        date_from: str
+            Первый день
+            Пример: '2024-01-30'
+        days: int
+            Количество дней, от 1 до 7
+        reassign: bool
+            Если true, уже назначенные заказы периода распределяются заново
+        Returns
+        -------
+        json
+            {'assigned': 120, 'unassigned': [walk_id, ...], 'load': {'Петр': 8, ...}}
+            или
+            {'error': str}
+    """
+    check_date = checks.check_current_date(current_date=date_from)
+    if 'error' in check_date:
+        return ORJSONResponse(check_date)
+    if days < 1 or days > 7:
+        return ORJSONResponse({'error': 'Период должен быть от 1 до 7 дней'})
+    return ORJSONResponse(await storage.schedule_walks(date_from=check_date['current_date'], days=days, reassign=reassign))
+
 
 @app.post("/create/price")
-async def create_price(price:float):
+async def create_price(price: float = None, schedule: list[Price_band] | None = None):
     """
         Функция создания цен на всё время
         Parameters
         ----------
         price: float
-            Цена прогулки
+            Цена прогулки на всё время (если не указана и нет расписания, то 500)
             Пример: 700
+        schedule: list
+            Расписание цен по интервалам времени в теле запроса (границы включаются)
+            Пример: [{"start": "07:00", "end": "11:30", "price": 400},
+                     {"start": "12:00", "end": "23:00", "price": 600}]
         Returns
         -------
         json
+            {'error': str}
+            или
             {'message': str}
     """
-    db = DB(engine=engine)
-    return json.dumps(db.create_price(price=price), ensure_ascii=False)
+    if schedule:
+        bands = []
+        for band in schedule:
+            check_start = checks.check_hour_minute(hour_minute=band.start)
+            if 'error' in check_start:
+                return ORJSONResponse(check_start)
+            check_end = checks.check_hour_minute(hour_minute=band.end)
+            if 'error' in check_end:
+                return ORJSONResponse(check_end)
+            bands.append({'start': check_start['hour_minute'], 'end': check_end['hour_minute'], 'price': band.price})
+        schedule = bands
+    return ORJSONResponse(await storage.create_price(price=price, schedule=schedule))
 
 
 @app.put("/update/price")
@@ -199,6 +685,165 @@ async def update_price(hour_minute: str, price: float):
         -------
         json
             {'message': str}
+            или
+            {'error': str}, если время неправильное или цены на него ещё нет
+    """
+    check_time = checks.check_hour_minute(hour_minute=hour_minute)
+    if 'error' in check_time:
+        return ORJSONResponse(check_time)
+    return ORJSONResponse(await storage.create_price(hour_minute=check_time['hour_minute'],price=price))
+
+
+@app.get("/reports/revenue")
+async def get_revenue_report(date_from: str, date_to: str, period: str = 'month'):
+    """
+        Отчёт о количестве заказов и выручке по статусам за период
+        Считается по дневным сводкам, а не по таблице заказов
+        Parameters
+        ----------
+        date_from: str
+            Начало периода: год, месяц или день
+            Пример: '2024-01'
+        date_to: str
+            Конец периода (включительно): год, месяц или день
+            Пример: '2024-12'
+        period: str
+            Группировка: 'day', 'month' или 'year'
+        Returns
+        -------
+        json
+            {'report': [
+                {
+                    'period': '2024-01',
+                    'walks': 120,
+                    'revenue': 60000.00,
+                    'statuses': {'ACSS': {'walks': 100, 'revenue': 50000.00}, ...}
+                },
+                ...
+            ]}
+            revenue считается без отклонённых заказов
+            или
+            {'error': str}
+    """
+    check_range = checks.check_report_range(date_from=date_from, date_to=date_to)
+    if 'error' in check_range:
+        return ORJSONResponse(check_range)
+    if period not in ('day', 'month', 'year'):
+        return ORJSONResponse({'error': "Группировка должна быть 'day', 'month' или 'year'"})
+    await storage.refresh_reports()
+    return ORJSONResponse({'report': await storage.get_revenue_report(date_from=check_range['date_from'], date_to=check_range['date_to'], period=period)})
+
+
+@app.get("/reports/walkers")
+async def get_walkers_report(date_from: str, date_to: str):
+    """
+        Отчёт о количестве прогулок и выручке по гуляющим (без отклонённых заказов)
+        Parameters
+        ----------
+        date_from: str
+            Начало периода: год, месяц или день
+            Пример: '2024-01'
+        date_to: str
+            Конец периода (включительно): год, месяц или день
+            Пример: '2024-01'
+        Returns
+        -------
+        json
+            {'report': [{'who_walking': 'Петр', 'walks': 40, 'revenue': 20000.00}, ...]}
+            или
+            {'error': str}
+    """
+    check_range = checks.check_report_range(date_from=date_from, date_to=date_to)
+    if 'error' in check_range:
+        return ORJSONResponse(check_range)
+    await storage.refresh_reports()
+    return ORJSONResponse({'report': await storage.get_walkers_report(date_from=check_range['date_from'], date_to=check_range['date_to'])})
+
+
+@app.get("/reports/utilization")
+async def get_utilization_report(date_from: str, date_to: str):
+    """
+        Отчёт о занятости каждого времени прогулки за период
+        Parameters
+        ----------
+        date_from: str
+            Начало периода: год, месяц или день
+            Пример: '2024-01'
+        date_to: str
+            Конец периода (включительно): год, месяц или день
+            Пример: '2024-01'
+        Returns
+        -------
+        json
+            {'report': [{'hour_minute': '07:00', 'walks': 40, 'places': 62, 'utilization': 0.645}, ...]}
+            или
+            {'error': str}
+    """
+    check_range = checks.check_report_range(date_from=date_from, date_to=date_to)
+    if 'error' in check_range:
+        return ORJSONResponse(check_range)
+    await storage.refresh_reports()
+    return ORJSONResponse({'report': await storage.get_utilization_report(date_from=check_range['date_from'], date_to=check_range['date_to'])})
+
+
+@app.post("/import/walks")
+async def import_walks(request: Request, format: str = 'csv', allow_past: bool = False):
+    """
+        Загрузка заказов из тела запроса в формате CSV (с заголовком) или NDJSON
+        Тело читается потоком и загружается пачками, каждая пачка в своей транзакции
+        Parameters
+        ----------
+        format: str
+            'csv' или 'ndjson'
+        allow_past: bool
+            Разрешить прошедшие даты, чтобы загрузить историю заказов
+        Тело запроса
+            Колонки (ключи): name, phone, flat_number, dog_name, start_date,
+            необязательные dog_description, status ('CRTD' по умолчанию), who_walking, price
+            (по умолчанию цена времени), остальные колонки не учитываются
+            Пример: name,phone,flat_number,dog_name,start_date
+                    Иван,89558883344,1,Барбос,2024-01-30 14:00
+        Returns
+        -------
+        json
+            {'imported': 9990, 'existing': 5, 'errors': 5,
+             'error_samples': [{'line': 17, 'error': 'Время уже занято'}, ...]}
+            или
+            {'error': str}
+    """
+    if format not in BULK_FORMATS:
+        return ORJSONResponse({'error': "Формат должен быть 'csv' или 'ndjson'"})
+    return ORJSONResponse(await storage.import_walks(walks=read_walks(request.stream(), file_format=format), allow_past=allow_past))
+
+
+@app.get("/export/walks")
+async def export_walks(date_from: str, date_to: str, format: str = 'csv'):
+    """
+        Потоковая выгрузка заказов за период в формате CSV (с заголовком) или NDJSON
+        Выгрузку можно загрузить обратно через /import/walks
+        Parameters
+        ----------
+        date_from: str
+            Начало периода: год, месяц или день
+            Пример: '2024-01'
+        date_to: str
+            Конец периода (включительно): год, месяц или день
+            Пример: '2024-12'
+        format: str
+            'csv' или 'ndjson'
+        Returns
+        -------
+        text/csv или application/x-ndjson
+            name,phone,flat_number,dog_name,dog_description,start_date,status,who_walking,price,walk_id,end_date,created_at
+            Иван,89558883344,1,Барбос,,2024-01-30 14:00,ACSS,Петр,500,1,2024-01-30 14:30,2024-01-20 10:15
+            или
+            {'error': str}
     """
-    db = DB(engine=engine)
-    return json.dumps(db.create_price(hour_minute=hour_minute,price=price), ensure_ascii=False)
\ No newline at end of file
+    check_range = checks.check_report_range(date_from=date_from, date_to=date_to)
+    if 'error' in check_range:
+        return ORJSONResponse(check_range)
+    if format not in BULK_FORMATS:
+        return ORJSONResponse({'error': "Формат должен быть 'csv' или 'ndjson'"})
+    filename = f"walks_{check_range['date_from']}_{check_range['date_to']}.{format}"
+    return StreamingResponse(storage.export_walks(date_from=check_range['date_from'], date_to=check_range['date_to'], file_format=format),
+                             media_type=BULK_FORMATS[format], headers={'Content-Disposition': f'attachment; filename="{filename}"'})
\ No newline at end of file
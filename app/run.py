@@ -1,20 +1,31 @@
+import argparse
+import os
 import uvicorn
-from settings import settings_db
+from settings import settings_db, settings_pool
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import time
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=settings_pool['workers'],
+                        help='количество процессов uvicorn, 0 - по числу ядер')
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count()
+
     connection = psycopg2.connect(user=settings_db['username'], 
                         password=settings_db['password'], 
-                        host=settings_db['host'])
+                        host=settings_db['host'],
+                        port=settings_db['port'])
 
 
     connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
     cursor = connection.cursor()
     try:
-        sql_create_database = cursor.execute(f'create database {settings_db['database']}')
+        sql_create_database = cursor.execute(f"create database {settings_db['database']}")
     except:
         pass
 
@@ -22,4 +33,7 @@ if __name__ == "__main__":
     cursor.close()
     connection.close()
 
-    uvicorn.run("routings:app", host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    # Воркеры читают настройки заново при импорте, через окружение они узнают,
+    # на сколько частей делить бюджет соединений
+    os.environ['WEB_WORKERS'] = str(workers)
+    uvicorn.run("routings:app", host=args.host, port=args.port, log_level="info", workers=workers)
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+
+
+class Price_band(BaseModel):
+    start: str
+    end: str
+    price: float
+
+
+class Recurrence(BaseModel):
+    days_of_week: list[int]
+    time: str
+    date_from: str
+    date_to: str
+
+
+class Walks_booking(BaseModel):
+    name: str
+    phone: str
+    dog_name: str
+    flat_number: int
+    dog_description: str | None = None
+    start_dates: list[str] | None = None
+    recurrence: Recurrence | None = None
+
+
+class Walk_status(BaseModel):
+    walk_id: int
+    status: str
+    who_walking: str | None = None
+
+
+class Walks_status(BaseModel):
+    walks: list[Walk_status] | None = None
+    current_date: str | None = None
+    from_status: str | None = None
+    status: str | None = None
+    who_walking: str | None = None
+
+
+class Shift(BaseModel):
+    day_of_week: int
+    start: str
+    end: str
+
+
+class Walker_profile(BaseModel):
+    name: str
+    capacity: int
+    shifts: list[Shift] = []
@@ -1,7 +1,98 @@
+import os
+
+# Хранилище заказов: 'postgres' или 'memory' (в памяти процесса, без базы, для профилирования и проверок)
+settings_storage = {
+    'backend': os.environ.get('STORAGE_BACKEND', 'postgres')
+}
+
 settings_db = {
-    'host': 'postgres_db',
-    'username': 'postgres',
-    'password': 'password',
-    'port': '5432',
-    'database': 'walks_dogs'
+    'host': os.environ.get('DB_HOST', 'postgres_db'),
+    'username': os.environ.get('DB_USER', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', 'password'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_NAME', 'walks_dogs')
+}
+
+# Пул соединений одного воркера. connection_budget - сколько соединений с базой
+# может занять приложение целиком, пул каждого из workers воркеров урезается до своей доли
+settings_pool = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+    'pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1',
+    'recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+    'statement_timeout_ms': int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '0')),
+    'prepared_statement_cache_size': int(os.environ.get('DB_PREPARED_STATEMENT_CACHE_SIZE', '256')),
+    'connection_budget': int(os.environ.get('DB_CONNECTION_BUDGET', '80')),
+    'workers': int(os.environ.get('WEB_WORKERS', '1'))
+}
+
+# Реплики только для чтения через запятую в виде host:port, пример: 'replica1:5432,replica2:5432'
+# read_your_writes_seconds - сколько секунд после записи клиент читает с основной базы
+settings_replicas = {
+    'hosts': [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host],
+    'retry_after': float(os.environ.get('DB_REPLICA_RETRY_AFTER', '30')),
+    'read_your_writes_seconds': int(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', '5'))
+}
+
+# Пулер транзакций вроде PgBouncer (pool_mode = transaction) между приложением и базой
+settings_pooler = {
+    'enabled': os.environ.get('DB_POOLER', '0') == '1',
+    'host': os.environ.get('DB_POOLER_HOST', '127.0.0.1'),
+    'port': os.environ.get('DB_POOLER_PORT', '6432')
+}
+
+settings_cache = {
+    'price_check_interval': 1.0,
+    'walks_ttl': 2.0,
+    'walks_max_entries': 256,
+    'identity_check_interval': 1.0,
+    'identity_max_entries': 10000
+}
+
+settings_slot = {
+    'capacity': 2,
+    'batch_limit': 100
+}
+
+settings_json = {
+    'legacy': False
+}
+
+settings_metrics = {
+    'slow_query_ms': 200
+}
+
+settings_events = {
+    'queue_size': 100,
+    'keepalive': 15.0,
+    'reconnect_after': 1.0
+}
+
+settings_reports = {
+    'refresh_interval': 10.0,
+    'refresh_batch': 366
+}
+
+settings_partitions = {
+    'months_ahead': int(os.environ.get('WALK_PARTITIONS_AHEAD', '3')),
+    'maintenance_interval': 3600.0,
+    'keep_months': int(os.environ.get('WALK_PARTITIONS_KEEP_MONTHS', '12')),
+    'archive_directory': os.environ.get('WALK_ARCHIVE_DIRECTORY', '')
+}
+
+settings_idempotency = {
+    'ttl': 86400.0,
+    'max_entries': 1024,
+    'wait': 5.0,
+    'poll_interval': 0.05,
+    'claim_timeout': 30.0,
+    'purge_interval': 3600.0
+}
+
+settings_bulk = {
+    'batch': 10000,
+    'read_size': 1 << 16,
+    'max_record_size': 1 << 20,
+    'export_queue': 16,
+    'error_samples': 100
 }
\ No newline at end of file